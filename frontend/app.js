@@ -2,9 +2,18 @@ const API_BASE = 'http://localhost:8000/api';
 const state = {
   token: null,
   user: null,
+  // Короткоживущий access-токен и refresh для него (нужны потоку предложений)
+  access: null,
+  accessExpiresAt: null,
+  refresh: null,
   profile: null,
   orders: [],
   purchases: [],
+  // Курсор следующей страницы и сколько строк пришло первой страницей
+  pages: {
+    orders: { next: null, firstCount: 0, more: false },
+    purchases: { next: null, firstCount: 0, more: false },
+  },
 };
 
 const registrationSection = document.getElementById('registration-section');
@@ -22,6 +31,8 @@ const ordersSection = document.getElementById('orders-section');
 const ordersList = document.getElementById('orders-list');
 const purchasesSection = document.getElementById('purchases-section');
 const purchasesList = document.getElementById('purchases-list');
+const ordersMoreBtn = document.getElementById('orders-more');
+const purchasesMoreBtn = document.getElementById('purchases-more');
 const toastEl = document.getElementById('toast');
 const registrationForm = document.getElementById('registration-form');
 const loginForm = document.getElementById('login-form');
@@ -55,10 +66,14 @@ function showAuthForm(mode) {
   }
 }
 
-function setAuthState({ token, user }) {
+function setAuthState({ token, user, access = null, access_expires_at: accessExpiresAt = null, refresh = null }) {
   state.token = token;
   state.user = user;
+  state.access = access;
+  state.accessExpiresAt = accessExpiresAt;
+  state.refresh = refresh;
   if (token) {
+    streamFailures = 0;
     if (authStatusEl) {
       authStatusEl.textContent = `Авторизован: ${user.phone_number}`;
     }
@@ -72,7 +87,9 @@ function setAuthState({ token, user }) {
       navProfileBtn.classList.remove('hidden');
     }
     loadInitialData().catch((error) => console.error(error));
+    subscribeOffers();
   } else {
+    unsubscribeOffers();
     if (authStatusEl) {
       authStatusEl.textContent = 'Не авторизован';
     }
@@ -123,6 +140,151 @@ async function apiRequest(url, options = {}) {
   return response.json();
 }
 
+// Списки заказов отдаются постранично по курсору: { next, previous, results };
+// грузим только первую страницу, следующие — по кнопке «Показать ещё»
+const LIST_PAGE_SIZE = 50;
+
+// next — абсолютный адрес; apiRequest ждёт путь относительно API_BASE
+function apiPath(url) {
+  const basePath = new URL(API_BASE).pathname;
+  const target = new URL(url, API_BASE);
+  return target.pathname.slice(basePath.length) + target.search;
+}
+
+async function fetchPage(url) {
+  const data = await apiRequest(url);
+  if (!data || !Array.isArray(data.results)) {
+    return { items: data || [], next: null };
+  }
+  return { items: data.results, next: data.next ? apiPath(data.next) : null };
+}
+
+// Обновление (в том числе по событию потока) перечитывает только первую страницу;
+// уже догруженные страницы остаются в списке
+async function loadFirstPage(key, url) {
+  const page = await fetchPage(`${url}${url.includes('?') ? '&' : '?'}page_size=${LIST_PAGE_SIZE}`);
+  const pages = state.pages[key];
+  if (pages.more) {
+    const ids = new Set(page.items.map((item) => item.id));
+    const tail = state[key].slice(pages.firstCount).filter((item) => !ids.has(item.id));
+    state[key] = page.items.concat(tail);
+  } else {
+    state[key] = page.items;
+    pages.next = page.next;
+  }
+  pages.firstCount = page.items.length;
+}
+
+async function loadNextPage(key) {
+  const pages = state.pages[key];
+  if (!pages.next) {
+    return;
+  }
+  const page = await fetchPage(pages.next);
+  const ids = new Set(state[key].map((item) => item.id));
+  state[key] = state[key].concat(page.items.filter((item) => !ids.has(item.id)));
+  pages.next = page.next;
+  pages.more = true;
+}
+
+function resetPages(key) {
+  state[key] = [];
+  state.pages[key] = { next: null, firstCount: 0, more: false };
+}
+
+// Новые предложения приходят по SSE вместо периодического опроса /orders/creating/;
+// если EventSource недоступен или поток раз за разом отказывает — long-poll того же адреса
+const MAX_STREAM_FAILURES = 3;
+const OFFERS_RETRY_MS = 5000;
+let offersStream = null;
+let offersGeneration = 0;
+let streamFailures = 0;
+
+function refreshOrders() {
+  loadOrders().catch((error) => console.warn('Не удалось обновить заказы:', error));
+}
+
+// Постоянный ключ в URL попал бы в логи, поэтому EventSource получает access-токен
+async function freshAccessToken() {
+  if (state.access && state.accessExpiresAt * 1000 - Date.now() > 30000) {
+    return state.access;
+  }
+  if (!state.refresh) {
+    return null;
+  }
+  const data = await apiRequest('/auth/token/refresh/', {
+    method: 'POST',
+    body: JSON.stringify({ refresh: state.refresh }),
+  });
+  state.access = data.access;
+  state.accessExpiresAt = data.access_expires_at;
+  state.refresh = data.refresh;
+  return state.access;
+}
+
+async function subscribeOffers() {
+  unsubscribeOffers();
+  const generation = offersGeneration;
+  if (!state.token) {
+    return;
+  }
+  let access = null;
+  if (typeof EventSource !== 'undefined' && streamFailures < MAX_STREAM_FAILURES) {
+    access = await freshAccessToken().catch(() => null);
+  }
+  if (generation !== offersGeneration) {
+    return;
+  }
+  if (!access) {
+    pollOffers(generation);
+    return;
+  }
+
+  const stream = new EventSource(`${API_BASE}/orders/creating/stream/?access=${encodeURIComponent(access)}`);
+  offersStream = stream;
+  stream.addEventListener('open', () => {
+    streamFailures = 0;
+  });
+  stream.addEventListener('offers', refreshOrders);
+  stream.addEventListener('error', () => {
+    // CONNECTING — браузер переподключится сам; CLOSED — сервер отказал (например, истёк токен)
+    if (stream !== offersStream || stream.readyState !== EventSource.CLOSED) {
+      return;
+    }
+    streamFailures += 1;
+    subscribeOffers();
+  });
+}
+
+async function pollOffers(generation) {
+  let since = '';
+  while (generation === offersGeneration && state.token) {
+    try {
+      const query = since ? `?since=${encodeURIComponent(since)}` : '';
+      const data = await apiRequest(`/orders/creating/stream/${query}`);
+      if (generation !== offersGeneration) {
+        return;
+      }
+      since = data.since;
+      if (data.orders.length) {
+        refreshOrders();
+      }
+    } catch (error) {
+      console.warn('Long-poll предложений:', error);
+      await new Promise((resolve) => setTimeout(resolve, OFFERS_RETRY_MS));
+    }
+  }
+}
+
+function unsubscribeOffers() {
+  // Новое поколение останавливает и цикл long-poll
+  offersGeneration += 1;
+  if (offersStream) {
+    offersStream.close();
+    offersStream = null;
+  }
+}
+
 async function loadInitialData() {
   await Promise.all([loadProfile(), loadOrders(), loadPurchases()]).catch((error) => {
     console.error(error);
@@ -235,7 +397,7 @@ function updateStepDisplay() {
   });
 }
 
-function goToStep(step) {
+async function goToStep(step) {
   if (step < 1 || step > totalSteps) return;
   
   const currentStepEl = document.querySelector(`.form-step[data-step="${currentStep}"]`);
@@ -318,6 +480,14 @@ function goToStep(step) {
         showToast('Пожалуйста, заполните все обязательные поля на текущем шаге');
         return;
       }
+
+      try {
+        await saveProfileStep(currentStep);
+      } catch (error) {
+        console.error('Ошибка при сохранении шага анкеты:', error);
+        showToast(profileErrorMessage(error));
+        return;
+      }
     }
   }
   
@@ -615,24 +785,39 @@ function fillProfileForm(profile) {
 }
 
 async function loadOrders() {
-  const orders = await apiRequest('/orders/creating/');
-  state.orders = orders;
+  await loadFirstPage('orders', '/orders/creating/');
   renderOrders();
 }
 
 async function loadPurchases() {
   try {
-    const purchases = await apiRequest('/orders/purchases/');
-    state.purchases = purchases || [];
+    await loadFirstPage('purchases', '/orders/purchases/');
     renderPurchases();
   } catch (error) {
     console.warn('Не удалось загрузить заказы:', error);
-    state.purchases = [];
+    resetPages('purchases');
     renderPurchases();
   }
 }
 
+async function loadMore(key, button, render) {
+  button.disabled = true;
+  try {
+    await loadNextPage(key);
+    render();
+  } catch (error) {
+    console.warn('Не удалось загрузить следующую страницу:', error);
+    showToast('Не удалось загрузить следующую страницу');
+  } finally {
+    button.disabled = false;
+  }
+}
+
+ordersMoreBtn?.addEventListener('click', () => loadMore('orders', ordersMoreBtn, renderOrders));
+purchasesMoreBtn?.addEventListener('click', () => loadMore('purchases', purchasesMoreBtn, renderPurchases));
+
 function renderOrders() {
+  ordersMoreBtn?.classList.toggle('hidden', !state.pages.orders.next);
   ordersList.innerHTML = '';
   if (!state.orders.length) {
     ordersList.innerHTML = '<li>Нет заказов для подтверждения.</li>';
@@ -658,6 +843,7 @@ function renderOrders() {
 }
 
 function renderPurchases() {
+  purchasesMoreBtn?.classList.toggle('hidden', !state.pages.purchases.next);
   purchasesList.innerHTML = '';
   if (!state.purchases.length) {
     purchasesList.innerHTML = '<li>Пока нет активных заказов.</li>';
@@ -890,6 +1076,9 @@ async function openTestReportForm(purchaseId) {
     const report = await apiRequest(`/orders/purchases/${purchaseId}/report/`);
     console.log('Report loaded:', report);
     fillTestReportForm(report);
+    // Черновик ведётся, пока отчёт не отправлен (id ещё нет)
+    reportDraftSnapshot = report.id ? null : collectTestReportPayload(form);
+    reportDraftPending = false;
   } catch (error) {
     console.log('No existing report, filling from profile/purchase:', error);
     // Отчета нет, заполняем форму данными из профиля
@@ -902,8 +1091,7 @@ async function openTestReportForm(purchaseId) {
         fillTestReportFormFromProfile();
         // Попробуем загрузить purchase из API
         try {
-          const purchases = await apiRequest('/orders/purchases/');
-          const foundPurchase = purchases.find(p => p.id === purchaseId);
+          const foundPurchase = await apiRequest(`/orders/purchases/${purchaseId}/`);
           if (foundPurchase && form.item_name) {
             form.item_name.value = foundPurchase.article || '';
           }
@@ -1014,7 +1202,82 @@ function updateReviewTextCount() {
   }
 }
 
+// Данные формы отчета в формате API
+function collectTestReportPayload(form) {
+  const formData = new FormData(form);
+  return {
+      full_name: formData.get('full_name') || '',
+      contact: formData.get('contact') || '',
+      item_name: formData.get('item_name') || '',
+      category: formData.get('category') || '',
+      received_at: formData.get('received_at') || '',
+      completed_at: formData.get('completed_at') || '',
+      report_type: formData.get('report_type') || '',
+      proof_links: formData.getAll('proof_links[]').filter(v => v),
+      score_overall: formData.get('score_overall') ? parseInt(formData.get('score_overall'), 10) : null,
+      score_expectation_fit: formData.get('score_expectation_fit') ? parseInt(formData.get('score_expectation_fit'), 10) : null,
+      score_quality_effect: formData.get('score_quality_effect') ? parseInt(formData.get('score_quality_effect'), 10) : null,
+      score_usability: formData.get('score_usability') ? parseInt(formData.get('score_usability'), 10) : null,
+      score_value_for_money: formData.get('score_value_for_money') ? parseInt(formData.get('score_value_for_money'), 10) : null,
+      score_recommend: formData.get('score_recommend') ? parseInt(formData.get('score_recommend'), 10) : null,
+      likes: formData.get('likes') || '',
+      improvements: formData.get('improvements') || '',
+      review_text: formData.get('review_text') || '',
+      emotions_3_words: formData.get('emotions_3_words') || '',
+      issues_occured: formData.get('issues_occured') === 'on',
+      issues_note: formData.get('issues_note') || '',
+      would_buy: formData.get('would_buy') || '',
+      ready_for_next: formData.get('ready_for_next') === 'on',
+      consent_truthful: formData.get('consent_truthful') === 'on',
+      consent_use_materials: formData.get('consent_use_materials') === 'on',
+    };
+}
+
+// Автосохранение черновика отчета: на сервер уходят только изменённые поля
+let reportDraftSnapshot = null;
+let reportDraftPending = false;
+// Правки внутри окна REPORT_DRAFT_FLUSH_SECONDS сервер копит в кэше — досылаем flush, когда окно истекло
+const REPORT_DRAFT_FLUSH_DELAY_MS = 6000;
+let reportDraftFlushTimer = null;
+
+async function saveReportDraft(flush = false) {
+  const purchaseId = document.getElementById('report-purchase-id')?.value;
+  if (!purchaseId || !testReportForm || !reportDraftSnapshot) return;
+
+  const current = collectTestReportPayload(testReportForm);
+  const changes = {};
+  Object.keys(current).forEach(key => {
+    if (JSON.stringify(current[key]) !== JSON.stringify(reportDraftSnapshot[key])) {
+      changes[key] = current[key];
+    }
+  });
+  if (!Object.keys(changes).length && !(flush && reportDraftPending)) return;
+
+  const snapshot = reportDraftSnapshot;
+  reportDraftSnapshot = current;
+  try {
+    const result = await apiRequest(`/orders/purchases/${purchaseId}/report/draft/${flush ? '?flush=1' : ''}`, {
+      method: 'PATCH',
+      body: JSON.stringify(changes),
+    });
+    reportDraftPending = !result.saved;
+    clearTimeout(reportDraftFlushTimer);
+    if (reportDraftPending) {
+      reportDraftFlushTimer = setTimeout(() => saveReportDraft(true), REPORT_DRAFT_FLUSH_DELAY_MS);
+    }
+  } catch (error) {
+    // Не сохранилось — отправим эти поля со следующей правкой
+    if (reportDraftSnapshot === current) {
+      reportDraftSnapshot = snapshot;
+    }
+    console.warn('Could not save report draft:', error);
+  }
+}
+
 function closeTestReportForm() {
+  clearTimeout(reportDraftFlushTimer);
+  saveReportDraft(true);
+  reportDraftSnapshot = null;
   if (testReportSection) {
     testReportSection.classList.add('hidden');
     document.body.style.overflow = '';
@@ -1052,6 +1315,174 @@ function removeFile(index) {
 
 window.removeFile = removeFile;
 
+proofFilesInput?.addEventListener('change', () => {
+  selectedFiles.push(...Array.from(proofFilesInput.files));
+  updateProofFilesList();
+});
+
+// Загрузка файла-подтверждения частями с докачкой после обрыва
+const PROOF_CHUNK_SIZE = 5 * 1024 * 1024;
+
+// Повторный POST того же файла (имя, размер) сервер отвечает незавершённой загрузкой
+// с её смещением — докачка продолжается с принятого места. Если загрузка так и не
+// удалась, она отменяется DELETE, чтобы не занимать место в лимите файлов отчёта.
+async function uploadProofFile(purchaseId, file, onProgress) {
+  let upload = await apiRequest(`/orders/purchases/${purchaseId}/uploads/`, {
+    method: 'POST',
+    body: JSON.stringify({
+      filename: file.name,
+      size: file.size,
+      content_type: file.type || 'application/octet-stream',
+    }),
+  });
+
+  let failures = 0;
+  while (upload.status !== 'complete') {
+    const chunk = file.slice(upload.offset, upload.offset + PROOF_CHUNK_SIZE);
+    try {
+      upload = await apiRequest(`/orders/uploads/${upload.id}/`, {
+        method: 'PATCH',
+        headers: {
+          'Content-Type': 'application/offset+octet-stream',
+          'Upload-Offset': String(upload.offset),
+        },
+        body: chunk,
+      });
+      failures = 0;
+      onProgress?.(upload.offset / file.size);
+    } catch (error) {
+      if (++failures > 3) {
+        await apiRequest(`/orders/uploads/${upload.id}/`, { method: 'DELETE' }).catch(() => {});
+        throw error;
+      }
+      // Узнаём, сколько байт сервер уже принял, и продолжаем с этого места
+      try {
+        upload = await apiRequest(`/orders/uploads/${upload.id}/`);
+      } catch (statusError) {
+        console.warn('Не удалось узнать состояние загрузки:', statusError);
+      }
+    }
+  }
+  return upload.path;
+}
+
+// Значения всех полей анкеты в представлении API
+function collectProfilePayload(form) {
+  const formData = new FormData(form);
+  
+  const getTrimmed = (name) => {
+    const value = formData.get(name);
+    return value === null || value === undefined ? '' : String(value).trim();
+  };
+  
+  const getAll = (name) => {
+    return formData.getAll(name).map(v => String(v).trim()).filter(v => v);
+  };
+
+  return {
+    // Step 1
+    full_name: getTrimmed('full_name'),
+    has_self_employment: getTrimmed('has_self_employment') === 'true' ? true : (getTrimmed('has_self_employment') === 'false' ? false : null),
+    ready_for_self_employment: getTrimmed('ready_for_self_employment'),
+    main_blog_link: getTrimmed('main_blog_link'),
+    social_links: getAll('social_links[]'),
+    country: getTrimmed('country'),
+    city: getTrimmed('city'),
+    age: getTrimmed('age') ? parseInt(getTrimmed('age'), 10) : null,
+    gender: getTrimmed('gender'),
+    coverage_regions: getTrimmed('coverage_regions'),
+    
+    // Step 2
+    platforms: getAll('platforms[]'),
+    blog_topics: getAll('blog_topics[]'),
+    blog_description: getTrimmed('blog_description'),
+    blog_experience: getTrimmed('blog_experience'),
+    publication_frequency: getTrimmed('publication_frequency'),
+    
+    // Step 3
+    subscribers_by_platform: getAll('subscribers_by_platform[]'),
+    average_reach: getAll('average_reach[]'),
+    audience_gender_age: getTrimmed('audience_gender_age'),
+    audience_region: getTrimmed('audience_region'),
+    engagement_level: getTrimmed('engagement_level'),
+    
+    // Step 4
+    has_collaborations: formData.get('has_collaborations') === 'on',
+    collaboration_examples: getAll('collaboration_examples[]'),
+    ready_to_share_results: getTrimmed('ready_to_share_results'),
+    ready_for_paid_ads: getTrimmed('ready_for_paid_ads'),
+    
+    // Step 5
+    collaboration_formats: getAll('collaboration_formats[]'),
+    ad_pricing: getAll('ad_pricing[]'),
+    ready_for_barter: getTrimmed('ready_for_barter'),
+    barter_categories: getAll('barter_categories[]'),
+    
+    // Step 6
+    ready_for_brand_projects: getTrimmed('ready_for_brand_projects'),
+    products_wont_advertise: getTrimmed('products_wont_advertise'),
+    blog_management: getTrimmed('blog_management'),
+    has_media_kit: getTrimmed('has_media_kit') === 'true' ? true : (getTrimmed('has_media_kit') === 'false' ? false : null),
+    media_kit_link: getTrimmed('media_kit_link'),
+    ready_for_blogger_community: getTrimmed('ready_for_blogger_community'),
+    additional_info: getTrimmed('additional_info'),
+    consent_privacy: formData.get('consent_privacy') === 'on',
+    consent_marketing_email: formData.get('consent_marketing_email') === 'on',
+    consent_marketing_calls: formData.get('consent_marketing_calls') === 'on',
+    
+    // Legacy fields
+    contact: getTrimmed('contact'),
+    date_of_birth: getTrimmed('date_of_birth') || null,
+    pickup_point: getTrimmed('pickup_point'),
+  };
+}
+
+// Поля шагов анкеты — как PROFILE_STEPS в accounts/completeness.py
+const PROFILE_STEP_FIELDS = {
+  1: ['full_name', 'has_self_employment', 'ready_for_self_employment', 'main_blog_link', 'social_links',
+      'country', 'city', 'age', 'gender', 'coverage_regions', 'contact', 'date_of_birth', 'pickup_point'],
+  2: ['platforms', 'blog_topics', 'blog_description', 'blog_experience', 'publication_frequency'],
+  3: ['subscribers_by_platform', 'average_reach', 'audience_gender_age', 'audience_region', 'engagement_level'],
+  4: ['has_collaborations', 'collaboration_examples', 'ready_to_share_results', 'ready_for_paid_ads'],
+  5: ['collaboration_formats', 'ad_pricing', 'ready_for_barter', 'barter_categories'],
+  6: ['ready_for_brand_projects', 'products_wont_advertise', 'blog_management', 'has_media_kit', 'media_kit_link',
+      'ready_for_blogger_community', 'additional_info', 'consent_privacy', 'consent_marketing_email',
+      'consent_marketing_calls'],
+};
+
+// Шаг анкеты сохраняется отдельно: PATCH /profile/me/steps/<step>/ только с его полями
+async function saveProfileStep(step) {
+  const payload = collectProfilePayload(profileForm);
+  const fields = {};
+  PROFILE_STEP_FIELDS[step].forEach(name => {
+    fields[name] = payload[name];
+  });
+  return apiRequest(`/profile/me/steps/${step}/`, {
+    method: 'PATCH',
+    body: JSON.stringify(fields),
+  });
+}
+
+// Текст ошибки API: поля валидации сводятся в одну строку
+function profileErrorMessage(error) {
+  let errorMessage = 'Ошибка сохранения профиля';
+  if (error.message) {
+    errorMessage = error.message;
+    try {
+      const errorData = JSON.parse(error.message);
+      if (errorData && typeof errorData === 'object') {
+        const errors = Object.entries(errorData)
+          .map(([field, messages]) => `${field}: ${Array.isArray(messages) ? messages.join(', ') : messages}`)
+          .join('; ');
+        errorMessage = `Ошибки валидации: ${errors}`;
+      }
+    } catch (e) {
+      // Не JSON, используем как есть
+    }
+  }
+  return errorMessage;
+}
+
 // Navigation buttons
 document.getElementById('prev-step-btn')?.addEventListener('click', () => {
   goToStep(currentStep - 1);
@@ -1075,85 +1506,8 @@ profileForm.addEventListener('submit', async (event) => {
   
   try {
     
-    const formData = new FormData(profileForm);
-    
-    const getTrimmed = (name) => {
-      const value = formData.get(name);
-      return value === null || value === undefined ? '' : String(value).trim();
-    };
-    
-    const getAll = (name) => {
-      return formData.getAll(name).map(v => String(v).trim()).filter(v => v);
-    };
-
-    const payload = {
-      // Step 1
-      full_name: getTrimmed('full_name'),
-      has_self_employment: getTrimmed('has_self_employment') === 'true' ? true : (getTrimmed('has_self_employment') === 'false' ? false : null),
-      ready_for_self_employment: getTrimmed('ready_for_self_employment'),
-      main_blog_link: getTrimmed('main_blog_link'),
-      social_links: getAll('social_links[]'),
-      country: getTrimmed('country'),
-      city: getTrimmed('city'),
-      age: getTrimmed('age') ? parseInt(getTrimmed('age'), 10) : null,
-      gender: getTrimmed('gender'),
-      coverage_regions: getTrimmed('coverage_regions'),
-      
-      // Step 2
-      platforms: getAll('platforms[]'),
-      blog_topics: getAll('blog_topics[]'),
-      blog_description: getTrimmed('blog_description'),
-      blog_experience: getTrimmed('blog_experience'),
-      publication_frequency: getTrimmed('publication_frequency'),
-      
-      // Step 3
-      subscribers_by_platform: getAll('subscribers_by_platform[]'),
-      average_reach: getAll('average_reach[]'),
-      audience_gender_age: getTrimmed('audience_gender_age'),
-      audience_region: getTrimmed('audience_region'),
-      engagement_level: getTrimmed('engagement_level'),
-      
-      // Step 4
-      has_collaborations: formData.get('has_collaborations') === 'on',
-      collaboration_examples: getAll('collaboration_examples[]'),
-      ready_to_share_results: getTrimmed('ready_to_share_results'),
-      ready_for_paid_ads: getTrimmed('ready_for_paid_ads'),
-      
-      // Step 5
-      collaboration_formats: getAll('collaboration_formats[]'),
-      ad_pricing: getAll('ad_pricing[]'),
-      ready_for_barter: getTrimmed('ready_for_barter'),
-      barter_categories: getAll('barter_categories[]'),
-      
-      // Step 6
-      ready_for_brand_projects: getTrimmed('ready_for_brand_projects'),
-      products_wont_advertise: getTrimmed('products_wont_advertise'),
-      blog_management: getTrimmed('blog_management'),
-      has_media_kit: getTrimmed('has_media_kit') === 'true' ? true : (getTrimmed('has_media_kit') === 'false' ? false : null),
-      media_kit_link: getTrimmed('media_kit_link'),
-      ready_for_blogger_community: getTrimmed('ready_for_blogger_community'),
-      additional_info: getTrimmed('additional_info'),
-      consent_privacy: formData.get('consent_privacy') === 'on',
-      consent_marketing_email: formData.get('consent_marketing_email') === 'on',
-      consent_marketing_calls: formData.get('consent_marketing_calls') === 'on',
-      
-      // Legacy fields
-      contact: getTrimmed('contact'),
-      date_of_birth: getTrimmed('date_of_birth') || null,
-      pickup_point: getTrimmed('pickup_point'),
-    };
-
-    console.log('Отправка данных профиля:', payload);
-
-    const profile = await apiRequest('/profile/me/', {
-      method: 'PATCH',
-      body: JSON.stringify(payload),
-    });
-    
-    console.log('Профиль сохранен:', profile);
-    
-    state.profile = profile;
-    fillProfileForm(profile);
+    // Предыдущие шаги сохранены при переходе «Далее», здесь — последний
+    await saveProfileStep(currentStep);
     showToast('Профиль успешно сохранён! ✅');
     goToStep(1); // Reset to first step after save
     
@@ -1162,25 +1516,7 @@ profileForm.addEventListener('submit', async (event) => {
     
   } catch (error) {
     console.error('Ошибка при сохранении профиля:', error);
-    
-    // Пытаемся извлечь детали ошибки
-    let errorMessage = 'Ошибка сохранения профиля';
-    if (error.message) {
-      errorMessage = error.message;
-      // Если это JSON с ошибками валидации
-      try {
-        const errorData = JSON.parse(error.message);
-        if (errorData && typeof errorData === 'object') {
-          const errors = Object.entries(errorData)
-            .map(([field, messages]) => `${field}: ${Array.isArray(messages) ? messages.join(', ') : messages}`)
-            .join('; ');
-          errorMessage = `Ошибки валидации: ${errors}`;
-        }
-      } catch (e) {
-        // Не JSON, используем как есть
-      }
-    }
-    
+    const errorMessage = profileErrorMessage(error);
     showToast(errorMessage);
     alert(`Ошибка: ${errorMessage}\n\nПроверьте консоль браузера (F12) для деталей.`);
   } finally {
@@ -1241,6 +1577,8 @@ ordersList.addEventListener('click', async (event) => {
     console.log('Response from decision:', response);
     
     showToast(action === 'approve' ? 'Заказ принят. Заполните отчёт о тестировании.' : 'Заказ отклонён.');
+    // Решённое предложение могло быть на догруженной странице — первая страница его не уберёт
+    state.orders = state.orders.filter((order) => String(order.id) !== id);
     
     // Если заказ принят, сразу открываем форму отчета
     if (action === 'approve' && response && response.purchase_id) {
@@ -1324,6 +1662,13 @@ if (testReportSection) {
   });
 }
 
+// Автосохранение черновика отчета при изменении полей
+if (testReportForm) {
+  testReportForm.addEventListener('change', () => {
+    saveReportDraft();
+  });
+}
+
 // Обработчик отправки формы отчета
 if (testReportForm) {
   testReportForm.addEventListener('submit', async (event) => {
@@ -1344,35 +1689,18 @@ if (testReportForm) {
     }
     
     try {
-      const formData = new FormData(testReportForm);
-      
-      // Собираем данные формы
-      const payload = {
-        full_name: formData.get('full_name') || '',
-        contact: formData.get('contact') || '',
-        item_name: formData.get('item_name') || '',
-        category: formData.get('category') || '',
-        received_at: formData.get('received_at') || '',
-        completed_at: formData.get('completed_at') || '',
-        report_type: formData.get('report_type') || '',
-        proof_links: formData.getAll('proof_links[]').filter(v => v),
-        score_overall: formData.get('score_overall') ? parseInt(formData.get('score_overall'), 10) : null,
-        score_expectation_fit: formData.get('score_expectation_fit') ? parseInt(formData.get('score_expectation_fit'), 10) : null,
-        score_quality_effect: formData.get('score_quality_effect') ? parseInt(formData.get('score_quality_effect'), 10) : null,
-        score_usability: formData.get('score_usability') ? parseInt(formData.get('score_usability'), 10) : null,
-        score_value_for_money: formData.get('score_value_for_money') ? parseInt(formData.get('score_value_for_money'), 10) : null,
-        score_recommend: formData.get('score_recommend') ? parseInt(formData.get('score_recommend'), 10) : null,
-        likes: formData.get('likes') || '',
-        improvements: formData.get('improvements') || '',
-        review_text: formData.get('review_text') || '',
-        emotions_3_words: formData.get('emotions_3_words') || '',
-        issues_occured: formData.get('issues_occured') === 'on',
-        issues_note: formData.get('issues_note') || '',
-        would_buy: formData.get('would_buy') || '',
-        ready_for_next: formData.get('ready_for_next') === 'on',
-        consent_truthful: formData.get('consent_truthful') === 'on',
-        consent_use_materials: formData.get('consent_use_materials') === 'on',
-      };
+      const payload = collectTestReportPayload(testReportForm);
+
+      // Файлы прикрепляются к черновику отчета по мере загрузки
+      for (const [index, file] of selectedFiles.entries()) {
+        await uploadProofFile(purchaseId, file, (progress) => {
+          if (submitBtn) {
+            submitBtn.textContent = `Загрузка файла ${index + 1} из ${selectedFiles.length}: ${Math.round(progress * 100)}%`;
+          }
+        });
+      }
+      selectedFiles = [];
+      updateProofFilesList();
       
       // Отправляем отчет (PATCH для обновления, если уже существует)
       const report = await apiRequest(`/orders/purchases/${purchaseId}/report/`, {
@@ -1380,6 +1708,7 @@ if (testReportForm) {
         body: JSON.stringify(payload),
       });
       
+      reportDraftSnapshot = null;
       showToast('Отчёт успешно сохранён! ✅');
       await loadPurchases(); // Обновляем список заказов
       
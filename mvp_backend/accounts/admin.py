@@ -1,19 +1,24 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models.expressions import RawSQL
 from django.utils.translation import gettext_lazy as _
 
+from mvp_backend.admin_tools import PhonePrefixSearchMixin, cached_choices_filter
+from search.index import matching_ids_sql, search_supported
+
 from .forms import UserChangeForm, UserCreationForm
 from .models import User, UserProfile
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(PhonePrefixSearchMixin, BaseUserAdmin):
     form = UserChangeForm
     add_form = UserCreationForm
     ordering = ('phone_number',)
     list_display = ('phone_number', 'email', 'first_name', 'last_name', 'is_staff', 'is_active')
     list_filter = ('is_staff', 'is_active', 'date_joined')
     search_fields = ('phone_number', 'email', 'first_name', 'last_name')
+    phone_search_fields = ('phone_number',)
 
     fieldsets = (
         (None, {'fields': ('phone_number', 'password')}),
@@ -34,7 +39,7 @@ class UserAdmin(BaseUserAdmin):
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(PhonePrefixSearchMixin, admin.ModelAdmin):
     list_display = (
         'user',
         'full_name',
@@ -44,9 +49,19 @@ class UserProfileAdmin(admin.ModelAdmin):
         'is_participating',
         'updated_at',
     )
+    list_select_related = ('user',)
     search_fields = ('user__phone_number', 'full_name', 'contact', 'city', 'country')
-    list_filter = ('is_completed', 'is_participating', 'country', 'has_self_employment', 'updated_at')
+    phone_search_fields = ('user__phone_number',)
+    raw_prefix_search_fields = ('contact',)
+    list_filter = (
+        'is_completed',
+        'is_participating',
+        cached_choices_filter('country', 'Страна'),
+        'has_self_employment',
+        'updated_at',
+    )
     readonly_fields = ('created_at', 'updated_at')
+    raw_id_fields = ('user',)
     fieldsets = (
         (
             'Основная информация',
@@ -158,3 +173,17 @@ class UserProfileAdmin(admin.ModelAdmin):
             },
         ),
     )
+
+    text_search_limit = 10000
+    search_help_text = (
+        'Телефон ищется по началу номера; имя, город, страна и контакт — по началу слов. '
+        f'По частым словам показываются только последние {text_search_limit} совпадений.'
+    )
+
+    def search_text_results(self, request, queryset, search_term):
+        # Имя, город, страна, контакт ищутся по полнотекстовому индексу, а не icontains по таблице;
+        # при очень частых словах показываются последние text_search_limit совпадений (см. search_help_text)
+        if search_supported():
+            subquery = matching_ids_sql(search_term, 'profile', limit=self.text_search_limit)
+            return (queryset.filter(pk__in=RawSQL(*subquery)) if subquery else queryset.none()), False
+        return super().search_text_results(request, queryset, search_term)
@@ -0,0 +1,127 @@
+"""Числовые метрики аудитории из свободных JSON-списков профиля.
+
+В subscribers_by_platform и average_reach лежат строки вида
+``"Instagram: 50k"`` или ``"ТГ — 12 000"``. Они разбираются в строки
+ProfileAudienceMetric (профиль, платформа, подписчики, охват) — по одной на
+платформу и строка TOTAL_PLATFORM с суммами, так что фильтр и сортировка по
+размеру аудитории — поиск по диапазону индекса, а не разбор каждого профиля.
+"""
+
+import re
+
+from django.db import transaction
+
+from .models import ProfileAudienceMetric
+from .rebuild import rebuild_profile_rows
+
+METRIC_FIELDS = ('subscribers_by_platform', 'average_reach')
+TOTAL_PLATFORM = ProfileAudienceMetric.TOTAL_PLATFORM
+
+# Синонимы -> каноническое название платформы
+PLATFORM_ALIASES = {
+    'Instagram': ('instagram', 'insta', 'инстаграм', 'инстаграмм', 'инста', 'ig'),
+    'Telegram': ('telegram', 'tg', 'телеграм', 'телеграмм', 'тг'),
+    'YouTube': ('youtube', 'yt', 'ютуб', 'ютьюб'),
+    'VK': ('vk', 'вк', 'вконтакте', 'vkontakte'),
+    'TikTok': ('tiktok', 'тикток', 'tik'),
+    'Дзен': ('dzen', 'дзен', 'zen'),
+    'RuTube': ('rutube', 'рутуб'),
+}
+_ALIASES = {alias: name for name, aliases in PLATFORM_ALIASES.items() for alias in aliases}
+
+_SEPARATOR_RE = re.compile(r'\s*[:=—–-]\s*|\s+(?=\d)')
+_NUMBER_RE = re.compile(r'(\d[\d\s ]*(?:[.,]\d+)?)\s*(тыс|млн|k|к|m|м)?', re.IGNORECASE)
+_MULTIPLIERS = {'тыс': 1_000, 'k': 1_000, 'к': 1_000, 'млн': 1_000_000, 'm': 1_000_000, 'м': 1_000_000}
+_PLATFORM_MAX_LENGTH = ProfileAudienceMetric._meta.get_field('platform').max_length
+_MAX_VALUE = 2_000_000_000
+
+
+def normalize_platform(label):
+    words = re.findall(r'\w+', label.casefold())
+    for word in words:
+        if word in _ALIASES:
+            return _ALIASES[word]
+    return ' '.join(label.split())[:_PLATFORM_MAX_LENGTH]
+
+
+def parse_number(text):
+    """``"50k"`` -> 50000, ``"1,2 млн"`` -> 1200000, ``"12 000+"`` -> 12000."""
+    match = _NUMBER_RE.search(text)
+    if not match:
+        return None
+    digits, suffix = match.groups()
+    digits = re.sub(r'[\s ]', '', digits).replace(',', '.')
+    try:
+        value = float(digits)
+    except ValueError:
+        return None
+    value *= _MULTIPLIERS.get((suffix or '').lower(), 1)
+    return min(int(value), _MAX_VALUE)
+
+
+def parse_entry(entry):
+    """(платформа, число) для элемента списка или None, если его не разобрать."""
+    if isinstance(entry, dict):
+        platform = entry.get('platform') or entry.get('name') or ''
+        value = next((entry[key] for key in ('subscribers', 'reach', 'count', 'value') if key in entry), None)
+        entry = f'{platform}: {value}' if value is not None else ''
+    if not isinstance(entry, str):
+        return None
+    parts = _SEPARATOR_RE.split(entry.strip(), maxsplit=1)
+    if len(parts) != 2 or not parts[0]:
+        return None
+    number = parse_number(parts[1])
+    if number is None:
+        return None
+    return normalize_platform(parts[0]), number
+
+
+def profile_metrics(profile):
+    """{платформа: (подписчики, охват)} вместе с суммами в TOTAL_PLATFORM."""
+    subscribers, reach = {}, {}
+    for values, target in ((profile.subscribers_by_platform, subscribers), (profile.average_reach, reach)):
+        for entry in values if isinstance(values, list) else []:
+            parsed = parse_entry(entry)
+            if parsed:
+                platform, number = parsed
+                # Несколько строк на платформу (посты, сторис) — берём максимум
+                target[platform] = max(number, target.get(platform, 0))
+
+    metrics = {
+        platform: (subscribers.get(platform), reach.get(platform))
+        for platform in subscribers.keys() | reach.keys()
+    }
+    if metrics:
+        metrics[TOTAL_PLATFORM] = (
+            sum(subscribers.values()) if subscribers else None,
+            sum(reach.values()) if reach else None,
+        )
+    return metrics
+
+
+def metric_rows(profile):
+    return [
+        ProfileAudienceMetric(profile_id=profile.pk, platform=platform, subscribers=subscribers, reach=reach)
+        for platform, (subscribers, reach) in profile_metrics(profile).items()
+    ]
+
+
+def sync_profile_metrics(profile):
+    """Заменяет строки метрик профиля, если разобранные значения изменились."""
+    rows = metric_rows(profile)
+    wanted = {(row.platform, row.subscribers, row.reach) for row in rows}
+    current = set(
+        ProfileAudienceMetric.objects.filter(profile=profile).values_list('platform', 'subscribers', 'reach')
+    )
+    if wanted == current:
+        return
+    with transaction.atomic():
+        ProfileAudienceMetric.objects.filter(profile=profile).delete()
+        ProfileAudienceMetric.objects.bulk_create(rows)
+
+
+def rebuild_metrics(batch_size=2000, progress=None):
+    """Заполняет метрики всех профилей; возвращает число обработанных профилей."""
+    return rebuild_profile_rows(
+        ProfileAudienceMetric, METRIC_FIELDS, metric_rows, batch_size=batch_size, progress=progress
+    )
@@ -0,0 +1,147 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+
+from .tokens import InvalidToken, verify_access_token
+
+
+class TokenUserCache:
+    """LRU-кэш процесса ``ключ токена -> (пользователь, токен)`` с TTL.
+
+    Записи сбрасываются при удалении токена и любом изменении пользователя
+    (см. accounts.signals); TTL ограничивает устаревание при изменениях
+    из других процессов.
+    """
+
+    def __init__(self, max_size=10000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            user, token, _ = entry
+        # Каждый запрос получает свою копию без закэшированных связанных объектов
+        user = copy.copy(user)
+        user._state = copy.copy(user._state)
+        user._state.fields_cache = {}
+        return user, token
+
+    def set(self, key, user, token):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (user, token, time.monotonic() + self.ttl)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_key(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def _remove(self, key):
+        user, _, _ = self._entries.pop(key)
+        keys = self._keys_by_user.get(user.pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user.pk]
+
+
+token_cache = TokenUserCache(
+    max_size=getattr(settings, 'TOKEN_AUTH_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 60),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса Token и User, если ключ есть в кэше."""
+
+    cache = token_cache
+
+    def authenticate_credentials(self, key):
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        self.cache.set(key, user, token)
+        return user, token
+
+
+def get_cached_user(user_id):
+    """Активный пользователь по id, по возможности из token_cache."""
+    key = f'user:{user_id}'
+    cached = token_cache.get(key)
+    if cached is not None:
+        return cached[0]
+    user = get_user_model().objects.filter(pk=user_id, is_active=True).first()
+    if user is not None:
+        token_cache.set(key, user, None)
+    return user
+
+
+class SignedAccessTokenAuthentication(BaseAuthentication):
+    """``Authorization: Bearer <access>`` с access-токенами, подписанными HMAC.
+
+    Подпись и срок проверяются в памяти, пользователь берётся из кэша
+    процесса, так что обычно запрос к БД не нужен.
+    """
+
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid bearer header.')
+
+        try:
+            user_id = verify_access_token(auth[1].decode())
+        except (InvalidToken, UnicodeError) as exc:
+            raise exceptions.AuthenticationFailed(str(exc))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return user, None
+
+    def authenticate_header(self, request):
+        return self.keyword
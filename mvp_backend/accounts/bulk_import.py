@@ -0,0 +1,273 @@
+"""Потоковый массовый импорт блогеров из CSV или JSONL.
+
+Строки читаются по мере надобности и обрабатываются пачками: телефоны
+проверяются и сверяются с уже зарегистрированными одним запросом на пачку,
+остальные поля проходят валидаторы полей моделей (email, длины, choices),
+пароли хэшируются в пуле процессов (или делаются непригодными), а User,
+UserProfile и строки индексов пишутся через bulk_create. Сигнал post_save
+при этом не срабатывает, поэтому индексы подбора, метрики аудитории и
+полнотекстовый поиск заполняются здесь же.
+
+Если между сверкой и записью телефон успел зарегистрироваться (параллельная
+регистрация), пачка откатывается и пишется построчно: отклоняется только
+конфликтующая строка. Отклонённые строки не копятся в памяти, а сразу
+передаются в on_reject.
+"""
+
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from phonenumber_field.phonenumber import to_python
+
+from search.index import index_objects
+
+from .audience import metric_rows
+from .completeness import ALL_STEPS_MASK, compute_completed_steps
+from .matching import profile_attributes
+from .models import ProfileAttribute, ProfileAudienceMetric, User, UserProfile
+
+USER_FIELDS = ('first_name', 'last_name', 'email')
+PROFILE_FIELDS = tuple(
+    field.name
+    for field in UserProfile._meta.concrete_fields
+    if field.name not in ('id', 'user', 'completed_steps', 'is_completed', 'created_at', 'updated_at')
+)
+LIST_FIELDS = tuple(
+    field.name for field in UserProfile._meta.concrete_fields if field.get_internal_type() == 'JSONField'
+)
+
+
+def read_rows(path, fmt=None):
+    """Пары (номер строки, словарь) без чтения файла в память целиком."""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, encoding='utf-8-sig', newline='') as handle:
+        if fmt == 'jsonl':
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    yield line_number, {'__error__': f'invalid JSON: {exc}'}
+                    continue
+                yield line_number, row if isinstance(row, dict) else {'__error__': 'row is not an object'}
+        else:
+            reader = csv.DictReader(handle)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def _validation_message(exc):
+    if hasattr(exc, 'error_dict'):
+        return '; '.join(f'{field}: {" ".join(messages)}' for field, messages in exc.message_dict.items())
+    return ' '.join(exc.messages)
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def _hash_password(password):
+    return make_password(password)
+
+
+def _parse_list(value):
+    if isinstance(value, list):
+        return value
+    value = (value or '').strip()
+    if not value:
+        return []
+    if value.startswith('['):
+        parsed = json.loads(value)
+        if not isinstance(parsed, list):
+            raise ValueError('expected a list')
+        return parsed
+    return [part.strip() for part in value.split(';') if part.strip()]
+
+
+def _parse_bool(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    value = str(value).strip().lower()
+    if value in ('', 'none', 'null'):
+        return None
+    if value in ('1', 'true', 'yes', 'да'):
+        return True
+    if value in ('0', 'false', 'no', 'нет'):
+        return False
+    raise ValueError(f'not a boolean: {value}')
+
+
+def _build_profile(row):
+    profile = UserProfile()
+    for name in PROFILE_FIELDS:
+        if name not in row or row[name] in (None, ''):
+            continue
+        field = UserProfile._meta.get_field(name)
+        value = row[name]
+        if name in LIST_FIELDS:
+            value = _parse_list(value)
+        elif field.get_internal_type() == 'BooleanField':
+            value = _parse_bool(value)
+            if value is None and not field.null:
+                continue
+        else:
+            value = field.to_python(value)
+        setattr(profile, name, value)
+    profile.completed_steps = compute_completed_steps(profile)
+    profile.is_completed = profile.completed_steps == ALL_STEPS_MASK
+    return profile
+
+
+class BloggerImporter:
+    """on_reject(номер строки, телефон, причина) вызывается на каждую отклонённую строку."""
+
+    def __init__(self, batch_size=1000, workers=None, unusable_passwords=False, on_reject=None):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.unusable_passwords = unusable_passwords
+        self.on_reject = on_reject
+        self.created = 0
+        self.rejected = 0
+        self._pool = None
+        self._pool_size = 0
+
+    def __enter__(self):
+        if not self.unusable_passwords:
+            self._pool_size = self.workers or os.cpu_count() or 1
+            self._pool = ProcessPoolExecutor(
+                max_workers=self._pool_size,
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'mvp_backend.settings'),),
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def run(self, rows, progress=None):
+        batch = []
+        for line_number, row in rows:
+            batch.append((line_number, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+                if progress:
+                    progress(self.created, self.rejected)
+        if batch:
+            self.import_batch(batch)
+            if progress:
+                progress(self.created, self.rejected)
+
+    def reject(self, line_number, row, reason):
+        self.rejected += 1
+        if self.on_reject:
+            self.on_reject(line_number, str(row.get('phone_number', '')), reason)
+
+    def import_batch(self, batch):
+        candidates = []
+        seen = set()
+        for line_number, row in batch:
+            if '__error__' in row:
+                self.reject(line_number, row, row['__error__'])
+                continue
+            phone = to_python(str(row.get('phone_number') or '').strip(), region='RU')
+            if not phone or not phone.is_valid():
+                self.reject(line_number, row, 'invalid phone number')
+                continue
+            phone = phone.as_e164
+            if phone in seen:
+                self.reject(line_number, row, 'duplicate phone number in file')
+                continue
+            seen.add(phone)
+            user = User(
+                phone_number=phone,
+                first_name=row.get('first_name') or '',
+                last_name=row.get('last_name') or '',
+                email=User.objects.normalize_email(row.get('email') or ''),
+            )
+            try:
+                profile = _build_profile(row)
+                # Те же проверки полей, что при сохранении через модель: email, длины, choices
+                user.clean_fields(exclude=('password',))
+                profile.clean_fields(exclude=('user',))
+            except ValidationError as exc:
+                self.reject(line_number, row, f'invalid data: {_validation_message(exc)}')
+                continue
+            except (ValueError, TypeError) as exc:
+                self.reject(line_number, row, f'invalid profile data: {exc}')
+                continue
+            candidates.append((line_number, row, user, profile))
+
+        existing = set(
+            str(phone) for phone in User.objects.filter(phone_number__in=seen).values_list('phone_number', flat=True)
+        )
+        rows = []
+        for line_number, row, user, profile in candidates:
+            if str(user.phone_number) in existing:
+                self.reject(line_number, row, 'phone number already registered')
+            else:
+                rows.append((line_number, row, user, profile))
+        if not rows:
+            return
+
+        passwords = [None if self.unusable_passwords else (row.get('password') or None) for _, row, _, _ in rows]
+        hashes = self._hash_passwords(passwords)
+        for (_, _, user, _), password_hash in zip(rows, hashes):
+            user.password = password_hash
+
+        try:
+            self._save([(user, profile) for _, _, user, profile in rows])
+        except IntegrityError:
+            # Телефон зарегистрировали после сверки — пишем построчно, чтобы
+            # отклонить только конфликтующие строки, а не всю пачку
+            for line_number, row, user, profile in rows:
+                user.pk = profile.pk = None
+                user._state.adding = profile._state.adding = True
+                try:
+                    self._save([(user, profile)])
+                except IntegrityError as exc:
+                    if User.objects.filter(phone_number=user.phone_number).exists():
+                        self.reject(line_number, row, 'phone number already registered')
+                    else:
+                        self.reject(line_number, row, f'could not be saved: {exc}')
+                    continue
+                self.created += 1
+            return
+        self.created += len(rows)
+
+    def _save(self, pairs):
+        with transaction.atomic():
+            users = [user for user, _ in pairs]
+            User.objects.bulk_create(users)
+            profiles = []
+            for user, profile in pairs:
+                profile.user = user
+                profiles.append(profile)
+            UserProfile.objects.bulk_create(profiles)
+            ProfileAttribute.objects.bulk_create(
+                ProfileAttribute(profile=profile, attribute=attribute, value=value)
+                for profile in profiles
+                for attribute, value in profile_attributes(profile)
+            )
+            ProfileAudienceMetric.objects.bulk_create(row for profile in profiles for row in metric_rows(profile))
+            index_objects('profile', profiles)
+
+    def _hash_passwords(self, passwords):
+        # make_password(None) даёт непригодный пароль без дорогого хэширования
+        to_hash = [(index, password) for index, password in enumerate(passwords) if password]
+        hashes = [make_password(None) if not password else None for password in passwords]
+        if to_hash:
+            chunk = max(1, len(to_hash) // (4 * self._pool_size))
+            results = self._pool.map(_hash_password, [password for _, password in to_hash], chunksize=chunk)
+            for (index, _), password_hash in zip(to_hash, results):
+                hashes[index] = password_hash
+        return hashes
@@ -0,0 +1,151 @@
+"""Заполненность шагов анкеты из шести шагов.
+
+UserProfile.completed_steps — битовая маска: бит ``1 << (step - 1)`` стоит,
+когда заполнены все обязательные поля шага. Маска пересчитывается только для
+шагов с изменёнными полями и пишется тем же UPDATE, что и данные.
+"""
+
+PROFILE_STEPS = {
+    1: (
+        'full_name',
+        'has_self_employment',
+        'ready_for_self_employment',
+        'main_blog_link',
+        'social_links',
+        'country',
+        'city',
+        'age',
+        'gender',
+        'coverage_regions',
+        # Старые поля (для обратной совместимости)
+        'contact',
+        'date_of_birth',
+        'pickup_point',
+    ),
+    2: (
+        'platforms',
+        'blog_topics',
+        'blog_description',
+        'blog_experience',
+        'publication_frequency',
+    ),
+    3: (
+        'subscribers_by_platform',
+        'average_reach',
+        'audience_gender_age',
+        'audience_region',
+        'engagement_level',
+    ),
+    4: (
+        'has_collaborations',
+        'collaboration_examples',
+        'ready_to_share_results',
+        'ready_for_paid_ads',
+    ),
+    5: (
+        'collaboration_formats',
+        'ad_pricing',
+        'ready_for_barter',
+        'barter_categories',
+    ),
+    6: (
+        'ready_for_brand_projects',
+        'products_wont_advertise',
+        'blog_management',
+        'has_media_kit',
+        'media_kit_link',
+        'ready_for_blogger_community',
+        'additional_info',
+        'consent_privacy',
+        'consent_marketing_email',
+        'consent_marketing_calls',
+    ),
+}
+
+ALL_STEPS_MASK = (1 << len(PROFILE_STEPS)) - 1
+
+FIELD_STEPS = {field: step for step, fields in PROFILE_STEPS.items() for field in fields}
+
+
+def _text(value):
+    return bool(value and value.strip())
+
+
+def _list(value):
+    return bool(value and isinstance(value, list) and len(value) > 0)
+
+
+def _set(value):
+    return value is not None
+
+
+# Обязательные поля (помеченные * в форме) и проверка их заполненности
+REQUIRED_FIELDS = {
+    1: (
+        ('full_name', _text),
+        ('has_self_employment', _set),
+        ('ready_for_self_employment', _text),
+        ('main_blog_link', _text),
+        ('social_links', _list),
+        ('country', _text),
+        ('city', _text),
+        ('age', _set),
+        ('gender', _text),
+        ('coverage_regions', _text),
+    ),
+    2: (
+        ('platforms', _list),
+        ('blog_topics', _list),
+        ('blog_description', _text),
+        ('blog_experience', _text),
+        ('publication_frequency', _text),
+    ),
+    3: (
+        ('subscribers_by_platform', _list),
+        ('average_reach', _list),
+        ('engagement_level', _text),
+    ),
+    4: (
+        ('ready_to_share_results', _text),
+        ('ready_for_paid_ads', _text),
+    ),
+    5: (
+        ('collaboration_formats', _list),
+        ('ad_pricing', _list),
+        ('ready_for_barter', _text),
+        ('barter_categories', _list),
+    ),
+    6: (
+        ('ready_for_brand_projects', _text),
+        ('blog_management', _text),
+        # has_media_kit опциональное поле (может быть NULL)
+        ('ready_for_blogger_community', _text),
+        ('consent_privacy', bool),
+    ),
+}
+
+
+def is_step_complete(profile, step):
+    if not all(check(getattr(profile, field)) for field, check in REQUIRED_FIELDS[step]):
+        return False
+    # Если has_media_kit = True, то media_kit_link обязателен
+    if step == 6 and profile.has_media_kit is True and not _text(profile.media_kit_link):
+        return False
+    return True
+
+
+def steps_for_fields(fields):
+    return {FIELD_STEPS[field] for field in fields if field in FIELD_STEPS}
+
+
+def compute_completed_steps(profile, steps=None, mask=None):
+    """Битовая маска с пересчитанными шагами steps (по умолчанию всеми)."""
+    steps = PROFILE_STEPS if steps is None else steps
+    mask = 0 if mask is None else mask
+    for step in steps:
+        bit = 1 << (step - 1)
+        if is_step_complete(profile, step):
+            mask |= bit
+        else:
+            mask &= ~bit
+    return mask
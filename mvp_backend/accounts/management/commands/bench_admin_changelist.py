@@ -0,0 +1,131 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from accounts.models import User, UserProfile
+from search.index import SEARCH_TABLE, document_rowid, index_objects
+
+# Сгенерированные номера +7000XXXXXXX не пересекаются с настоящими
+PHONE_PREFIX = '+7000'
+COUNTRIES = ('Россия', 'Россия', 'Россия', 'Казахстан', 'Беларусь', 'Армения', '')
+CITIES = ('Москва', 'Казань', 'Новосибирск', 'Алматы', 'Минск', 'Ереван', 'Сочи')
+NAMES = ('Анна', 'Мария', 'Ольга', 'Иван', 'Пётр', 'Дарья', 'Алина', 'Сергей')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет списки пользователей и профилей в админке на большом объёме данных '
+        '(по умолчанию 1 000 000 сгенерированных пользователей).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого запроса (берётся медиана).')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true', help='Не удалять сгенерированные данные после замера.')
+
+    def handle(self, *args, **options):
+        existing = User.objects.filter(phone_number__startswith=PHONE_PREFIX).count()
+        if existing < options['rows']:
+            self._generate(existing, options['rows'], options['batch_size'])
+
+        admin_user = User.objects.create_superuser(phone_number=f'{PHONE_PREFIX}9999999', password='!')
+        try:
+            self._measure(admin_user, options['rows'], options['repeat'])
+        finally:
+            if options['keep']:
+                self._delete_users('id = %s', [admin_user.pk])
+            else:
+                self._delete_users('phone_number >= %s AND phone_number < %s', [PHONE_PREFIX, f'{PHONE_PREFIX[:-1]}1'])
+                self.stdout.write('Сгенерированные данные удалены.')
+
+    def _generate(self, start, total, batch_size):
+        started = time.perf_counter()
+        rng = random.Random(start)
+        for offset in range(start, total, batch_size):
+            numbers = range(offset, min(offset + batch_size, total))
+            with transaction.atomic():
+                users = User.objects.bulk_create(
+                    [User(phone_number=f'{PHONE_PREFIX}{number:07d}', password='!') for number in numbers]
+                )
+                profiles = UserProfile.objects.bulk_create(
+                    [
+                        UserProfile(
+                            user=user,
+                            full_name=f'{rng.choice(NAMES)} {number}',
+                            country=rng.choice(COUNTRIES),
+                            city=rng.choice(CITIES),
+                            contact=f'@blogger{number}' if number % 2 else f'8000{number:07d}',
+                            is_completed=number % 3 == 0,
+                            is_participating=number % 4 == 0,
+                        )
+                        for user, number in zip(users, numbers)
+                    ]
+                )
+                index_objects('profile', profiles)
+            self.stdout.write(f'  создано {numbers.stop} из {total} ({time.perf_counter() - started:.0f} с)')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _measure(self, admin_user, rows, repeat):
+        client = Client()
+        client.force_login(admin_user)
+        sample = f'8 000 {random.randrange(1000):03d}'
+        middle_page = max(rows // 200, 1)
+        scenarios = (
+            ('users: первая страница', '/admin/accounts/user/'),
+            (f'users: страница {middle_page}', f'/admin/accounts/user/?p={middle_page}'),
+            ('users: поиск телефона', f'/admin/accounts/user/?q={sample}'),
+            ('profiles: первая страница', '/admin/accounts/userprofile/'),
+            ('profiles: фильтр по стране', '/admin/accounts/userprofile/?country=Казахстан'),
+            ('profiles: поиск телефона', f'/admin/accounts/userprofile/?q={sample}'),
+            ('profiles: поиск имени', '/admin/accounts/userprofile/?q=Дарья'),
+        )
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, url in scenarios:
+                timings = []
+                for _ in range(repeat):
+                    reset_queries()
+                    with CaptureQueriesContext(connection) as ctx:
+                        started = time.perf_counter()
+                        response = client.get(url)
+                        timings.append(time.perf_counter() - started)
+                    assert response.status_code == 200, (url, response.status_code)
+                slowest = max(ctx.captured_queries, key=lambda query: float(query['time']))
+                self.stdout.write(
+                    f'{name}: {statistics.median(timings) * 1000:.0f} мс, SQL-запросов: {len(ctx.captured_queries)}, '
+                    f'самый долгий {float(slowest["time"]) * 1000:.0f} мс'
+                )
+
+        # Для сравнения — запросы стандартной админки, которых теперь нет
+        table = UserProfile._meta.db_table
+        for name, sql in (
+            ('COUNT(*) users', f'SELECT COUNT(*) FROM {User._meta.db_table}'),
+            ('DISTINCT country', f'SELECT DISTINCT country FROM {table} ORDER BY country'),
+            ('icontains contact', f"SELECT COUNT(*) FROM {table} WHERE contact LIKE '%000123%'"),
+        ):
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                cursor.fetchall()
+            self.stdout.write(f'  (без оптимизаций) {name}: {(time.perf_counter() - started) * 1000:.0f} мс')
+
+    def _delete_users(self, where, params):
+        # Сырые DELETE: ORM удалял бы миллион строк по одной с сигналами
+        users = f'SELECT id FROM {User._meta.db_table} WHERE {where}'
+        profiles = f'SELECT id FROM {UserProfile._meta.db_table} WHERE user_id IN ({users})'
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(profiles, params)
+            cursor.executemany(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+                [(document_rowid('profile', pk),) for pk, in cursor.fetchall()],
+            )
+            for table in ('accounts_profileattribute', 'accounts_profileaudiencemetric'):
+                cursor.execute(f'DELETE FROM {table} WHERE profile_id IN ({profiles})', params)
+            cursor.execute(f'DELETE FROM {UserProfile._meta.db_table} WHERE user_id IN ({users})', params)
+            cursor.execute(f'DELETE FROM {User._meta.db_table} WHERE id IN ({users})', params)
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from accounts.authentication import CachedTokenAuthentication, TokenUserCache
+from accounts.models import User
+
+# Сгенерированные номера +7001XXXXXXX не пересекаются с настоящими и с bench_admin_changelist (+7000)
+PHONE_PREFIX = '+7001'
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает TokenAuthentication и CachedTokenAuthentication по времени и числу запросов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=100, help='Число разных токенов в нагрузке.')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(phone_number__startswith=PHONE_PREFIX).exists():
+            raise CommandError(
+                f'Есть пользователи с номерами {PHONE_PREFIX}…: удалите их или дождитесь конца другого замера.'
+            )
+        users = User.objects.bulk_create(
+            [User(phone_number=f'{PHONE_PREFIX}{number:07d}', password='!') for number in range(options['users'])]
+        )
+        users = list(User.objects.filter(phone_number__in=[user.phone_number for user in users]))
+        try:
+            keys = [Token.objects.create(user=user).key for user in users]
+            cached = CachedTokenAuthentication()
+            cached.cache = TokenUserCache()
+            for name, backend in (('TokenAuthentication', TokenAuthentication()), ('CachedTokenAuthentication', cached)):
+                elapsed, queries = self._run(backend, keys, options['requests'])
+                self.stdout.write(
+                    f'{name}: {options["requests"]} запросов за {elapsed:.3f} с '
+                    f'({elapsed / options["requests"] * 1e6:.1f} мкс/запрос), SQL-запросов: {queries}'
+                )
+            self.stdout.write(f'Статистика кэша: {cached.cache.stats()}')
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def _run(self, backend, keys, count):
+        reset_queries()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            for index in range(count):
+                backend.authenticate_credentials(keys[index % len(keys)])
+            elapsed = time.perf_counter() - started
+        return elapsed, len(ctx.captured_queries)
@@ -0,0 +1,63 @@
+import csv
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand
+
+from accounts.bulk_import import BloggerImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует блогеров из CSV или JSONL (колонки: phone_number, password, first_name, '
+        'last_name, email и поля профиля). Списки в CSV — JSON или через «;».'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='По умолчанию определяется по расширению.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, help='Процессов для хэширования паролей.')
+        parser.add_argument(
+            '--unusable-passwords',
+            action='store_true',
+            help='Не хэшировать пароли из файла, а сделать их непригодными (вход через сброс пароля).',
+        )
+        parser.add_argument('--rejects', help='CSV-файл для отклонённых строк (строка, телефон, причина).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(created, rejected):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  создано {created}, отклонено {rejected} ({elapsed:.1f} с)')
+
+        with ExitStack() as stack:
+            # Отклонённые строки сразу уходят в файл (или первые 50 — в вывод), а не копятся в памяти
+            if options['rejects']:
+                handle = stack.enter_context(open(options['rejects'], 'w', encoding='utf-8', newline=''))
+                writer = csv.writer(handle)
+                writer.writerow(('line', 'phone_number', 'reason'))
+
+                def on_reject(*reject):
+                    writer.writerow(reject)
+            else:
+                def on_reject(line_number, phone, reason):
+                    if importer.rejected <= 50:
+                        self.stdout.write(self.style.WARNING(f'  строка {line_number} ({phone}): {reason}'))
+
+            importer = stack.enter_context(BloggerImporter(
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                unusable_passwords=options['unusable_passwords'],
+                on_reject=on_reject,
+            ))
+            importer.run(read_rows(options['path'], options['format']), progress=progress)
+
+        if not options['rejects'] and importer.rejected > 50:
+            self.stdout.write(self.style.WARNING(f'  ... и ещё {importer.rejected - 50}'))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: {importer.created}, отклонено: {importer.rejected} за {elapsed:.1f} с'
+        ))
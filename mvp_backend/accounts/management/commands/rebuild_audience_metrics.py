@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.audience import rebuild_metrics
+
+
+class Command(BaseCommand):
+    help = 'Заполняет метрики аудитории (ProfileAudienceMetric) из subscribers_by_platform и average_reach.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(processed):
+            self.stdout.write(f'  обработано профилей: {processed}')
+
+        processed = rebuild_metrics(batch_size=options['batch_size'], progress=progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Метрики пересчитаны: {processed} профилей за {elapsed:.1f} с'))
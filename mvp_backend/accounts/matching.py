@@ -0,0 +1,124 @@
+"""Инвертированный индекс для подбора тестеров по спискам и текстовым полям профиля.
+
+Профиль раскладывается на нормализованные пары (атрибут, значение) в
+ProfileAttribute; запрос пересекает списки профилей по запрошенным парам,
+начиная с самого короткого, и не загружает профили в Python.
+"""
+
+import re
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import ProfileAttribute, UserProfile
+from .rebuild import rebuild_profile_rows
+
+# JSON-списки строк
+LIST_ATTRIBUTES = ('platforms', 'blog_topics', 'barter_categories', 'collaboration_formats')
+# Свободный текст, перечисление через запятую/точку с запятой
+SPLIT_TEXT_ATTRIBUTES = ('coverage_regions',)
+# Одиночные значения
+SCALAR_ATTRIBUTES = ('city', 'country', 'ready_for_barter', 'gender')
+
+INDEXED_ATTRIBUTES = LIST_ATTRIBUTES + SPLIT_TEXT_ATTRIBUTES + SCALAR_ATTRIBUTES
+
+_SPLIT_RE = re.compile(r'[,;\n]+')
+_VALUE_MAX_LENGTH = ProfileAttribute._meta.get_field('value').max_length
+
+
+def normalize_value(value):
+    return ' '.join(str(value).split()).casefold()[:_VALUE_MAX_LENGTH]
+
+
+def profile_attributes(profile):
+    pairs = set()
+    for attribute in LIST_ATTRIBUTES:
+        values = getattr(profile, attribute) or []
+        if isinstance(values, list):
+            pairs.update((attribute, normalize_value(value)) for value in values if isinstance(value, str))
+    for attribute in SPLIT_TEXT_ATTRIBUTES:
+        text = getattr(profile, attribute) or ''
+        pairs.update((attribute, normalize_value(part)) for part in _SPLIT_RE.split(text))
+    for attribute in SCALAR_ATTRIBUTES:
+        value = getattr(profile, attribute)
+        if value:
+            pairs.add((attribute, normalize_value(value)))
+    return {(attribute, value) for attribute, value in pairs if value}
+
+
+def reindex_profile(profile):
+    """Приводит записи индекса профиля в соответствие с текущими значениями полей."""
+    wanted = profile_attributes(profile)
+    current = {
+        (attribute, value): pk
+        for pk, attribute, value in ProfileAttribute.objects.filter(profile=profile).values_list('pk', 'attribute', 'value')
+    }
+    stale = [pk for pair, pk in current.items() if pair not in wanted]
+    added = [
+        ProfileAttribute(profile=profile, attribute=attribute, value=value)
+        for attribute, value in wanted
+        if (attribute, value) not in current
+    ]
+    if not stale and not added:
+        return
+    with transaction.atomic():
+        if stale:
+            ProfileAttribute.objects.filter(pk__in=stale).delete()
+        if added:
+            ProfileAttribute.objects.bulk_create(added)
+
+
+def rebuild_index(batch_size=2000, progress=None):
+    """Перестраивает весь индекс; возвращает число обработанных профилей."""
+    return rebuild_profile_rows(
+        ProfileAttribute,
+        INDEXED_ATTRIBUTES,
+        lambda profile: [
+            ProfileAttribute(profile_id=profile.pk, attribute=attribute, value=value)
+            for attribute, value in profile_attributes(profile)
+        ],
+        batch_size=batch_size,
+        progress=progress,
+    )
+
+
+def clean_criteria(criteria):
+    """Проверяет критерии и возвращает {атрибут: [нормализованные значения]}.
+
+    Для неизвестных атрибутов и нестроковых значений поднимает ValueError.
+    """
+    cleaned = {}
+    for attribute, values in criteria.items():
+        if attribute not in INDEXED_ATTRIBUTES:
+            raise ValueError(f'Unknown attribute: {attribute}')
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, (list, tuple)) or not all(isinstance(value, str) for value in values):
+            raise ValueError(f'{attribute}: expected a string or a list of strings')
+        values = sorted({normalize_value(value) for value in values} - {''})
+        if values:
+            cleaned[attribute] = values
+    return cleaned
+
+
+def match_profiles(criteria):
+    """Queryset id подходящих профилей.
+
+    criteria — {индексируемый атрибут: значение или список значений}:
+    значения одного атрибута объединяются по ИЛИ, разные атрибуты — по И, например
+    ``{'city': 'Казань', 'platforms': 'Instagram', 'barter_categories': ['косметика']}``.
+    """
+    postings = [
+        ProfileAttribute.objects.filter(attribute=attribute, value__in=values)
+        for attribute, values in clean_criteria(criteria).items()
+    ]
+    if not postings:
+        return UserProfile.objects.values_list('pk', flat=True)
+
+    # Ведём пересечение от самого короткого списка: для каждой его записи
+    # остальные списки проверяются точечным поиском по (attribute, value, profile)
+    postings.sort(key=lambda posting: posting.count())
+    result = postings[0]
+    for posting in postings[1:]:
+        result = result.filter(Exists(posting.filter(profile_id=OuterRef('profile_id'))))
+    return result.values_list('profile_id', flat=True).distinct()
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_user_options_alter_userprofile_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileAttribute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attribute', models.CharField(max_length=50, verbose_name='Атрибут')),
+                ('value', models.CharField(max_length=255, verbose_name='Значение')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attributes', to='accounts.userprofile')),
+            ],
+            options={
+                'verbose_name': 'Атрибут профиля',
+                'verbose_name_plural': 'Атрибуты профилей',
+                'constraints': [models.UniqueConstraint(fields=('attribute', 'value', 'profile'), name='profileattribute_posting_uniq')],
+            },
+        ),
+    ]
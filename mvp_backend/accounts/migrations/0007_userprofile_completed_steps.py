@@ -0,0 +1,102 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:27
+
+from django.db import migrations, models
+
+# Снимок accounts.completeness на момент миграции: код приложения может измениться,
+# а миграция должна заполнять маску по тем же правилам
+
+
+def _text(value):
+    return bool(value and value.strip())
+
+
+def _list(value):
+    return bool(value and isinstance(value, list) and len(value) > 0)
+
+
+def _set(value):
+    return value is not None
+
+
+REQUIRED_FIELDS = {
+    1: (
+        ('full_name', _text),
+        ('has_self_employment', _set),
+        ('ready_for_self_employment', _text),
+        ('main_blog_link', _text),
+        ('social_links', _list),
+        ('country', _text),
+        ('city', _text),
+        ('age', _set),
+        ('gender', _text),
+        ('coverage_regions', _text),
+    ),
+    2: (
+        ('platforms', _list),
+        ('blog_topics', _list),
+        ('blog_description', _text),
+        ('blog_experience', _text),
+        ('publication_frequency', _text),
+    ),
+    3: (
+        ('subscribers_by_platform', _list),
+        ('average_reach', _list),
+        ('engagement_level', _text),
+    ),
+    4: (
+        ('ready_to_share_results', _text),
+        ('ready_for_paid_ads', _text),
+    ),
+    5: (
+        ('collaboration_formats', _list),
+        ('ad_pricing', _list),
+        ('ready_for_barter', _text),
+        ('barter_categories', _list),
+    ),
+    6: (
+        ('ready_for_brand_projects', _text),
+        ('blog_management', _text),
+        ('ready_for_blogger_community', _text),
+        ('consent_privacy', bool),
+    ),
+}
+
+
+def compute_completed_steps(profile):
+    mask = 0
+    for step, fields in REQUIRED_FIELDS.items():
+        complete = all(check(getattr(profile, field)) for field, check in fields)
+        if step == 6 and profile.has_media_kit is True and not _text(profile.media_kit_link):
+            complete = False
+        if complete:
+            mask |= 1 << (step - 1)
+    return mask
+
+
+def backfill_completed_steps(apps, schema_editor):
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    batch = []
+    for profile in UserProfile.objects.iterator(chunk_size=2000):
+        profile.completed_steps = compute_completed_steps(profile)
+        batch.append(profile)
+        if len(batch) >= 2000:
+            UserProfile.objects.bulk_update(batch, ('completed_steps',))
+            batch = []
+    if batch:
+        UserProfile.objects.bulk_update(batch, ('completed_steps',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_profileattribute'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='completed_steps',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Заполненные шаги (битовая маска)'),
+        ),
+        migrations.RunPython(backfill_completed_steps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_refreshtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileAudienceMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(max_length=50, verbose_name='Платформа')),
+                ('subscribers', models.PositiveIntegerField(blank=True, null=True, verbose_name='Подписчики')),
+                ('reach', models.PositiveIntegerField(blank=True, null=True, verbose_name='Средний охват')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audience_metrics', to='accounts.userprofile')),
+            ],
+            options={
+                'verbose_name': 'Метрика аудитории',
+                'verbose_name_plural': 'Метрики аудитории',
+                'indexes': [models.Index(fields=['platform', 'subscribers'], name='audiencemetric_subscribers_idx'), models.Index(fields=['platform', 'reach'], name='audiencemetric_reach_idx')],
+                'constraints': [models.UniqueConstraint(fields=('profile', 'platform'), name='audiencemetric_profile_platform_uniq')],
+            },
+        ),
+    ]
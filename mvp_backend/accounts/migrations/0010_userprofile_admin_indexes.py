@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_profileaudiencemetric'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['country'], name='userprofile_country_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['contact'], name='userprofile_contact_idx'),
+        ),
+    ]
@@ -193,14 +193,80 @@ class UserProfile(models.Model):
     pickup_point = models.CharField(max_length=255, blank=True, null=True, verbose_name='ПВЗ')
 
     # Статусы
+    completed_steps = models.PositiveSmallIntegerField(default=0, verbose_name='Заполненные шаги (битовая маска)')
     is_completed = models.BooleanField(default=False, verbose_name='Профиль заполнен')
     is_participating = models.BooleanField(default=False, verbose_name='Участвует в заказах')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        indexes = (
+            # Фильтр по стране и поиск контакта префиксом в админке
+            models.Index(fields=('country',), name='userprofile_country_idx'),
+            models.Index(fields=('contact',), name='userprofile_contact_idx'),
+        )
         verbose_name = 'Профиль пользователя'
         verbose_name_plural = 'Профили пользователей'
 
     def __str__(self):
         return f'Профиль({self.user_id})'
+
+
+class ProfileAttribute(models.Model):
+    """Запись индекса подбора тестеров: (атрибут, значение) -> профиль."""
+
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='attributes')
+    attribute = models.CharField(max_length=50, verbose_name='Атрибут')
+    value = models.CharField(max_length=255, verbose_name='Значение')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('attribute', 'value', 'profile'), name='profileattribute_posting_uniq'),
+        )
+        verbose_name = 'Атрибут профиля'
+        verbose_name_plural = 'Атрибуты профилей'
+
+    def __str__(self):
+        return f'{self.attribute}={self.value} ({self.profile_id})'
+
+
+class ProfileAudienceMetric(models.Model):
+    """Размер аудитории по платформе, разобранный из subscribers_by_platform / average_reach."""
+
+    TOTAL_PLATFORM = '*'
+
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='audience_metrics')
+    platform = models.CharField(max_length=50, verbose_name='Платформа')
+    subscribers = models.PositiveIntegerField(null=True, blank=True, verbose_name='Подписчики')
+    reach = models.PositiveIntegerField(null=True, blank=True, verbose_name='Средний охват')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('profile', 'platform'), name='audiencemetric_profile_platform_uniq'),
+        )
+        indexes = (
+            models.Index(fields=('platform', 'subscribers'), name='audiencemetric_subscribers_idx'),
+            models.Index(fields=('platform', 'reach'), name='audiencemetric_reach_idx'),
+        )
+        verbose_name = 'Метрика аудитории'
+        verbose_name_plural = 'Метрики аудитории'
+
+    def __str__(self):
+        return f'{self.platform}: {self.subscribers}/{self.reach} ({self.profile_id})'
+
+
+class RefreshToken(models.Model):
+    """Refresh-токен на сервере; хранится только SHA-256 секрета."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='refresh_tokens')
+    token_hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Refresh-токен'
+        verbose_name_plural = 'Refresh-токены'
+
+    def __str__(self):
+        return f'RefreshToken({self.user_id})'
@@ -0,0 +1,40 @@
+"""Перестройка таблиц, производных от профиля (индекс атрибутов, метрики аудитории)."""
+
+from django.db import transaction
+
+from .models import UserProfile
+
+
+def rebuild_profile_rows(model, fields, build_rows, batch_size=2000, progress=None):
+    """Заменяет строки model всех профилей пачками по batch_size.
+
+    Профили читаются через iterator() только с полями fields; build_rows(profile)
+    возвращает несохранённые строки профиля. Каждая пачка — одна транзакция:
+    удаление старых строк и bulk_create новых. progress(processed) вызывается
+    после каждой пачки. Возвращает число обработанных профилей.
+    """
+    processed = 0
+    batch = []
+
+    def flush(profiles):
+        with transaction.atomic():
+            model.objects.filter(profile_id__in=[profile.pk for profile in profiles]).delete()
+            model.objects.bulk_create(
+                [row for profile in profiles for row in build_rows(profile)],
+                batch_size=batch_size,
+            )
+
+    for profile in UserProfile.objects.only('id', *fields).order_by('pk').iterator(chunk_size=batch_size):
+        batch.append(profile)
+        if len(batch) >= batch_size:
+            flush(batch)
+            processed += len(batch)
+            batch = []
+            if progress:
+                progress(processed)
+    if batch:
+        flush(batch)
+        processed += len(batch)
+        if progress:
+            progress(processed)
+    return processed
@@ -3,7 +3,9 @@ from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 from phonenumber_field.serializerfields import PhoneNumberField
 
-from .models import User, UserProfile
+from .audience import normalize_platform
+from .completeness import ALL_STEPS_MASK, PROFILE_STEPS, compute_completed_steps, steps_for_fields
+from .models import ProfileAudienceMetric, User, UserProfile
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -49,6 +51,10 @@ class LoginSerializer(serializers.Serializer):
         return attrs
 
 
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
@@ -106,12 +112,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'date_of_birth',
             'pickup_point',
             # Статусы
+            'completed_steps',
             'is_completed',
             'is_participating',
             'created_at',
             'updated_at',
         )
-        read_only_fields = ('created_at', 'updated_at', 'is_participating', 'is_completed')
+        read_only_fields = ('created_at', 'updated_at', 'is_participating', 'is_completed', 'completed_steps')
 
     def validate(self, attrs):
         # Конвертируем пустые строки в None для опциональных полей
@@ -143,71 +150,41 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return attrs
 
     def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+
+        # Пересчитываем только шаги, чьи поля пришли в запросе, и пишем всё одним UPDATE
+        instance.completed_steps = compute_completed_steps(
+            instance,
+            steps=steps_for_fields(validated_data),
+            mask=instance.completed_steps,
+        )
+        instance.is_completed = instance.completed_steps == ALL_STEPS_MASK
+        update_fields = (*validated_data, 'completed_steps', 'is_completed', 'updated_at')
+
         try:
-            instance = super().update(instance, validated_data)
+            instance.save(update_fields=update_fields)
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f'Error updating profile instance: {str(e)}')
             raise
 
-        # Проверка обязательных полей (помеченных * в форме)
-        try:
-            required_fields = [
-                # Шаг 1
-                bool(instance.full_name and instance.full_name.strip()),
-                instance.has_self_employment is not None,
-                bool(instance.ready_for_self_employment and instance.ready_for_self_employment.strip()),
-                bool(instance.main_blog_link and instance.main_blog_link.strip()),
-                bool(instance.social_links and isinstance(instance.social_links, list) and len(instance.social_links) > 0),
-                bool(instance.country and instance.country.strip()),
-                bool(instance.city and instance.city.strip()),
-                instance.age is not None,
-                bool(instance.gender and instance.gender.strip()),
-                bool(instance.coverage_regions and instance.coverage_regions.strip()),
-                # Шаг 2
-                bool(instance.platforms and isinstance(instance.platforms, list) and len(instance.platforms) > 0),
-                bool(instance.blog_topics and isinstance(instance.blog_topics, list) and len(instance.blog_topics) > 0),
-                bool(instance.blog_description and instance.blog_description.strip()),
-                bool(instance.blog_experience and instance.blog_experience.strip()),
-                bool(instance.publication_frequency and instance.publication_frequency.strip()),
-                # Шаг 3
-                bool(instance.subscribers_by_platform and isinstance(instance.subscribers_by_platform, list) and len(instance.subscribers_by_platform) > 0),
-                bool(instance.average_reach and isinstance(instance.average_reach, list) and len(instance.average_reach) > 0),
-                bool(instance.engagement_level and instance.engagement_level.strip()),
-                # Шаг 4
-                bool(instance.ready_to_share_results and instance.ready_to_share_results.strip()),
-                bool(instance.ready_for_paid_ads and instance.ready_for_paid_ads.strip()),
-                # Шаг 5
-                bool(instance.collaboration_formats and isinstance(instance.collaboration_formats, list) and len(instance.collaboration_formats) > 0),
-                bool(instance.ad_pricing and isinstance(instance.ad_pricing, list) and len(instance.ad_pricing) > 0),
-                bool(instance.ready_for_barter and instance.ready_for_barter.strip()),
-                bool(instance.barter_categories and isinstance(instance.barter_categories, list) and len(instance.barter_categories) > 0),
-                # Шаг 6
-                bool(instance.ready_for_brand_projects and instance.ready_for_brand_projects.strip()),
-                bool(instance.blog_management and instance.blog_management.strip()),
-                # has_media_kit теперь опциональное поле (может быть NULL)
-                bool(instance.ready_for_blogger_community and instance.ready_for_blogger_community.strip()),
-                instance.consent_privacy,
-            ]
-
-            # Если has_media_kit = True, то media_kit_link обязателен
-            if instance.has_media_kit is True and not (instance.media_kit_link and instance.media_kit_link.strip()):
-                required_fields.append(False)
-
-            is_completed = all(required_fields)
-            if instance.is_completed != is_completed:
-                instance.is_completed = is_completed
-                instance.save(update_fields=('is_completed', 'updated_at'))
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f'Error checking required fields: {str(e)}')
-            # Не прерываем сохранение, если ошибка в проверке обязательных полей
-
         return instance
 
 
+def profile_step_serializer(step):
+    """Сериализатор одного шага анкеты: принимает и валидирует только его поля."""
+    fields = PROFILE_STEPS[step]
+
+    class Meta(UserProfileSerializer.Meta):
+        pass
+
+    Meta.fields = (*fields, 'completed_steps', 'is_completed', 'updated_at')
+    Meta.read_only_fields = ('completed_steps', 'is_completed', 'updated_at')
+    return type(f'UserProfileStep{step}Serializer', (UserProfileSerializer,), {'Meta': Meta})
+
+
 class ParticipationSerializer(serializers.Serializer):
     is_participating = serializers.BooleanField()
 
@@ -216,3 +193,43 @@ class ParticipationSerializer(serializers.Serializer):
         instance.save(update_fields=('is_participating', 'updated_at'))
         return instance
 
+
+class TesterListFilterSerializer(serializers.Serializer):
+    ORDERING_CHOICES = ('subscribers', '-subscribers', 'reach', '-reach')
+
+    platform = serializers.CharField(max_length=50, required=False, default=ProfileAudienceMetric.TOTAL_PLATFORM)
+    min_subscribers = serializers.IntegerField(min_value=0, required=False)
+    max_subscribers = serializers.IntegerField(min_value=0, required=False)
+    min_reach = serializers.IntegerField(min_value=0, required=False)
+    max_reach = serializers.IntegerField(min_value=0, required=False)
+    city = serializers.CharField(max_length=255, required=False)
+    participating = serializers.BooleanField(required=False, allow_null=True, default=None)
+    completed = serializers.BooleanField(required=False, allow_null=True, default=None)
+    ordering = serializers.ChoiceField(choices=ORDERING_CHOICES, required=False, default='-subscribers')
+
+    def validate_platform(self, value):
+        return value if value == ProfileAudienceMetric.TOTAL_PLATFORM else normalize_platform(value)
+
+
+class TesterListSerializer(serializers.ModelSerializer):
+    user_id = serializers.IntegerField(source='profile.user_id', read_only=True)
+    phone_number = serializers.CharField(source='profile.user.phone_number', read_only=True)
+    full_name = serializers.CharField(source='profile.full_name', read_only=True)
+    city = serializers.CharField(source='profile.city', read_only=True)
+    is_completed = serializers.BooleanField(source='profile.is_completed', read_only=True)
+    is_participating = serializers.BooleanField(source='profile.is_participating', read_only=True)
+
+    class Meta:
+        model = ProfileAudienceMetric
+        fields = (
+            'user_id',
+            'phone_number',
+            'full_name',
+            'city',
+            'is_completed',
+            'is_participating',
+            'platform',
+            'subscribers',
+            'reach',
+        )
+        read_only_fields = fields
@@ -1,6 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
 
+from .audience import METRIC_FIELDS, sync_profile_metrics
+from .authentication import token_cache
+from .matching import INDEXED_ATTRIBUTES, reindex_profile
 from .models import User, UserProfile
 
 
@@ -9,3 +13,33 @@ def ensure_user_profile_exists(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.get_or_create(user=instance)
 
+
+@receiver(post_save, sender=UserProfile)
+def update_profile_matching_index(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(INDEXED_ATTRIBUTES):
+        return
+    if created and not any(getattr(instance, attribute) for attribute in INDEXED_ATTRIBUTES):
+        return
+    reindex_profile(instance)
+
+
+@receiver(post_save, sender=UserProfile)
+def update_profile_audience_metrics(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(METRIC_FIELDS):
+        return
+    if created and not any(getattr(instance, field) for field in METRIC_FIELDS):
+        return
+    sync_profile_metrics(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    # Любое изменение пользователя (в т.ч. деактивация) сбрасывает кэш его токенов
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.invalidate_key(instance.key)
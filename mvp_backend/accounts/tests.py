@@ -1,3 +1,412 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+
+from mvp_backend.admin_tools import phone_prefix
+from orders.tests import PurchasesTableMixin
+
+from .authentication import (
+    CachedTokenAuthentication,
+    SignedAccessTokenAuthentication,
+    TokenUserCache,
+    token_cache,
+)
+from .bulk_import import BloggerImporter, read_rows
+from .matching import match_profiles
+from .models import ProfileAttribute, ProfileAudienceMetric, User, UserProfile
+from .tokens import issue_access_token
+
+
+class TesterMatchingIndexTests(TestCase):
+    def create_profile(self, phone_number, **fields):
+        user = User.objects.create_user(phone_number=phone_number, password='secret-pass-1')
+        profile = user.profile
+        for name, value in fields.items():
+            setattr(profile, name, value)
+        profile.save()
+        return profile
+
+    def setUp(self):
+        self.kazan = self.create_profile(
+            '+79990001001',
+            city='Казань',
+            platforms=['Instagram', 'Telegram'],
+            barter_categories=['Косметика'],
+            coverage_regions='Казань, Татарстан',
+        )
+        self.moscow = self.create_profile('+79990001002', city='Москва', platforms=['Instagram'])
+
+    def test_intersects_posting_lists(self):
+        matched = set(match_profiles({'city': 'казань', 'platforms': 'INSTAGRAM', 'barter_categories': ['косметика']}))
+        self.assertEqual(matched, {self.kazan.pk})
+        self.assertEqual(set(match_profiles({'platforms': 'instagram'})), {self.kazan.pk, self.moscow.pk})
+        self.assertEqual(set(match_profiles({'coverage_regions': 'татарстан'})), {self.kazan.pk})
+
+    def test_index_follows_profile_save(self):
+        self.kazan.platforms = ['VK']
+        self.kazan.save()
+        self.assertFalse(match_profiles({'platforms': 'instagram', 'city': 'казань'}).exists())
+        self.assertEqual(
+            set(ProfileAttribute.objects.filter(profile=self.kazan, attribute='platforms').values_list('value', flat=True)),
+            {'vk'},
+        )
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(ValueError):
+            match_profiles({'password': 'x'})
+
+    def test_staff_endpoint(self):
+        staff = User.objects.create_user(phone_number='+79990001003', password='secret-pass-1', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+        response = client.get('/api/profiles/match/', {'platforms': ['Instagram'], 'city': 'Москва'})
+        self.assertEqual(response.data, {'count': 1, 'user_ids': [self.moscow.user_id]})
+
+
+class ProfileStepTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990002001', password='secret-pass-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_step_patch_is_a_single_update(self):
+        payload = {
+            'platforms': ['Instagram'],
+            'blog_topics': ['Косметика'],
+            'blog_description': 'Про уход',
+            'blog_experience': '1-2years',
+            'publication_frequency': 'daily',
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch('/api/profile/me/steps/2/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['completed_steps'], 0b10)
+        self.assertFalse(response.data['is_completed'])
+
+        writes = [query['sql'] for query in ctx.captured_queries if query['sql'].startswith('UPDATE "accounts_userprofile"')]
+        self.assertEqual(len(writes), 1)
+        self.assertNotIn('"full_name"', writes[0])
+
+    def test_rejects_fields_of_other_steps(self):
+        response = self.client.patch('/api/profile/me/steps/2/', {'city': 'Казань'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_step(self):
+        response = self.client.patch('/api/profile/me/steps/7/', {}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class AudienceMetricTests(TestCase):
+    def create_profile(self, phone_number, subscribers, reach=()):
+        user = User.objects.create_user(phone_number=phone_number, password='secret-pass-1')
+        profile = user.profile
+        profile.subscribers_by_platform = list(subscribers)
+        profile.average_reach = list(reach)
+        profile.is_participating = True
+        profile.save()
+        return profile
+
+    def setUp(self):
+        self.big = self.create_profile('+79990004001', ['Instagram: 120k', 'ТГ — 5 000'], ['инстаграм: 9 тыс'])
+        self.small = self.create_profile('+79990004002', ['Instagram: 40 000'], ['Instagram stories: 12000'])
+        self.youtube = self.create_profile('+79990004003', ['YouTube: 1,2 млн'])
+        staff = User.objects.create_user(phone_number='+79990004009', password='secret-pass-1', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(staff)
+
+    def test_metrics_are_parsed_and_synced_on_save(self):
+        metrics = {
+            platform: (subscribers, reach)
+            for platform, subscribers, reach in self.big.audience_metrics.values_list('platform', 'subscribers', 'reach')
+        }
+        self.assertEqual(metrics, {'Instagram': (120000, 9000), 'Telegram': (5000, None), '*': (125000, 9000)})
+
+        self.big.subscribers_by_platform = ['VK: 300']
+        self.big.average_reach = []
+        self.big.save()
+        self.assertEqual(
+            set(self.big.audience_metrics.values_list('platform', 'subscribers')), {('VK', 300), ('*', 300)}
+        )
+
+    def test_filter_and_sort(self):
+        response = self.client.get(
+            '/api/profiles/testers/', {'platform': 'instagram', 'min_subscribers': 30000, 'ordering': '-reach'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['user_id'], item['reach']) for item in response.data['results']],
+            [(self.small.user_id, 12000), (self.big.user_id, 9000)],
+        )
+
+        response = self.client.get('/api/profiles/testers/', {'min_subscribers': 100000})
+        self.assertEqual(
+            [item['user_id'] for item in response.data['results']], [self.youtube.user_id, self.big.user_id]
+        )
+        self.assertEqual(self.client.get('/api/profiles/testers/', {'ordering': 'city'}).status_code, 400)
+
+    def test_rebuild_command(self):
+        ProfileAudienceMetric.objects.all().delete()
+        call_command('rebuild_audience_metrics', stdout=StringIO())
+        self.assertEqual(ProfileAudienceMetric.objects.filter(platform='*').count(), 3)
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(phone_number='+79990005000', password='secret-pass-1')
+        for index in range(3):
+            user = User.objects.create_user(phone_number=f'+7999000510{index}', password='secret-pass-1')
+            UserProfile.objects.filter(user=user).update(country='Казахстан' if index else 'Россия')
+        self.client.force_login(self.admin)
+
+    def test_phone_search_is_an_index_prefix(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/admin/accounts/user/', {'q': '8 999 000 51'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+        sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+        self.assertIn('"phone_number" >= ', sql)
+        self.assertNotIn('LIKE', sql)
+
+    def test_punctuation_only_search_is_not_a_phone(self):
+        for term in ('---', '( )'):
+            self.assertIsNone(phone_prefix(term))
+            self.assertEqual(self.client.get('/admin/accounts/user/', {'q': term}).status_code, 200)
+            self.assertEqual(self.client.get('/admin/accounts/userprofile/', {'q': term}).status_code, 200)
+
+    def test_profile_search_covers_country_and_contact(self):
+        UserProfile.objects.filter(user__phone_number='+79990005101').update(contact='@anna')
+        for profile in UserProfile.objects.all():
+            profile.save()
+        for term, expected in (('Казахстан', 2), ('@anna', 1)):
+            response = self.client.get('/admin/accounts/userprofile/', {'q': term})
+            self.assertEqual(len(response.context['cl'].result_list), expected, term)
+        self.assertContains(response, 'последние 10000 совпадений')
+
+    def test_profile_changelist_country_choices_are_cached(self):
+        cache.clear()
+        self.client.get('/admin/accounts/userprofile/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/admin/accounts/userprofile/', {'country': 'Казахстан'})
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+        self.assertFalse(any('DISTINCT' in query['sql'] for query in ctx.captured_queries))
+
+
+class ProfileReadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990002101', password='secret-pass-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_get_is_read_only_and_cached(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get('/api/profile/me/').status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/profile/me/')
+        self.assertEqual(response.data['user']['phone_number'], '+79990002101')
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertTrue(ctx.captured_queries[0]['sql'].startswith('SELECT'))
+
+    def test_write_invalidates_cached_profile(self):
+        self.client.get('/api/profile/me/')
+        self.client.patch('/api/profile/me/', {'city': 'Казань'}, format='json')
+        self.assertEqual(self.client.get('/api/profile/me/').data['city'], 'Казань')
+
+    def test_missing_profile_is_not_created_on_get(self):
+        UserProfile.objects.filter(user=self.user).delete()
+        response = self.client.get('/api/profile/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UserProfile.objects.filter(user=self.user).exists())
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(phone_number='+79990003001', password='secret-pass-1')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_second_lookup_is_served_from_cache(self):
+        self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+        self.assertGreaterEqual(token_cache.stats()['hits'], 1)
+
+    def test_deactivated_user_is_rejected(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_deleted_token_is_rejected(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_lru_eviction(self):
+        cache = TokenUserCache(max_size=1)
+        cache.set('a', self.user, self.token)
+        cache.set('b', self.user, self.token)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+
+class BenchTokenAuthTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990003002', password='secret-pass-1')
+
+    def test_bench_removes_only_its_own_users(self):
+        call_command('bench_token_auth', requests=20, users=3, stdout=StringIO())
+        self.assertFalse(User.objects.filter(phone_number__startswith='+7001').exists())
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_bench_refuses_to_reuse_reserved_numbers(self):
+        User.objects.create_user(phone_number='+70010000000', password='secret-pass-1')
+        with self.assertRaises(CommandError):
+            call_command('bench_token_auth', requests=1, users=1, stdout=StringIO())
+        self.assertTrue(User.objects.filter(phone_number='+70010000000').exists())
+
+
+class SignedAccessTokenTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(phone_number='+79990004001', password='secret-pass-1')
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post(
+            '/api/auth/login/',
+            {'phone_number': '+79990004001', 'password': 'secret-pass-1'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.data)
+        return response.data
+
+    def test_bearer_authentication_needs_no_query_when_cached(self):
+        access = self.login()['access']
+        auth = SignedAccessTokenAuthentication()
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        auth.authenticate(request)
+        with self.assertNumQueries(0):
+            user, _ = auth.authenticate(request)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_expired_access_token(self):
+        with self.settings(ACCESS_TOKEN_LIFETIME=-1):
+            access, _ = issue_access_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get('/api/profile/me/').status_code, 401)
+
+    def test_refresh_rotates_and_revokes(self):
+        refresh = self.login()['refresh']
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], refresh)
+
+        reused = self.client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(reused.status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.client.get('/api/profile/me/').status_code, 200)
+
+
+class BloggerImportTests(TestCase):
+    def write_csv(self, content):
+        handle = tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False)
+        with handle:
+            handle.write(content)
+        self.addCleanup(os.remove, handle.name)
+        return handle.name
+
+    def test_import_rejects_bad_rows_and_indexes_profiles(self):
+        path = self.write_csv(
+            'phone_number,password,first_name,city,platforms,has_self_employment\n'
+            '89990002001,,Анна,Казань,"[""Instagram""]",да\n'
+            '89990002002,,Ольга,Москва,Telegram;VK,нет\n'
+            'abc,,Bad,,,\n'
+            '89990002001,,Dup,,,\n'
+            '89990002003,,Bool,,,maybe\n'
+        )
+        User.objects.create_user(phone_number='+79990002002', password='secret-pass-1')
+
+        rejected = []
+        with BloggerImporter(unusable_passwords=True, on_reject=lambda *reject: rejected.append(reject)) as importer:
+            importer.run(read_rows(path))
+
+        self.assertEqual((importer.created, importer.rejected), (1, 4))
+        self.assertEqual(
+            sorted(reason for _, _, reason in rejected),
+            [
+                'duplicate phone number in file',
+                'invalid phone number',
+                'invalid profile data: not a boolean: maybe',
+                'phone number already registered',
+            ],
+        )
+        user = User.objects.get(phone_number='+79990002001')
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(user.profile.platforms, ['Instagram'])
+        self.assertTrue(user.profile.has_self_employment)
+        self.assertEqual(list(match_profiles({'city': 'Казань'})), [user.profile.pk])
+
+    def test_import_runs_model_field_validators(self):
+        path = self.write_csv(
+            'phone_number,email,gender\n'
+            '89990002011,anna@example.com,\n'
+            '89990002012,not-an-email,\n'
+            '89990002013,,unknown\n'
+        )
+        rejected = []
+        with BloggerImporter(unusable_passwords=True, on_reject=lambda *reject: rejected.append(reject)) as importer:
+            importer.run(read_rows(path))
+
+        self.assertEqual(importer.created, 1)
+        reasons = sorted(reason for _, _, reason in rejected)
+        self.assertEqual(len(reasons), 2)
+        self.assertTrue(reasons[0].startswith('invalid data: email: '))
+        self.assertTrue(reasons[1].startswith('invalid data: gender: '))
+        self.assertEqual(User.objects.get(phone_number='+79990002011').email, 'anna@example.com')
+
+    def test_phone_registered_after_check_rejects_only_that_row(self):
+        path = self.write_csv('phone_number,first_name\n89990002021,Анна\n89990002022,Ольга\n')
+        rejected = []
+        importer = BloggerImporter(unusable_passwords=True, on_reject=lambda *reject: rejected.append(reject))
+        hash_passwords = importer._hash_passwords
+
+        def register_meanwhile(passwords):
+            # Параллельная регистрация между сверкой телефонов и записью пачки
+            User.objects.create_user(phone_number='+79990002022', password='secret-pass-1')
+            return hash_passwords(passwords)
+
+        with importer, mock.patch.object(importer, '_hash_passwords', register_meanwhile):
+            importer.run(read_rows(path))
+
+        self.assertEqual(importer.created, 1)
+        self.assertEqual(rejected, [(3, '89990002022', 'phone number already registered')])
+        self.assertTrue(UserProfile.objects.filter(user__phone_number='+79990002021').exists())
+
+    def test_command_writes_rejects_file(self):
+        path = self.write_csv('phone_number,password\nabc,\n')
+        rejects = self.write_csv('')
+        call_command('import_bloggers', path, unusable_passwords=True, rejects=rejects, stdout=StringIO())
+        with open(rejects, encoding='utf-8') as handle:
+            self.assertIn('invalid phone number', handle.read())
 
-# Create your tests here.
+        out = StringIO()
+        call_command('import_bloggers', path, unusable_passwords=True, stdout=out)
+        self.assertIn('строка 2 (abc): invalid phone number', out.getvalue())
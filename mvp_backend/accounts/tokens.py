@@ -0,0 +1,98 @@
+"""Короткоживущие подписанные access-токены и серверные refresh-токены.
+
+Access-токен — ``{'u': user_id, 'e': срок}`` с HMAC-подписью
+(django.core.signing), поэтому его проверка не обращается к БД. Refresh-токен
+— случайный секрет, в RefreshToken хранится только его SHA-256; при каждом
+использовании он заменяется новым и может быть отозван.
+"""
+
+import hashlib
+import secrets
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RefreshToken
+
+ACCESS_TOKEN_SALT = 'accounts.access'
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _access_lifetime():
+    return getattr(settings, 'ACCESS_TOKEN_LIFETIME', 300)
+
+
+def _refresh_lifetime():
+    return getattr(settings, 'REFRESH_TOKEN_LIFETIME', 30 * 24 * 3600)
+
+
+def issue_access_token(user):
+    expires = int(time.time()) + _access_lifetime()
+    token = signing.Signer(salt=ACCESS_TOKEN_SALT).sign_object({'u': user.pk, 'e': expires})
+    return token, expires
+
+
+def verify_access_token(token):
+    """id пользователя из действительного и не истёкшего access-токена."""
+    try:
+        payload = signing.Signer(salt=ACCESS_TOKEN_SALT).unsign_object(token)
+        user_id, expires = payload['u'], payload['e']
+    except (signing.BadSignature, KeyError, TypeError, ValueError) as exc:
+        raise InvalidToken('Invalid access token.') from exc
+    if expires < time.time():
+        raise InvalidToken('Access token has expired.')
+    return user_id
+
+
+def _hash(raw):
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def issue_refresh_token(user):
+    raw = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        user=user,
+        token_hash=_hash(raw),
+        expires_at=timezone.now() + timedelta(seconds=_refresh_lifetime()),
+    )
+    return raw
+
+
+def issue_token_pair(user):
+    access, expires = issue_access_token(user)
+    return {
+        'access': access,
+        'access_expires_at': expires,
+        'refresh': issue_refresh_token(user),
+    }
+
+
+def rotate_refresh_token(raw):
+    """Отзывает refresh-токен и возвращает (пользователь, новая пара токенов)."""
+    now = timezone.now()
+    with transaction.atomic():
+        revoked = RefreshToken.objects.filter(
+            token_hash=_hash(raw or ''),
+            revoked_at__isnull=True,
+            expires_at__gt=now,
+        ).update(revoked_at=now)
+        if not revoked:
+            raise InvalidToken('Invalid or expired refresh token.')
+        refresh = RefreshToken.objects.select_related('user').get(token_hash=_hash(raw))
+        user = refresh.user
+        if not user.is_active:
+            raise InvalidToken('User inactive or deleted.')
+        return user, issue_token_pair(user)
+
+
+def revoke_refresh_token(raw):
+    return RefreshToken.objects.filter(token_hash=_hash(raw or ''), revoked_at__isnull=True).update(
+        revoked_at=timezone.now()
+    )
@@ -1,11 +1,26 @@
 from django.urls import path
 
-from .views import LoginView, ParticipationView, ProfileView, RegistrationView
+from .views import (
+    LoginView,
+    ParticipationView,
+    ProfileStepView,
+    ProfileView,
+    RegistrationView,
+    TesterListView,
+    TesterMatchView,
+    TokenRefreshView,
+    TokenRevokeView,
+)
 
 urlpatterns = [
     path('auth/register/', RegistrationView.as_view(), name='auth-register'),
     path('auth/login/', LoginView.as_view(), name='auth-login'),
+    path('auth/token/refresh/', TokenRefreshView.as_view(), name='auth-token-refresh'),
+    path('auth/token/revoke/', TokenRevokeView.as_view(), name='auth-token-revoke'),
     path('profile/me/', ProfileView.as_view(), name='profile-detail'),
+    path('profile/me/steps/<int:step>/', ProfileStepView.as_view(), name='profile-step'),
     path('profile/participation/', ParticipationView.as_view(), name='profile-participation'),
+    path('profiles/match/', TesterMatchView.as_view(), name='profiles-match'),
+    path('profiles/testers/', TesterListView.as_view(), name='profiles-testers'),
 ]
 
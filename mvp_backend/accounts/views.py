@@ -1,19 +1,43 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
 from rest_framework import permissions, status
+from rest_framework.exceptions import NotFound
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.generics import CreateAPIView, RetrieveUpdateAPIView
+from rest_framework.generics import CreateAPIView, ListAPIView, RetrieveUpdateAPIView
+from rest_framework.pagination import LimitOffsetPagination
+
+from mvp_backend.conditional import ConditionalGetMixin
+from mvp_backend.fieldsets import select_fields
+from mvp_backend.query_budget import query_budget
 
-from .models import UserProfile
+from .completeness import PROFILE_STEPS
+from .matching import INDEXED_ATTRIBUTES, match_profiles
+from .models import ProfileAudienceMetric, UserProfile
+from .tokens import InvalidToken, issue_token_pair, revoke_refresh_token, rotate_refresh_token
 from .serializers import (
     LoginSerializer,
     ParticipationSerializer,
+    RefreshTokenSerializer,
     RegistrationSerializer,
+    TesterListFilterSerializer,
+    TesterListSerializer,
     UserProfileSerializer,
     UserSerializer,
+    profile_step_serializer,
 )
 
 
+def profile_cache_key(user_id, updated_at, marker):
+    digest = hashlib.md5(repr(marker).encode(), usedforsecurity=False).hexdigest()
+    return f'profile:{user_id}:{updated_at.isoformat()}:{digest}'
+
+
+@query_budget(12)
 class RegistrationView(CreateAPIView):
     serializer_class = RegistrationSerializer
     permission_classes = (permissions.AllowAny,)
@@ -28,12 +52,14 @@ class RegistrationView(CreateAPIView):
             {
                 'user': UserSerializer(user).data,
                 'token': token.key,
+                **issue_token_pair(user),
             },
             status=status.HTTP_201_CREATED,
             headers=headers,
         )
 
 
+@query_budget(6)
 class LoginView(APIView):
     permission_classes = (permissions.AllowAny,)
 
@@ -45,16 +71,80 @@ class LoginView(APIView):
             return Response({'detail': 'User account is disabled.'}, status=status.HTTP_400_BAD_REQUEST)
 
         token, _ = Token.objects.get_or_create(user=user)
-        return Response({'token': token.key, 'user': UserSerializer(user).data})
+        return Response({'token': token.key, 'user': UserSerializer(user).data, **issue_token_pair(user)})
+
+
+@query_budget(5)
+class TokenRefreshView(APIView):
+    """Обмен refresh-токена на новую пару access/refresh (старый отзывается)."""
+    permission_classes = (permissions.AllowAny,)
+    authentication_classes = ()
 
+    def post(self, request):
+        serializer = RefreshTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            _, tokens = rotate_refresh_token(serializer.validated_data['refresh'])
+        except InvalidToken as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(tokens)
+
+
+@query_budget(1)
+class TokenRevokeView(APIView):
+    permission_classes = (permissions.AllowAny,)
+    authentication_classes = ()
 
-class ProfileView(RetrieveUpdateAPIView):
+    def post(self, request):
+        serializer = RefreshTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        revoke_refresh_token(serializer.validated_data['refresh'])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@query_budget(get=3, patch=10, put=10)
+class ProfileView(ConditionalGetMixin, RetrieveUpdateAPIView):
+    """Профиль текущего пользователя.
+
+    GET только читает: сериализованный профиль кэшируется по ключу
+    (user_id, updated_at, поля user), поэтому любая запись профиля сама
+    делает старую запись кэша недостижимой. Профиль создаётся только
+    на путях записи (PUT/PATCH).
+    """
     serializer_class = UserProfileSerializer
     permission_classes = (permissions.IsAuthenticated,)
 
+    def get_conditional_state(self):
+        self.profile_updated_at = (
+            UserProfile.objects.filter(user=self.request.user).values_list('updated_at', flat=True).first()
+        )
+        if self.profile_updated_at is None:
+            return None
+        # Вложенный user уже загружен аутентификацией — учитываем его поля без запроса
+        return self.profile_updated_at, self.user_marker()
+
+    def user_marker(self):
+        user = self.request.user
+        return user.phone_number, user.first_name, user.last_name, user.email
+
     def get_object(self):
         profile, created = UserProfile.objects.get_or_create(user=self.request.user)
         return profile
+
+    def retrieve(self, request, *args, **kwargs):
+        updated_at = self.profile_updated_at
+        if updated_at is None:
+            # Профиль ещё не создан: отдаём значения по умолчанию, ничего не записывая
+            return Response(select_fields(self.get_serializer(UserProfile(user=request.user)).data, request))
+
+        key = profile_cache_key(request.user.pk, updated_at, self.user_marker())
+        data = cache.get(key)
+        if data is None:
+            profile = UserProfile.objects.select_related('user').get(user=request.user)
+            data = self.get_serializer(profile).data
+            cache.set(key, data, settings.PROFILE_CACHE_TTL)
+        # В кэше лежит полный профиль, ?fields=/?omit= применяются к нему
+        return Response(select_fields(data, request))
     
     def update(self, request, *args, **kwargs):
         try:
@@ -70,6 +160,34 @@ class ProfileView(RetrieveUpdateAPIView):
             )
 
 
+@query_budget(patch=8)
+class ProfileStepView(APIView):
+    """Сохранение одного шага анкеты: PATCH /api/profile/me/steps/<step>/.
+
+    Принимает только поля шага и пишет их одним узким UPDATE вместе
+    с маской заполненных шагов.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def patch(self, request, step):
+        if step not in PROFILE_STEPS:
+            raise NotFound('Unknown profile step.')
+
+        unknown = set(request.data) - set(PROFILE_STEPS[step])
+        if unknown:
+            return Response(
+                {'detail': f'Fields do not belong to step {step}: {", ".join(sorted(unknown))}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        profile, _ = UserProfile.objects.get_or_create(user=request.user)
+        serializer = profile_step_serializer(step)(profile, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+
+@query_budget(3)
 class ParticipationView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
@@ -87,3 +205,75 @@ class ParticipationView(APIView):
 
         serializer.update(profile, serializer.validated_data)
         return Response(UserProfileSerializer(profile).data)
+
+
+@query_budget(4, ms=200)
+class TesterMatchView(APIView):
+    """Подбор тестеров по индексу атрибутов профиля (только staff).
+
+    GET /api/profiles/match/?city=Казань&platforms=Instagram&barter_categories=косметика
+    Несколько значений одного атрибута объединяются по ИЛИ, разные атрибуты — по И.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+    max_limit = 10000
+
+    def get(self, request):
+        criteria = {
+            attribute: request.query_params.getlist(attribute)
+            for attribute in INDEXED_ATTRIBUTES
+            if attribute in request.query_params
+        }
+        try:
+            limit = min(int(request.query_params.get('limit', 1000)), self.max_limit)
+        except ValueError:
+            return Response({'detail': 'Invalid limit.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            profiles = UserProfile.objects.filter(pk__in=match_profiles(criteria))
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if 'participating' in request.query_params:
+            profiles = profiles.filter(is_participating=request.query_params['participating'].lower() == 'true')
+        user_ids = list(profiles.order_by('user_id').values_list('user_id', flat=True)[:limit])
+        return Response({'count': profiles.count(), 'user_ids': user_ids})
+
+
+class TesterListPagination(LimitOffsetPagination):
+    default_limit = 50
+    max_limit = 500
+
+
+@query_budget(3, ms=200)
+class TesterListView(ListAPIView):
+    """Список тестеров по метрикам аудитории (только staff).
+
+    GET /api/profiles/testers/?platform=Instagram&min_subscribers=50000&ordering=-reach
+    Без platform фильтр и сортировка идут по сумме по всем платформам.
+    Запрос — диапазон по индексу (platform, subscribers|reach) таблицы метрик.
+    """
+    serializer_class = TesterListSerializer
+    permission_classes = (permissions.IsAdminUser,)
+    pagination_class = TesterListPagination
+
+    def get_queryset(self):
+        params = TesterListFilterSerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+
+        metrics = ProfileAudienceMetric.objects.filter(platform=filters['platform'])
+        for name in ('subscribers', 'reach'):
+            if f'min_{name}' in filters:
+                metrics = metrics.filter(**{f'{name}__gte': filters[f'min_{name}']})
+            if f'max_{name}' in filters:
+                metrics = metrics.filter(**{f'{name}__lte': filters[f'max_{name}']})
+        if filters.get('city'):
+            metrics = metrics.filter(profile__city__iexact=filters['city'])
+        if filters['participating'] is not None:
+            metrics = metrics.filter(profile__is_participating=filters['participating'])
+        if filters['completed'] is not None:
+            metrics = metrics.filter(profile__is_completed=filters['completed'])
+
+        ordering = filters['ordering']
+        field = F(ordering.lstrip('-'))
+        order = field.desc(nulls_last=True) if ordering.startswith('-') else field.asc(nulls_last=True)
+        return metrics.select_related('profile__user').order_by(order, 'profile_id')
@@ -0,0 +1,155 @@
+"""Режим производительности для списков админки на больших таблицах.
+
+- EstimatedCountPaginator: без фильтров число строк берётся оценкой, а не
+  COUNT(*) по всей таблице; с фильтрами считается не дальше count_limit;
+- cached_choices_filter(): варианты фильтра кэшируются, а не собираются
+  DISTINCT по всей таблице при каждом показе списка;
+- PhonePrefixSearchMixin: телефон ищется префиксом — диапазоном по индексу,
+  вместо icontains с ведущим «%».
+"""
+
+import re
+from functools import cached_property
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+
+ADMIN_CHOICES_CACHE_TTL = 600
+ADMIN_CHOICES_LIMIT = 200
+
+_PHONE_TERM_RE = re.compile(r'^\+?[\d\s()-]{3,}$')
+
+
+def estimate_rows(queryset):
+    """Оценка числа строк таблицы без полного COUNT(*) или None, если оценить нельзя."""
+    model = queryset.model
+    connection = connections[queryset.db]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            # MAX(rowid) — переход к последней странице B-дерева; удаления дают лишь завышение
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки без полного COUNT(*).
+
+    Небольшие таблицы считаются точно; для больших без фильтров берётся
+    оценка, а отфильтрованная выборка считается не дальше count_limit строк.
+    """
+
+    exact_below = 10000
+    count_limit = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_rows(queryset)
+            if estimate is not None and estimate > self.exact_below:
+                return estimate
+        return queryset.order_by()[:self.count_limit].count()
+
+
+def cached_choices_filter(field_name, title, timeout=ADMIN_CHOICES_CACHE_TTL):
+    """Фильтр списка по значениям поля с кэшированным набором вариантов."""
+
+    class CachedChoicesFilter(admin.SimpleListFilter):
+        parameter_name = field_name
+
+        def lookups(self, request, model_admin):
+            key = f'admin-choices:{model_admin.model._meta.label_lower}:{field_name}'
+            values = cache.get(key)
+            if values is None:
+                values = list(
+                    model_admin.model._default_manager.exclude(**{field_name: ''})
+                    .order_by(field_name)
+                    .values_list(field_name, flat=True)
+                    .distinct()[:ADMIN_CHOICES_LIMIT]
+                )
+                cache.set(key, values, timeout)
+            return [(value, value) for value in values]
+
+        def queryset(self, request, queryset):
+            if self.value():
+                return queryset.filter(**{field_name: self.value()})
+            return queryset
+
+    CachedChoicesFilter.title = title
+    CachedChoicesFilter.__name__ = f'{field_name.title()}CachedChoicesFilter'
+    return CachedChoicesFilter
+
+
+def phone_prefix(term):
+    """Нормализует ввод «8 999 12», «+7999», «99912» в префикс E.164 или None."""
+    term = term.strip()
+    if not _PHONE_TERM_RE.match(term):
+        return None
+    digits = re.sub(r'\D', '', term)
+    if not digits:
+        # «---», «( )» — пунктуация без цифр, это не телефон
+        return None
+    if term.startswith('+'):
+        return f'+{digits}'
+    if digits[0] == '8':
+        digits = f'7{digits[1:]}'
+    elif digits[0] == '9':
+        digits = f'7{digits}'
+    return f'+{digits}'
+
+
+def prefix_range(field_name, prefix):
+    """startswith, который использует обычный B-tree индекс: field >= p AND field < p'."""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field_name}__gte': prefix, f'{field_name}__lt': upper})
+
+
+class PhonePrefixSearchMixin:
+    """Поиск по телефону префиксом по индексу.
+
+    phone_search_fields — поля с номерами в E.164 (ищутся по нормализованному
+    префиксу), raw_prefix_search_fields — поля со свободным вводом (ищутся
+    префиксом как введено и как E.164). Прочие запросы обрабатывает
+    search_text_results(), по умолчанию — стандартный поиск по search_fields.
+    """
+
+    phone_search_fields = ()
+    raw_prefix_search_fields = ()
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        prefix = phone_prefix(search_term)
+        if prefix is None:
+            return self.search_text_results(request, queryset, search_term)
+
+        condition = Q()
+        for field_name in self.phone_search_fields:
+            condition |= self._prefix_condition(field_name, prefix)
+        for field_name in self.raw_prefix_search_fields:
+            condition |= self._prefix_condition(field_name, prefix)
+            condition |= self._prefix_condition(field_name, search_term.strip())
+        return queryset.filter(condition), False
+
+    def _prefix_condition(self, field_name, prefix):
+        if LOOKUP_SEP not in field_name:
+            return prefix_range(field_name, prefix)
+        # Поле связанной модели — через подзапрос: JOIN внутри OR не даёт использовать индексы
+        relation, remote_field = field_name.split(LOOKUP_SEP, 1)
+        related_model = self.model._meta.get_field(relation).related_model
+        return Q(**{f'{relation}__in': related_model._default_manager.filter(prefix_range(remote_field, prefix))})
+
+    def search_text_results(self, request, queryset, search_term):
+        return super().get_search_results(request, queryset, search_term)
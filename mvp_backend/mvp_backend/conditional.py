@@ -0,0 +1,48 @@
+"""Условные GET-запросы (ETag / If-None-Match) для API.
+
+Валидаторы считаются дёшево — по max(updated_at) и числу строк, — поэтому
+при совпадении ETag ответ 304 отдаётся без сериализации данных.
+"""
+
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_weak_etag(*parts):
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+class ConditionalGetMixin:
+    """Добавляет ETag/Last-Modified к GET и отвечает 304 при совпадении.
+
+    Представление переопределяет get_conditional_state() и возвращает
+    кортеж (last_modified, marker), где marker — любые дополнительные данные,
+    изменение которых должно менять ETag (например, число строк).
+    """
+
+    def get_conditional_state(self):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        state = self.get_conditional_state()
+        if state is None:
+            return super().get(request, *args, **kwargs)
+
+        last_modified, marker = state
+        etag = make_weak_etag(request.user.pk, request.get_full_path(), last_modified and last_modified.isoformat(), marker)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        # Ответ зависит от пользователя: кэшировать можно только в браузере и с ревалидацией
+        patch_vary_headers(response, ('Authorization',))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,96 @@
+"""Разреженные наборы полей (?fields= / ?omit=) для GET-запросов API.
+
+?fields=article,title,status оставляет в ответе только перечисленные поля,
+?omit=payload убирает перечисленные. Представления со списками сужают
+и SQL: через only() загружаются лишь колонки, нужные выбранным полям.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _split(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def fieldset_requested(request):
+    if request is None or request.method not in SAFE_METHODS:
+        return False
+    params = request.query_params if hasattr(request, 'query_params') else request.GET
+    return bool(params.get('fields') or params.get('omit'))
+
+
+def parse_fieldset(request, available):
+    """Возвращает множество выбранных полей или None, если выбраны все."""
+    if not fieldset_requested(request):
+        return None
+    params = request.query_params if hasattr(request, 'query_params') else request.GET
+    fields = _split(params.get('fields', ''))
+    omit = _split(params.get('omit', ''))
+    if not fields and not omit:
+        return None
+
+    available = set(available)
+    unknown = (fields | omit) - available
+    if unknown:
+        raise ValidationError({'fields': [f'Unknown fields: {", ".join(sorted(unknown))}']})
+    return (fields or available) - omit
+
+
+def select_fields(data, request):
+    """Применяет ?fields=/?omit= к уже готовому представлению (например, из кэша)."""
+    selected = parse_fieldset(request, data)
+    if selected is None:
+        return data
+    return {name: value for name, value in data.items() if name in selected}
+
+
+def model_columns(serializer, model):
+    """Колонки модели, которые читают поля сериализатора.
+
+    SerializerMethodField (source='*') колонок не добавляет: такие поля
+    должны опираться на аннотации или связи, а не на поля самой модели.
+    """
+    opts = model._meta
+    columns = {opts.pk.attname}
+    for field in serializer.fields.values():
+        if field.source == '*':
+            continue
+        try:
+            model_field = opts.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            continue
+        if model_field.concrete:
+            columns.add(model_field.attname)
+    return columns
+
+
+class SparseFieldsetSerializerMixin:
+    """Убирает из сериализатора поля, не выбранные в ?fields= / ?omit=."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = parse_fieldset(self.context.get('request'), self.fields)
+        if selected is not None:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """Сужает queryset списка до колонок выбранных полей.
+
+    Колонки сортировки пагинатора загружаются всегда — по ним строится курсор.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not fieldset_requested(self.request):
+            return queryset
+        # Сериализатор уже без невыбранных полей — см. SparseFieldsetSerializerMixin
+        columns = model_columns(self.get_serializer(), queryset.model)
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        columns.update(name.lstrip('-') for name in ordering)
+        return queryset.only(*columns)
@@ -0,0 +1,187 @@
+"""Бюджет SQL-запросов для представлений API.
+
+Представление объявляет бюджет декоратором::
+
+    @query_budget(3)                        # на любой метод
+    @query_budget(get=2, patch=6, ms=200)   # по методам и (необязательно) по времени
+    @query_budget(7, per_batch=8)           # плюс 8 на каждую пачку, см. add_query_batches
+    @query_budget_exempt                    # не считать (долгие и потоковые ответы)
+
+QueryBudgetMiddleware считает запросы и их суммарное время на каждом
+HTTP-запросе (через execute_wrapper, без DEBUG) и сверяет с бюджетом.
+Превышение числа запросов в режиме QUERY_BUDGET_MODE='raise' (тесты)
+поднимает QueryBudgetExceeded, в режиме 'log' пишет предупреждение;
+превышение времени только логируется. В бюджет входит и аутентификация.
+
+Под ASGI синхронные представления выполняются в потоке запроса
+(ThreadSensitiveContext), поэтому счётчик подключается к соединениям
+именно этого потока через sync_to_async.
+"""
+
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(queries=None, *, ms=None, per_batch=None, **per_method):
+    """Объявляет бюджет представления (класса или функции).
+
+    per_batch — сколько запросов добавляется на каждую пачку, о которой
+    представление сообщило через add_query_batches.
+    """
+
+    def decorate(view):
+        view.query_budget = {
+            'queries': {method.upper(): count for method, count in per_method.items()},
+            'default': queries,
+            'ms': ms,
+            'per_batch': per_batch,
+        }
+        return view
+
+    return decorate
+
+
+def query_budget_exempt(view):
+    """Помечает представление, запросы которого не считаются вовсе."""
+    view.query_budget_exempt = True
+    return view
+
+
+def add_query_batches(request, count=1):
+    """Сообщает middleware, что представление обработало ещё count пачек."""
+    request = getattr(request, '_request', request)
+    request.query_budget_batches = getattr(request, 'query_budget_batches', 0) + count
+
+
+def _view_attr(func, name):
+    value = getattr(func, name, None)
+    if value is None:
+        value = getattr(getattr(func, 'view_class', None), name, None)
+    return value
+
+
+def is_exempt(resolver_match):
+    return resolver_match is not None and bool(_view_attr(resolver_match.func, 'query_budget_exempt'))
+
+
+def view_budget(resolver_match, method, batches=0):
+    """Возвращает (число запросов, мс) для метода представления или None."""
+    if resolver_match is None:
+        return None
+    budget = _view_attr(resolver_match.func, 'query_budget')
+    if budget is None:
+        return None
+    queries = budget['queries'].get(method, budget['default'])
+    if queries is None and budget['ms'] is None:
+        return None
+    if queries is not None and budget.get('per_batch'):
+        queries += budget['per_batch'] * batches
+    return queries, budget['ms']
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class QueryBudgetMiddleware:
+    """Считает SQL-запросы и время каждого запроса к API и проверяет бюджет.
+
+    Ответ получает атрибуты query_count и query_time_ms, а при DEBUG —
+    заголовок Server-Timing. Представления с @query_budget_exempt (поток
+    предложений) пропускаются: их ответ живёт дольше вызова middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        mode = settings.QUERY_BUDGET_MODE
+        if mode == 'off' or self.exempt(request):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            self.record(stack, recorder)
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, mode)
+
+    async def __acall__(self, request):
+        mode = settings.QUERY_BUDGET_MODE
+        if mode == 'off' or self.exempt(request):
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        stack = ExitStack()
+        # Соединения привязаны к потоку: подключаемся в том же потоке запроса,
+        # где выполнятся синхронные представления
+        await sync_to_async(self.record)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, recorder, mode)
+
+    @staticmethod
+    def exempt(request):
+        try:
+            match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return False
+        return is_exempt(match)
+
+    @staticmethod
+    def record(stack, recorder):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    def finish(self, request, response, recorder, mode):
+        response.query_count = recorder.count
+        response.query_time_ms = recorder.duration * 1000
+        if settings.DEBUG:
+            response['Server-Timing'] = f'db;dur={response.query_time_ms:.1f};desc="{recorder.count} queries"'
+        self.check(request, response, mode)
+        return response
+
+    def check(self, request, response, mode):
+        budget = view_budget(request.resolver_match, request.method, getattr(request, 'query_budget_batches', 0))
+        if budget is None:
+            return
+        queries, ms = budget
+        path = f'{request.method} {request.path}'
+        if queries is not None and response.query_count > queries:
+            message = f'{path}: {response.query_count} SQL queries, budget {queries}'
+            if mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        if ms is not None and response.query_time_ms > ms:
+            logger.warning(f'{path}: SQL took {response.query_time_ms:.1f} ms, budget {ms} ms')
@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
+from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -49,10 +52,12 @@ INSTALLED_APPS = [
     'phonenumber_field',
     'accounts.apps.AccountsConfig',
     'orders',
+    'search',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'mvp_backend.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,6 +97,29 @@ DATABASES = {
     }
 }
 
+# Кэш общий для всех процессов: в нём черновики отчётов (orders.drafts), профили и
+# счётчики админки. Блокировка черновика держится на атомарном cache.add, а ещё не
+# записанные правки не должны вытесняться, поэтому в бою нужен Redis (REDIS_URL,
+# пакет redis); он же разносит уведомления потока предложений между процессами
+# (orders.stream). При DEBUG без него — LocMemCache одного процесса (runserver, тесты)
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+else:
+    raise ImproperlyConfigured('Set REDIS_URL: report drafts need a shared Redis cache when DEBUG is off.')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -143,7 +171,8 @@ AUTH_USER_MODEL = 'accounts.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
+        'accounts.authentication.SignedAccessTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -151,12 +180,50 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Кэш токенов в процессе (accounts.authentication.CachedTokenAuthentication)
+TOKEN_AUTH_CACHE_SIZE = int(os.getenv('TOKEN_AUTH_CACHE_SIZE', '10000'))
+TOKEN_AUTH_CACHE_TTL = int(os.getenv('TOKEN_AUTH_CACHE_TTL', '60'))
+
+# Подписанные access-токены (Authorization: Bearer) и refresh-токены, в секундах
+ACCESS_TOKEN_LIFETIME = int(os.getenv('ACCESS_TOKEN_LIFETIME', '300'))
+REFRESH_TOKEN_LIFETIME = int(os.getenv('REFRESH_TOKEN_LIFETIME', str(30 * 24 * 3600)))
+
+# Бюджет SQL-запросов представлений (mvp_backend.query_budget):
+# raise — падать при превышении (по умолчанию в тестах), log — предупреждение в лог, off — не считать
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'raise' if TESTING else 'log')
+
+# Кэш сериализованного профиля для GET /api/profile/me/, в секундах
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', '600'))
+
+# Сколько дней хранятся надгробия удалённых объектов для /api/orders/sync/ (prune_sync_tombstones);
+# токен синхронизации старше этого срока отклоняется — клиент начинает с полного снимка
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '30'))
+
+# Черновики отчётов (orders.drafts): правки пишутся в БД не чаще раза в окно, в секундах;
+# ещё не записанные правки живут в кэше не дольше REPORT_DRAFT_CACHE_TTL
+REPORT_DRAFT_FLUSH_SECONDS = int(os.getenv('REPORT_DRAFT_FLUSH_SECONDS', '5'))
+REPORT_DRAFT_CACHE_TTL = int(os.getenv('REPORT_DRAFT_CACHE_TTL', '86400'))
+
+# Максимальный размер файла-подтверждения к отчёту (orders.uploads), в байтах
+PROOF_UPLOAD_MAX_SIZE = int(os.getenv('PROOF_UPLOAD_MAX_SIZE', str(2 * 1024 ** 3)))
+# Через сколько часов без новых частей загрузка считается брошенной: она не занимает
+# лимит файлов отчёта и удаляется clear_stale_uploads
+PROOF_UPLOAD_STALE_HOURS = int(os.getenv('PROOF_UPLOAD_STALE_HOURS', '48'))
+
+# Потоков на процесс для миниатюр, превью и постеров видео (orders.media);
+# 0 — только командой build_media_derivatives (например, на отдельном воркере)
+MEDIA_DERIVATIVE_WORKERS = int(os.getenv('MEDIA_DERIVATIVE_WORKERS', '2'))
+
 PHONENUMBER_DEFAULT_REGION = 'RU'
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = os.getenv('CORS_ALLOW_ALL_ORIGINS', 'True').lower() == 'true'
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if os.getenv('CORS_ALLOWED_ORIGINS') else []
 CORS_ALLOW_CREDENTIALS = True
+# Заголовок докачки файлов отчёта (orders.uploads)
+CORS_ALLOW_HEADERS = (*default_headers, 'upload-offset')
+CORS_EXPOSE_HEADERS = ('Upload-Offset',)
 
 # Security settings
 if not DEBUG:
@@ -0,0 +1,245 @@
+"""Регрессия числа SQL-запросов по всем URL accounts и orders.
+
+Каждый эндпоинт вызывается на данных нескольких размеров; число запросов
+не должно зависеть от размера, а превышение объявленного бюджета
+(@query_budget) роняет тест через QueryBudgetMiddleware.
+"""
+
+import tempfile
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import URLPattern, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.authentication import token_cache
+from accounts.models import User, UserProfile
+from accounts.tokens import issue_refresh_token
+from orders.models import CreatingOrder, ProofUpload, Purchase, TestReport
+from orders.tests import PurchasesTableMixin
+
+from .query_budget import QueryBudgetExceeded, is_exempt, view_budget
+
+SIZES = (1, 5, 25)
+URL_MODULES = ('accounts.urls', 'orders.urls')
+
+# Представления с @query_budget_exempt (поток предложений) не считаются
+EXEMPT_URLS = {
+    pattern.name
+    for module in URL_MODULES
+    for pattern in import_module(module).urlpatterns
+    if isinstance(pattern, URLPattern) and is_exempt(SimpleNamespace(func=pattern.callback))
+}
+
+
+def report_payload(**extra):
+    return {
+        'full_name': 'Тестер',
+        'contact': '+79990000001',
+        'item_name': 'Крем',
+        'category': 'other',
+        'received_at': '2025-01-01',
+        'completed_at': '2025-01-02',
+        **extra,
+    }
+
+
+@override_settings(
+    QUERY_BUDGET_MODE='raise',
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class QueryBudgetRegressionTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    def seed(self, size):
+        """Тестер с size запросами на заказ и заказами (половина с отчётами) и size других тестеров."""
+        self.size = size
+        self.tester = User.objects.create_user(phone_number=f'+7999100{size:04d}', password='secret-pass-1')
+        self.staff = User.objects.create_user(
+            phone_number=f'+7999200{size:04d}', password='secret-pass-1', is_staff=True
+        )
+        UserProfile.objects.filter(user=self.tester).update(
+            is_completed=True, is_participating=True, city='Казань', full_name='Анна'
+        )
+        profile = self.tester.profile
+        profile.refresh_from_db()
+        profile.platforms = ['Instagram', 'Telegram']
+        profile.subscribers_by_platform = ['Instagram: 50k', 'Telegram: 3 000']
+        profile.save()
+
+        others = User.objects.bulk_create(
+            [User(phone_number=f'+7999300{size:02d}{index:02d}', password='!') for index in range(size)]
+        )
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user, city='Казань', is_completed=True, is_participating=True) for user in others]
+        )
+
+        # Первый запрос — для одиночного решения, остальные size + 1 — для пакетного (и принять, и отклонить)
+        self.orders = CreatingOrder.objects.bulk_create(
+            [CreatingOrder(user=self.tester, article=f'ART-{index}', title='Крем') for index in range(size + 2)]
+        )
+        for index in range(size):
+            purchase = Purchase.objects.create(tester=self.tester, article=f'ART-{index}')
+            if index % 2 == 0:
+                TestReport.objects.create(purchase=purchase, **report_payload())
+        self.purchase = Purchase.objects.create(tester=self.tester, article='ART-REPORT')
+        self.empty_purchase = Purchase.objects.create(tester=self.tester, article='ART-NEW')
+        self.draft_purchase = Purchase.objects.create(tester=self.tester, article='ART-DRAFT')
+        self.proof = f'proof-{size}'.encode()
+        self.upload = ProofUpload.objects.create(
+            purchase=self.draft_purchase, filename='proof.jpg', content_type='image/jpeg', size=len(self.proof)
+        )
+        TestReport.objects.create(purchase=self.purchase, **report_payload())
+
+    def cases(self):
+        """(url name, method, as staff, url kwargs, payload, query params)."""
+        refresh = issue_refresh_token(self.tester)
+        return (
+            ('auth-register', 'post', None, {}, {'phone_number': f'+7999400{self.size:04d}', 'password': 'Secret-pass-123'}, {}),
+            ('auth-login', 'post', None, {}, {'phone_number': str(self.tester.phone_number), 'password': 'secret-pass-1'}, {}),
+            ('auth-token-refresh', 'post', None, {}, {'refresh': refresh}, {}),
+            ('auth-token-revoke', 'post', None, {}, {'refresh': issue_refresh_token(self.tester)}, {}),
+            ('profile-detail', 'get', False, {}, None, {}),
+            ('profiles-match', 'get', True, {}, None, {'city': 'Казань'}),
+            ('profiles-testers', 'get', True, {}, None, {'platform': 'Instagram'}),
+            ('orders-creating', 'get', False, {}, None, {}),
+            (
+                'orders-bulk-decision',
+                'post',
+                False,
+                {},
+                [{'id': order.pk, 'action': 'approve' if index % 2 else 'reject'} for index, order in enumerate(self.orders[1:])],
+                {},
+            ),
+            ('orders-decision', 'post', False, {'pk': self.orders[0].pk}, {'action': 'approve'}, {}),
+            ('orders-dispatch', 'post', True, {}, {'article': f'ART-D{self.size}', 'city': 'Казань'}, {}),
+            ('orders-sync', 'get', False, {}, None, {}),
+            ('orders-purchases', 'get', False, {}, None, {}),
+            ('orders-purchase-detail', 'get', False, {'purchase_id': self.purchase.pk}, None, {}),
+            ('test-report-detail', 'get', False, {'purchase_id': self.purchase.pk}, None, {}),
+            ('test-report-detail', 'patch', False, {'purchase_id': self.purchase.pk}, {'likes': 'Запах'}, {}),
+            ('test-report-create', 'post', False, {}, report_payload(purchase_id=self.empty_purchase.pk), {}),
+            ('report-stats', 'get', True, {}, None, {'category': 'other', 'group': 'week'}),
+            ('report-export', 'get', True, {}, None, {'category': 'other', 'output': 'xlsx'}),
+            (
+                'proof-upload-create',
+                'post',
+                False,
+                {'purchase_id': self.draft_purchase.pk},
+                {'filename': 'proof.mp4', 'size': 100, 'content_type': 'video/mp4'},
+                {},
+            ),
+            ('proof-upload-detail', 'get', False, {'upload_id': self.upload.pk}, None, {}),
+            ('proof-upload-detail', 'patch', False, {'upload_id': self.upload.pk}, self.proof, {}),
+            ('test-report-draft', 'patch', False, {'purchase_id': self.draft_purchase.pk}, {'likes': 'Запах'}, {}),
+            ('test-report-detail', 'get', False, {'purchase_id': self.draft_purchase.pk}, None, {}),
+            ('test-report-detail', 'patch', False, {'purchase_id': self.draft_purchase.pk}, report_payload(), {}),
+            # Правки профиля — последними: они меняют is_completed и участие
+            ('profile-detail', 'patch', False, {}, {'city': 'Москва', 'platforms': ['VK']}, {}),
+            (
+                'profile-step',
+                'patch',
+                False,
+                {'step': 2},
+                {'platforms': ['Instagram', 'VK'], 'blog_topics': ['Косметика'], 'blog_description': 'Про уход'},
+                {},
+            ),
+            ('profile-participation', 'post', False, {}, {'is_participating': False}, {}),
+        )
+
+    def request(self, name, method, staff, kwargs, payload, params):
+        client = APIClient()
+        if staff is not None:
+            user = self.staff if staff else self.tester
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        # Холодные кэши: считаем худший случай
+        cache.clear()
+        token_cache.clear()
+        url = reverse(name, kwargs=kwargs)
+        if method == 'get':
+            return client.get(url, params)
+        if isinstance(payload, bytes):
+            # Часть файла при загрузке — сырые байты, а не JSON
+            return client.generic(
+                method.upper(), url, payload, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET='0'
+            )
+        return getattr(client, method)(url, payload, format='json')
+
+    def test_query_counts_do_not_depend_on_data_size(self):
+        counts = {}
+        for size in SIZES:
+            self.seed(size)
+            for index, (name, method, staff, kwargs, payload, params) in enumerate(self.cases()):
+                try:
+                    response = self.request(name, method, staff, kwargs, payload, params)
+                except QueryBudgetExceeded as exc:
+                    self.fail(f'size={size}: {exc}')
+                self.assertLess(response.status_code, 400, (name, method, getattr(response, 'data', None)))
+                counts.setdefault((index, name, method), []).append(response.query_count)
+
+        for (_, name, method), observed in counts.items():
+            with self.subTest(url=name, method=method):
+                self.assertEqual(len(set(observed)), 1, f'{method.upper()} {name}: {dict(zip(SIZES, observed))}')
+
+    def test_every_url_declares_a_budget(self):
+        self.assertEqual(EXEMPT_URLS, {'orders-creating-stream'})
+        missing = []
+        for module in URL_MODULES:
+            for pattern in import_module(module).urlpatterns:
+                if not isinstance(pattern, URLPattern) or pattern.name in EXEMPT_URLS:
+                    continue
+                match = SimpleNamespace(func=pattern.callback)
+                if all(view_budget(match, method) is None for method in ('GET', 'POST', 'PATCH')):
+                    missing.append(pattern.name)
+        self.assertEqual(missing, [])
+
+    def test_every_url_is_covered(self):
+        self.seed(1)
+        covered = {case[0] for case in self.cases()} | EXEMPT_URLS
+        names = {
+            pattern.name
+            for module in URL_MODULES
+            for pattern in import_module(module).urlpatterns
+        }
+        self.assertEqual(names - covered, set())
+
+
+@override_settings(QUERY_BUDGET_MODE='raise')
+class AsyncQueryBudgetTests(TestCase):
+    """Под ASGI (AsyncClient) счётчик видит запросы синхронных представлений."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(phone_number='+79993000001', password='secret-pass-1')
+        CreatingOrder.objects.create(user=user, article='ART-1')
+        self.headers = {'authorization': f'Token {Token.objects.create(user=user).key}'}
+
+    async def test_counts_queries_of_sync_views(self):
+        url = reverse('orders-creating')
+        # Первый запрос кладёт токен в кэш — сравниваем уже прогретые
+        for _ in range(2):
+            sync_response = await sync_to_async(self.client.get)(url, headers=self.headers)
+        response = await self.async_client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.query_count, 0)
+        self.assertEqual(response.query_count, sync_response.query_count)
+
+    async def test_exceeded_budget_raises(self):
+        budget = {'queries': {}, 'default': 0, 'ms': None}
+        with mock.patch('orders.views.PendingCreatingOrdersView.query_budget', budget):
+            with self.assertRaises(QueryBudgetExceeded):
+                await self.async_client.get(reverse('orders-creating'), headers=self.headers)
+
+    async def test_stream_is_exempt(self):
+        response = await self.async_client.get(reverse('orders-creating-stream'))
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(hasattr(response, 'query_count'))
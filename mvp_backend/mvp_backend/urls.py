@@ -14,6 +14,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
@@ -21,4 +23,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('accounts.urls')),
     path('api/orders/', include('orders.urls')),
+    path('api/search/', include('search.urls')),
 ]
+
+# Загруженные файлы отчётов при разработке; в production их отдаёт веб-сервер
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
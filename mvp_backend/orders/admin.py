@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.utils.html import format_html, format_html_join
 
-from .models import CreatingOrder, Purchase, TestReport
+from .media import enqueue_derivatives, media_url, proof_media_items
+from .models import CreatingOrder, ProofMedia, ProofUpload, Purchase, TestReport
 
 
 @admin.register(CreatingOrder)
@@ -19,10 +21,14 @@ class PurchaseAdmin(admin.ModelAdmin):
     search_fields = ('article', 'tester__phone_number', 'external_id')
     autocomplete_fields = ('tester', 'creating_order')
     readonly_fields = ('created_at', 'updated_at')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('tester').with_report_flag()
     
     def has_report(self, obj):
-        return hasattr(obj, 'test_report')
+        return obj.has_report
     has_report.boolean = True
+    has_report.admin_order_field = 'has_report'
     has_report.short_description = 'Есть отчёт'
 
 
@@ -31,7 +37,7 @@ class TestReportAdmin(admin.ModelAdmin):
     list_display = ('id', 'purchase', 'item_name', 'category', 'full_name', 'completed_at', 'created_at')
     list_filter = ('category', 'report_type', 'issues_occured', 'ready_for_next', 'created_at')
     search_fields = ('item_name', 'full_name', 'contact', 'purchase__article')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('proof_previews', 'created_at', 'updated_at')
     fieldsets = (
         (
             'Заказ',
@@ -59,6 +65,7 @@ class TestReportAdmin(admin.ModelAdmin):
                     'report_type',
                     'proof_links',
                     'proof_files',
+                    'proof_previews',
                 )
             },
         ),
@@ -116,3 +123,50 @@ class TestReportAdmin(admin.ModelAdmin):
             },
         ),
     )
+
+    def proof_previews(self, obj):
+        # Миниатюры вместо оригиналов: страница не тянет фото и видео целиком
+        parts = []
+        for item in proof_media_items(obj.proof_files):
+            if item['thumbnail']:
+                parts.append(format_html(
+                    '<a href="{}" target="_blank"><img src="{}" alt="" style="max-height: 120px; margin: 0 8px 8px 0;"></a>',
+                    item['preview'] or item['file'],
+                    item['thumbnail'],
+                ))
+            else:
+                parts.append(format_html('<a href="{}" target="_blank">{}</a> ', item['file'], item['file'].rsplit('/', 1)[-1]))
+        return format_html_join('', '{}', ((part,) for part in parts)) if parts else '—'
+    proof_previews.short_description = 'Файлы'
+
+
+@admin.register(ProofUpload)
+class ProofUploadAdmin(admin.ModelAdmin):
+    list_display = ('id', 'purchase', 'filename', 'content_type', 'size', 'offset', 'status', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('filename', 'sha256')
+    raw_id_fields = ('purchase',)
+    readonly_fields = ('offset', 'sha256', 'path', 'status', 'created_at', 'updated_at')
+
+
+@admin.register(ProofMedia)
+class ProofMediaAdmin(admin.ModelAdmin):
+    list_display = ('thumbnail_preview', 'path', 'content_type', 'status', 'attempts', 'updated_at')
+    list_filter = ('status', 'content_type')
+    search_fields = ('sha256', 'path')
+    readonly_fields = [field.name for field in ProofMedia._meta.fields]
+    actions = ('rebuild',)
+
+    def thumbnail_preview(self, obj):
+        if not obj.thumbnail:
+            return '—'
+        return format_html('<img src="{}" alt="" style="max-height: 60px;">', media_url(obj.thumbnail))
+    thumbnail_preview.short_description = 'Миниатюра'
+
+    @admin.action(description='Перестроить производные')
+    def rebuild(self, request, queryset):
+        hashes = list(queryset.values_list('sha256', flat=True))
+        updated = ProofMedia.objects.filter(sha256__in=hashes).update(status=ProofMedia.STATUS_PENDING, attempts=0)
+        enqueue_derivatives(hashes)
+        self.message_user(request, f'Поставлено в очередь: {updated}')
+
@@ -0,0 +1,54 @@
+"""Индексы неуправляемой таблицы purchases.
+
+Django не создаёт схему для Purchase (managed=False), поэтому индексы
+описаны здесь и применяются миграциями через create_purchases_indexes().
+Команда ``manage.py purchase_indexes`` проверяет и досоздаёт их.
+"""
+
+PURCHASES_TABLE = 'purchases'
+
+PURCHASES_INDEXES = {
+    # Список заказов тестера: WHERE tester_id = ? ORDER BY created_at DESC, id DESC
+    'purchases_tester_created_idx': '(tester_id, created_at DESC, id DESC)',
+    # Поиск заказа по запросу на заказ (OrderDecisionView, админка)
+    'purchases_creating_order_idx': '(creating_order_id)',
+    # Поиск по внешнему идентификатору (админка, интеграции)
+    'purchases_external_id_idx': '(external_id)',
+}
+
+
+def purchases_table_exists(connection):
+    return PURCHASES_TABLE in connection.introspection.table_names()
+
+
+def existing_purchases_indexes(connection):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, PURCHASES_TABLE)
+    return {name for name, info in constraints.items() if info.get('index')}
+
+
+def missing_purchases_indexes(connection, names=None):
+    names = PURCHASES_INDEXES if names is None else names
+    if not purchases_table_exists(connection):
+        return []
+    existing = existing_purchases_indexes(connection)
+    return [name for name in names if name not in existing]
+
+
+def create_purchases_indexes(schema_editor, names=None):
+    """Создаёт индексы purchases (все или перечисленные), если таблица есть."""
+    names = PURCHASES_INDEXES if names is None else names
+    if not purchases_table_exists(schema_editor.connection):
+        return []
+    for name in names:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {PURCHASES_TABLE} {PURCHASES_INDEXES[name]}'
+        )
+    return list(names)
+
+
+def drop_purchases_indexes(schema_editor, names):
+    if not purchases_table_exists(schema_editor.connection):
+        return
+    for name in names:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
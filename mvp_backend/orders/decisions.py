@@ -0,0 +1,158 @@
+"""Пакетная обработка решений тестера по запросам на заказ."""
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import CreatingOrder, Purchase
+
+RESULT_APPROVED = 'approved'
+RESULT_REJECTED = 'rejected'
+RESULT_ERROR = 'error'
+
+PURCHASE_UPSERT_FIELDS = ('tester', 'external_id', 'article', 'pickup_point', 'metadata', 'status', 'updated_at')
+
+
+def build_purchase_metadata(order, extra=None):
+    metadata = {}
+    if order.payload and isinstance(order.payload, dict):
+        metadata = order.payload.copy()
+    if extra:
+        metadata.update(extra)
+    return metadata
+
+
+def resolve_pickup_point(order, requested, profile):
+    return requested or order.pickup_point or (profile.pickup_point if profile else '') or ''
+
+
+def upsert_purchase(user, order, decision, now):
+    """Создаёт или обновляет заказ по запросу одним INSERT ... ON CONFLICT."""
+    purchase = Purchase(
+        creating_order=order,
+        tester=user,
+        external_id=decision.get('external_id', '') or '',
+        article=order.article or '',
+        pickup_point=order.pickup_point or '',
+        metadata=build_purchase_metadata(order, decision.get('purchase_metadata')),
+        status=Purchase.STATUS_PENDING,
+        created_at=now,
+        updated_at=now,
+    )
+    Purchase.objects.bulk_create(
+        [purchase],
+        update_conflicts=True,
+        unique_fields=('creating_order',),
+        update_fields=PURCHASE_UPSERT_FIELDS,
+    )
+    return purchase
+
+
+def apply_decisions(user, profile, decisions):
+    """Применяет список решений одной транзакцией.
+
+    Число запросов не зависит от длины списка: одна выборка запросов на заказ,
+    по условному UPDATE на принятые и отклонённые, одна выборка захваченных
+    строк и один INSERT ... ON CONFLICT для Purchase. Профиль должен быть
+    заполнен — это проверяет вызывающий код. Возвращает результаты в порядке входа.
+    """
+    now = timezone.now()
+    ids = [item['id'] for item in decisions]
+
+    with transaction.atomic():
+        orders = CreatingOrder.objects.filter(user=user, pk__in=ids).in_bulk()
+        results = []
+        seen = set()
+        chosen = {}
+        for item in decisions:
+            order_id = item['id']
+            order = orders.get(order_id)
+            if order_id in seen:
+                results.append({'id': order_id, 'result': RESULT_ERROR, 'detail': 'Duplicate order in request.'})
+                continue
+            seen.add(order_id)
+            if order is None:
+                results.append({'id': order_id, 'result': RESULT_ERROR, 'detail': 'Order not found.'})
+                continue
+            if order.status != CreatingOrder.STATUS_PROCESSING:
+                results.append({'id': order_id, 'result': RESULT_ERROR, 'detail': 'Order has already been processed.'})
+                continue
+            if item['action'] == 'approve':
+                order.pickup_point = resolve_pickup_point(order, item.get('pickup_point'), profile)
+            chosen[order_id] = item
+            results.append(None)
+
+        claimed = _claim_orders(user, orders, chosen, now)
+        approved = [(orders[order_id], chosen[order_id]) for order_id in claimed if chosen[order_id]['action'] == 'approve']
+        purchases = _upsert_purchases(user, approved, now)
+        # Автоматически включаем участие при принятии заказа
+        if approved and not profile.is_participating:
+            profile.is_participating = True
+            profile.save(update_fields=('is_participating', 'updated_at'))
+
+    pending = iter(chosen)
+    for index, result in enumerate(results):
+        if result is not None:
+            continue
+        order_id = next(pending)
+        if order_id not in claimed:
+            # Параллельный запрос успел раньше
+            results[index] = {'id': order_id, 'result': RESULT_ERROR, 'detail': 'Order has already been processed.'}
+        elif chosen[order_id]['action'] == 'approve':
+            results[index] = {'id': order_id, 'result': RESULT_APPROVED, 'purchase_id': purchases[order_id].id}
+        else:
+            results[index] = {'id': order_id, 'result': RESULT_REJECTED}
+    return results
+
+
+def _claim_orders(user, orders, chosen, now):
+    """Переводит запросы из PROCESSING условным UPDATE; возвращает id, которые сменил этот вызов.
+
+    Как и в одиночном решении, из параллельных запросов статус сменит только
+    один. Свои строки узнаём по responded_at = now этого вызова.
+    """
+    approve = [order_id for order_id, item in chosen.items() if item['action'] == 'approve']
+    reject = [order_id for order_id, item in chosen.items() if item['action'] != 'approve']
+    processing = CreatingOrder.objects.filter(user=user, status=CreatingOrder.STATUS_PROCESSING)
+    if approve:
+        processing.filter(pk__in=approve).update(
+            status=CreatingOrder.STATUS_APPROVED,
+            pickup_point=Case(
+                *(When(pk=order_id, then=Value(orders[order_id].pickup_point)) for order_id in approve),
+                default=F('pickup_point'),
+            ),
+            responded_at=now,
+            updated_at=now,
+        )
+    if reject:
+        processing.filter(pk__in=reject).update(status=CreatingOrder.STATUS_REJECTED, responded_at=now, updated_at=now)
+    if not chosen:
+        return set()
+    return set(CreatingOrder.objects.filter(pk__in=list(chosen), responded_at=now).values_list('pk', flat=True))
+
+
+def _upsert_purchases(user, approved, now):
+    """Заказы по принятым запросам одним INSERT ... ON CONFLICT (creating_order)."""
+    if not approved:
+        return {}
+    purchases = {
+        order.id: Purchase(
+            creating_order=order,
+            tester=user,
+            external_id=item.get('external_id', '') or '',
+            article=order.article or '',
+            pickup_point=order.pickup_point or '',
+            metadata=build_purchase_metadata(order, item.get('purchase_metadata')),
+            status=Purchase.STATUS_PENDING,
+            created_at=now,
+            updated_at=now,
+        )
+        for order, item in approved
+    }
+    Purchase.objects.bulk_create(
+        list(purchases.values()),
+        update_conflicts=True,
+        unique_fields=('creating_order',),
+        update_fields=PURCHASE_UPSERT_FIELDS,
+    )
+    return purchases
@@ -0,0 +1,89 @@
+"""Массовая рассылка предложений (CreatingOrder) тестерам по фильтру."""
+
+from django.db import transaction
+
+from accounts.matching import match_profiles
+from accounts.models import UserProfile
+from search.index import index_objects
+from .models import CreatingOrder
+from .stream import notifier
+
+DISPATCH_BATCH_SIZE = 2000
+
+
+def matching_tester_ids(participating=True, completed=True, city='', pickup_point='', match=None):
+    """Ленивая выборка id пользователей, подходящих под фильтр.
+
+    match — критерии индекса атрибутов профиля (см. accounts.matching.match_profiles).
+    """
+    profiles = UserProfile.objects.filter(user__is_active=True)
+    if match:
+        profiles = profiles.filter(pk__in=match_profiles(match))
+    if participating is not None:
+        profiles = profiles.filter(is_participating=participating)
+    if completed is not None:
+        profiles = profiles.filter(is_completed=completed)
+    if city:
+        profiles = profiles.filter(city__iexact=city)
+    if pickup_point:
+        profiles = profiles.filter(pickup_point=pickup_point)
+    return profiles.order_by('user_id').values_list('user_id', flat=True)
+
+
+def dispatch_offers(user_ids, article, title='', notes='', pickup_point='', payload=None,
+                    assigned_by=None, skip_existing=True, batch_size=DISPATCH_BATCH_SIZE, progress=None):
+    """Создаёт предложения пачками через bulk_create (без сигналов на строку).
+
+    user_ids — итерируемый набор id (queryset читается через iterator()).
+    Если skip_existing, тестерам, у которых уже есть запрос по этому артикулу,
+    повторно ничего не отправляется. progress(created, skipped) вызывается
+    после каждой пачки. Возвращает (created, skipped).
+    """
+    if hasattr(user_ids, 'iterator'):
+        user_ids = user_ids.iterator(chunk_size=batch_size)
+
+    created = skipped = 0
+    batch = []
+    for user_id in user_ids:
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            done = _dispatch_batch(batch, article, title, notes, pickup_point, payload, assigned_by, skip_existing)
+            created += done
+            skipped += len(batch) - done
+            batch = []
+            if progress:
+                progress(created, skipped)
+    if batch:
+        done = _dispatch_batch(batch, article, title, notes, pickup_point, payload, assigned_by, skip_existing)
+        created += done
+        skipped += len(batch) - done
+        if progress:
+            progress(created, skipped)
+    return created, skipped
+
+
+def _dispatch_batch(user_ids, article, title, notes, pickup_point, payload, assigned_by, skip_existing):
+    if skip_existing:
+        existing = set(
+            CreatingOrder.objects.filter(user_id__in=user_ids, article=article).values_list('user_id', flat=True)
+        )
+        user_ids = [user_id for user_id in user_ids if user_id not in existing]
+
+    orders = [
+        CreatingOrder(
+            user_id=user_id,
+            article=article,
+            title=title,
+            notes=notes,
+            pickup_point=pickup_point,
+            payload=payload or {},
+            assigned_by=assigned_by,
+        )
+        for user_id in user_ids
+    ]
+    with transaction.atomic():
+        CreatingOrder.objects.bulk_create(orders, batch_size=500)
+        # bulk_create не шлёт post_save — документы поиска и уведомления потока шлём сами
+        index_objects('order', orders)
+        transaction.on_commit(lambda: notifier.notify_many(user_ids))
+    return len(orders)
@@ -0,0 +1,150 @@
+"""Черновики отчёта о тестировании с автосохранением.
+
+Форма отчёта присылает изменённые поля по мере ввода (PATCH .../report/draft/).
+Правки сливаются в один черновик в кэше и пишутся в TestReportDraft одним
+UPDATE не чаще раза в REPORT_DRAFT_FLUSH_SECONDS: первая правка после паузы
+пишется сразу, следующие в пределах окна копятся. Накопленное уходит в БД
+со следующей правкой после окна, по ?flush=1 или при отправке отчёта; форма
+сама досылает ?flush=1, когда окно истекло. Чтение черновика в БД не пишет.
+Сам TestReport создаётся только при отправке, после полной валидации.
+
+Чтение-изменение-запись черновика идёт под блокировкой cache.add. Она
+атомарна только в общем кэше Redis (или в LocMemCache одного процесса при
+DEBUG), поэтому settings без REDIS_URL в бою не запускаются; там же нет
+вытеснения по MAX_ENTRIES, которое теряло бы ещё не записанные правки.
+"""
+
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from accounts.models import UserProfile
+from .models import TestReport, TestReportDraft
+from .serializers import TestReportSerializer
+
+DRAFT_FIELDS = tuple(
+    name for name, field in TestReportSerializer().fields.items() if not field.read_only
+)
+
+
+DRAFT_LOCK_TIMEOUT = 5
+DRAFT_LOCK_ATTEMPTS = 100
+DRAFT_LOCK_WAIT = 0.02
+
+
+class DraftBusy(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Черновик сейчас сохраняется другим запросом, повторите.'
+
+
+def draft_cache_key(purchase_id):
+    return f'report-draft:{purchase_id}'
+
+
+@contextmanager
+def draft_lock(purchase_id):
+    """Блокировка черновика на время чтения-изменения-записи.
+
+    Не дождавшись блокировки, поднимает DraftBusy: без неё правка могла бы
+    затереть чужую.
+    """
+    key = f'{draft_cache_key(purchase_id)}:lock'
+    for _ in range(DRAFT_LOCK_ATTEMPTS):
+        if cache.add(key, True, DRAFT_LOCK_TIMEOUT):
+            break
+        time.sleep(DRAFT_LOCK_WAIT)
+    else:
+        raise DraftBusy()
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+def validate_draft_patch(data):
+    """Правка черновика в представлении API; пустые значения допустимы — поле очищено."""
+    if not isinstance(data, dict):
+        raise serializers.ValidationError({'detail': 'Ожидается объект с полями отчёта.'})
+    unknown = set(data) - set(DRAFT_FIELDS)
+    if unknown:
+        raise serializers.ValidationError({field: 'Неизвестное поле.' for field in sorted(unknown)})
+
+    filled = {field: value for field, value in data.items() if value not in ('', None)}
+    serializer = TestReportSerializer(data=filled, partial=True)
+    serializer.is_valid(raise_exception=True)
+    patch = {field: value for field, value in data.items() if field not in filled}
+    for field, value in serializer.validated_data.items():
+        patch[field] = serializer.fields[field].to_representation(value)
+    return patch
+
+
+def _load(purchase_id):
+    state = cache.get(draft_cache_key(purchase_id))
+    if state is None:
+        data = TestReportDraft.objects.filter(purchase_id=purchase_id).values_list('data', flat=True).first()
+        state = {'data': data or {}, 'flushed_at': 0.0, 'pending': False}
+    return state
+
+
+def _save_state(purchase_id, state):
+    cache.set(draft_cache_key(purchase_id), state, settings.REPORT_DRAFT_CACHE_TTL)
+
+
+def _due(state, now):
+    return now - state['flushed_at'] >= settings.REPORT_DRAFT_FLUSH_SECONDS
+
+
+def _write(purchase_id, data):
+    # Один запрос: INSERT ... ON CONFLICT (purchase_id) DO UPDATE SET data, updated_at
+    TestReportDraft.objects.bulk_create(
+        [TestReportDraft(purchase_id=purchase_id, data=data)],
+        update_conflicts=True,
+        unique_fields=('purchase',),
+        update_fields=('data', 'updated_at'),
+    )
+
+
+def draft_data(purchase_id):
+    """Текущий черновик: записанные поля вместе с ещё не сброшенными правками."""
+    return _load(purchase_id)['data']
+
+
+def stage_draft_patch(purchase_id, patch, flush=False, now=None):
+    """Добавляет правку к черновику; возвращает True, если черновик записан в БД.
+
+    patch — словарь полей или функция, строящая его из текущих данных черновика
+    (под той же блокировкой, так что параллельная правка не потеряется).
+    """
+    now = time.time() if now is None else now
+    with draft_lock(purchase_id):
+        state = _load(purchase_id)
+        if callable(patch):
+            patch = patch(state['data'])
+        state['data'] = {**state['data'], **patch}
+        written = flush or _due(state, now)
+        if written:
+            _write(purchase_id, state['data'])
+            state['flushed_at'] = now
+        state['pending'] = not written
+        _save_state(purchase_id, state)
+    return written
+
+
+def discard_draft(purchase_id):
+    cache.delete(draft_cache_key(purchase_id))
+    TestReportDraft.objects.filter(purchase_id=purchase_id).delete()
+
+
+def default_report(purchase, user):
+    """Несохранённый отчёт с полями, подставленными из профиля и заказа."""
+    profile = UserProfile.objects.filter(user=user).only('full_name', 'contact').first()
+    return TestReport(
+        purchase=purchase,
+        full_name=(profile and profile.full_name) or '',
+        contact=(profile and profile.contact) or str(user.phone_number),
+        item_name=purchase.article,
+    )
@@ -0,0 +1,234 @@
+"""Потоковая выгрузка отчётов о тестировании в CSV и XLSX.
+
+Отчёты читаются одним запросом с JOIN заказа, тестера и его профиля через
+values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE) и кодируются по мере
+чтения: в памяти не больше одной пачки строк, сколько бы их ни было. CSV —
+UTF-8 с BOM, чтобы Excel узнал кодировку. XLSX собирается без сторонних
+библиотек: части книги пишутся в zip прямо в поток, лист — с inline-строками
+без общей таблицы строк, так что размер книги на память тоже не влияет.
+"""
+
+import csv
+import re
+import zipfile
+from datetime import date, datetime, time, timedelta
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .media import media_url
+from .models import TestReport
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+EXPORT_CHUNK_SIZE = 2000
+ROWS_PER_CHUNK = 500
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+EXPORT_COLUMNS = (
+    ('id', 'ID отчёта'),
+    ('purchase_id', 'ID заказа'),
+    ('purchase__article', 'Артикул'),
+    ('purchase__status', 'Статус заказа'),
+    ('purchase__pickup_point', 'ПВЗ'),
+    ('purchase__tester__phone_number', 'Телефон тестера'),
+    ('purchase__tester__profile__full_name', 'ФИО в профиле'),
+    ('purchase__tester__profile__city', 'Город'),
+    ('full_name', 'ФИО в отчёте'),
+    ('contact', 'Контакт'),
+    ('item_name', 'Товар'),
+    ('category', 'Категория'),
+    ('received_at', 'Дата получения'),
+    ('completed_at', 'Дата завершения'),
+    ('report_type', 'Тип отчёта'),
+    ('proof_links', 'Ссылки на материалы'),
+    ('proof_files', 'Файлы'),
+    ('score_overall', 'Общее впечатление'),
+    ('score_expectation_fit', 'Соответствие ожиданиям'),
+    ('score_quality_effect', 'Качество/эффективность'),
+    ('score_usability', 'Удобство'),
+    ('score_value_for_money', 'Цена/качество'),
+    ('score_recommend', 'Готовность рекомендовать'),
+    ('likes', 'Что понравилось'),
+    ('improvements', 'Что улучшить'),
+    ('review_text', 'Отзыв'),
+    ('emotions_3_words', '3 слова-эмоции'),
+    ('issues_occured', 'Были проблемы'),
+    ('issues_note', 'Описание проблем'),
+    ('would_buy', 'Купили бы сами'),
+    ('ready_for_next', 'Готов к повторному тесту'),
+    ('created_at', 'Отчёт отправлен'),
+)
+
+# Excel ограничивает ячейку 32767 символами
+MAX_CELL_LENGTH = 32767
+
+_PROOF_FILES_INDEX = [field for field, _ in EXPORT_COLUMNS].index('proof_files')
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+_NUMBER_RE = re.compile(r'^[+-]?\d[\d\s().-]*$')
+_XML_ILLEGAL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_rows(article=None, category=None, date_from=None, date_to=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки выгрузки (значения в порядке EXPORT_COLUMNS) по мере чтения из БД."""
+    reports = TestReport.objects.all()
+    if article:
+        reports = reports.filter(purchase__article=article)
+    if category:
+        reports = reports.filter(category=category)
+    # Диапазон по created_at, а не created_at__date: так работает индекс и не нужен перевод в TIME_ZONE на строку
+    if date_from:
+        reports = reports.filter(created_at__gte=_day_start(date_from))
+    if date_to:
+        reports = reports.filter(created_at__lt=_day_start(date_to + timedelta(days=1)))
+    rows = reports.order_by('pk').values_list(*(field for field, _ in EXPORT_COLUMNS))
+    for row in rows.iterator(chunk_size=chunk_size):
+        row = list(row)
+        files = row[_PROOF_FILES_INDEX] if isinstance(row[_PROOF_FILES_INDEX], list) else []
+        row[_PROOF_FILES_INDEX] = [media_url(name) for name in files if isinstance(name, str)]
+        yield row
+
+
+def cell_value(value):
+    """Значение ячейки: числа и bool как есть, остальное — строкой."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, list):
+        value = '\n'.join(str(item) for item in value)
+    return str(value)[:MAX_CELL_LENGTH]
+
+
+def csv_cell(value):
+    value = cell_value(value)
+    if isinstance(value, bool):
+        return 'да' if value else 'нет'
+    # Текст, который Excel принял бы за формулу; телефоны и числа не трогаем
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES) and not _NUMBER_RE.match(value):
+        return f"'{value}"
+    return value
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: writerow() возвращает готовую строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows):
+    writer = csv.writer(_Echo())
+    yield ('\ufeff' + writer.writerow([title for _, title in EXPORT_COLUMNS])).encode()
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow([csv_cell(value) for value in row]))
+        if len(buffer) >= ROWS_PER_CHUNK:
+            yield ''.join(buffer).encode()
+            buffer.clear()
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_DOC_RELS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        f'{_XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        f'{_XML_HEADER}<Relationships xmlns="{_RELS_NS}">'
+        f'<Relationship Id="rId1" Type="{_DOC_RELS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        f'{_XML_HEADER}<workbook xmlns="{_MAIN_NS}" xmlns:r="{_DOC_RELS}">'
+        '<sheets><sheet name="Отчёты" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        f'{_XML_HEADER}<Relationships xmlns="{_RELS_NS}">'
+        f'<Relationship Id="rId1" Type="{_DOC_RELS}/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def xlsx_cell(value):
+    value = cell_value(value)
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL_RE.sub('', value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_row(number, values):
+    return f'<row r="{number}">{"".join(xlsx_cell(value) for value in values)}</row>'.encode()
+
+
+class _Sink:
+    """Приёмник zip-архива без seek(): копит записанное до следующей отдачи."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def xlsx_chunks(rows):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(f'{_XML_HEADER}<worksheet xmlns="{_MAIN_NS}"><sheetData>'.encode())
+            sheet.write(xlsx_row(1, [title for _, title in EXPORT_COLUMNS]))
+            for number, row in enumerate(rows, 2):
+                sheet.write(xlsx_row(number, row))
+                if number % ROWS_PER_CHUNK == 0:
+                    data = sink.take()
+                    if data:
+                        yield data
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.take()
+
+
+def export_chunks(output, rows):
+    """Байтовые куски файла выгрузки в формате output ('csv' или 'xlsx')."""
+    return xlsx_chunks(rows) if output == 'xlsx' else csv_chunks(rows)
+
+
+def export_filename(output):
+    return f'reports-{timezone.localdate():%Y-%m-%d}.{output}'
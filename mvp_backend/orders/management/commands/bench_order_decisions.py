@@ -0,0 +1,85 @@
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User, UserProfile
+from orders.db_indexes import purchases_table_exists
+from orders.models import CreatingOrder, Purchase
+from orders.views import OrderDecisionView
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест принятия заказа: N параллельных запросов approve на каждый '
+        'запрос на заказ. Печатает пропускную способность и распределение ответов. '
+        'Создаёт временного пользователя и удаляет его по завершении.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--approvers', type=int, default=8, help='Параллельных запросов на один заказ.')
+        parser.add_argument('--orders', type=int, default=50, help='Сколько запросов на заказ разыграть.')
+
+    def handle(self, *args, **options):
+        if not purchases_table_exists(connection):
+            raise CommandError('Таблица purchases не найдена.')
+
+        approvers = options['approvers']
+        user = User.objects.create_user(phone_number=self._free_phone_number(), password=uuid.uuid4().hex)
+        UserProfile.objects.filter(user=user).update(is_completed=True, is_participating=True)
+        try:
+            orders = [
+                CreatingOrder.objects.create(user=user, article=f'BENCH-{index}')
+                for index in range(options['orders'])
+            ]
+            statuses = Counter()
+            started = time.perf_counter()
+            for order in orders:
+                statuses.update(self._race(user, order, approvers))
+            elapsed = time.perf_counter() - started
+
+            total = sum(statuses.values())
+            purchases = Purchase.objects.filter(creating_order__in=orders).count()
+            errors = total - statuses['200'] - statuses['409']
+            self.stdout.write(f'Запросов: {total} за {elapsed:.2f} с ({total / elapsed:.1f} req/s)')
+            for code, count in sorted(statuses.items()):
+                self.stdout.write(f'  {code}: {count}')
+            self.stdout.write(f'Ошибок (не 200/409): {errors} ({errors / total:.1%})')
+            self.stdout.write(f'Создано заказов: {purchases} из {len(orders)}')
+        finally:
+            Purchase.objects.filter(tester=user).delete()
+            user.delete()
+
+    def _race(self, user, order, approvers):
+        factory = APIRequestFactory()
+        view = OrderDecisionView.as_view()
+        barrier = threading.Barrier(approvers)
+        results = []
+
+        def approve():
+            request = factory.post(f'/api/orders/creating/{order.id}/decision/', {'action': 'approve'}, format='json')
+            force_authenticate(request, user=user)
+            barrier.wait()
+            try:
+                results.append(str(view(request, pk=order.id).status_code))
+            except Exception as exc:
+                results.append(type(exc).__name__)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=approve) for _ in range(approvers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def _free_phone_number(self):
+        while True:
+            phone_number = f'+7999{uuid.uuid4().int % 10**7:07d}'
+            if not User.objects.filter(phone_number=phone_number).exists():
+                return phone_number
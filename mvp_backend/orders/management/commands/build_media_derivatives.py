@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from orders.media import build_derivatives
+from orders.models import ProofMedia
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит миниатюры, превью и постеры видео для файлов-подтверждений, которые ещё '
+        'ждут обработки: не дошедшие до пула процесса, упавшие (до --max-attempts попыток) '
+        'и зависшие в обработке дольше --stale-minutes. С --loop работает как отдельный воркер.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--max-attempts', type=int, default=3)
+        parser.add_argument('--stale-minutes', type=int, default=30)
+        parser.add_argument('--rebuild', action='store_true', help='Перестроить и готовые производные.')
+        parser.add_argument('--loop', type=int, default=0, metavar='SECONDS', help='Повторять с паузой.')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            ProofMedia.objects.update(status=ProofMedia.STATUS_PENDING, attempts=0)
+        while True:
+            built, failed = self._run_once(options)
+            self.stdout.write(f'Обработано файлов: {built}, с ошибкой: {failed}')
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
+
+    def _run_once(self, options):
+        stale = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        ProofMedia.objects.filter(status=ProofMedia.STATUS_PROCESSING, updated_at__lt=stale).update(
+            status=ProofMedia.STATUS_PENDING
+        )
+        hashes = list(
+            ProofMedia.objects.filter(status=ProofMedia.STATUS_PENDING).values_list('sha256', flat=True)
+            .union(
+                ProofMedia.objects.filter(
+                    status=ProofMedia.STATUS_FAILED, attempts__lt=options['max_attempts']
+                ).values_list('sha256', flat=True)
+            )
+        )
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(self._build, hashes))
+        return results.count(True), results.count(False)
+
+    def _build(self, sha256):
+        close_old_connections()
+        try:
+            # False — файл уже забрал другой воркер
+            return True if build_derivatives(sha256) else None
+        except Exception as exc:
+            self.stderr.write(f'{sha256}: {exc}')
+            return False
+        finally:
+            close_old_connections()
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.models import ProofUpload
+from orders.uploads import remove_part
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет незавершённые загрузки файлов-подтверждений, которые не докачивались '
+        'дольше --hours часов, вместе с их частями в MEDIA_ROOT.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=settings.PROOF_UPLOAD_STALE_HOURS)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = ProofUpload.objects.filter(status=ProofUpload.STATUS_UPLOADING, updated_at__lt=cutoff)
+        removed = 0
+        for upload in stale.iterator():
+            remove_part(upload)
+            removed += 1
+        stale.delete()
+        self.stdout.write(f'Удалено незавершённых загрузок: {removed}')
@@ -0,0 +1,87 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.matching import clean_criteria
+from orders.dispatch import DISPATCH_BATCH_SIZE, dispatch_offers, matching_tester_ids
+
+
+class Command(BaseCommand):
+    help = 'Рассылает предложение по артикулу всем тестерам, подходящим под фильтр.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('article')
+        parser.add_argument('--title', default='')
+        parser.add_argument('--notes', default='')
+        parser.add_argument('--pickup-point', default='', help='ПВЗ, который будет указан в предложении.')
+        parser.add_argument('--payload', default='{}', help='JSON с дополнительными данными предложения.')
+        parser.add_argument('--city', default='', help='Только тестеры из этого города.')
+        parser.add_argument('--tester-pickup-point', default='', help='Только тестеры с этим ПВЗ в профиле.')
+        parser.add_argument(
+            '--match',
+            action='append',
+            default=[],
+            metavar='ATTRIBUTE=VALUE',
+            help='Критерий индекса профилей, например platforms=Instagram (можно повторять).',
+        )
+        parser.add_argument('--any-participation', action='store_true', help='Не требовать is_participating.')
+        parser.add_argument('--any-completion', action='store_true', help='Не требовать заполненный профиль.')
+        parser.add_argument('--resend', action='store_true', help='Отправлять и тем, у кого уже есть запрос по артикулу.')
+        parser.add_argument('--assigned-by', help='Телефон сотрудника, от имени которого идёт рассылка.')
+        parser.add_argument('--batch-size', type=int, default=DISPATCH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            payload = json.loads(options['payload'])
+        except ValueError as exc:
+            raise CommandError(f'Некорректный JSON в --payload: {exc}')
+
+        assigned_by = None
+        if options['assigned_by']:
+            assigned_by = get_user_model().objects.filter(phone_number=options['assigned_by']).first()
+            if assigned_by is None:
+                raise CommandError('Сотрудник не найден.')
+
+        match = {}
+        for item in options['match']:
+            attribute, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Ожидается ATTRIBUTE=VALUE: {item}')
+            match.setdefault(attribute, []).append(value)
+        try:
+            clean_criteria(match)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        user_ids = matching_tester_ids(
+            participating=None if options['any_participation'] else True,
+            completed=None if options['any_completion'] else True,
+            city=options['city'],
+            pickup_point=options['tester_pickup_point'],
+            match=match,
+        )
+        started = time.perf_counter()
+
+        def progress(created, skipped):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  создано {created}, пропущено {skipped} ({elapsed:.1f} с)')
+
+        created, skipped = dispatch_offers(
+            user_ids,
+            article=options['article'],
+            title=options['title'],
+            notes=options['notes'],
+            pickup_point=options['pickup_point'],
+            payload=payload,
+            assigned_by=assigned_by,
+            skip_existing=not options['resend'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - started
+        rate = created / elapsed * 60 if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано предложений: {created}, пропущено: {skipped} за {elapsed:.1f} с (~{rate:.0f} в минуту)'
+        ))
@@ -0,0 +1,86 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from orders.admin import PurchaseAdmin
+from orders.models import CreatingOrder, Purchase, TestReport
+from orders.pagination import CreatedAtCursorPagination
+from orders.views import PendingCreatingOrdersView, PurchaseDetailView, PurchaseListView
+
+
+class Command(BaseCommand):
+    help = 'Печатает план выполнения (EXPLAIN QUERY PLAN) для запросов API заказов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID пользователя, от имени которого строятся запросы.')
+        parser.add_argument('--order', type=int, help='ID запроса на заказ; по умолчанию первый запрос пользователя.')
+        parser.add_argument('--purchase', type=int, help='ID заказа; по умолчанию первый заказ пользователя.')
+        parser.add_argument('--search', default='0', help='Строка поиска заказов в админке.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user_id = options.get('user')
+        user = User.objects.filter(pk=user_id).first() if user_id else User.objects.first()
+        if user is None:
+            raise CommandError('Пользователь не найден.')
+
+        # План не зависит от того, есть ли строка, но по умолчанию берём существующую
+        order_id = options.get('order') or CreatingOrder.objects.filter(user=user).values_list('pk', flat=True).first() or 0
+        purchase_id = options.get('purchase') or Purchase.objects.filter(tester=user).values_list('pk', flat=True).first() or 0
+
+        for title, queryset in self.get_queries(user, order_id, purchase_id, options['search']):
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain())
+            self.stdout.write('')
+
+    def view_queryset(self, view_class, request, **kwargs):
+        view = view_class(request=request, kwargs=kwargs)
+        return view.get_queryset()
+
+    def first_page(self, queryset):
+        # Курсорная пагинация читает страницу и одну строку сверх неё
+        pagination = CreatedAtCursorPagination
+        return queryset.order_by(*pagination.ordering)[:pagination.page_size + 1]
+
+    def get_queries(self, user, order_id, purchase_id, search):
+        # Те же queryset, что строят представления и админка, а не их копии
+        request = RequestFactory().get('/', {'q': search})
+        request.user = user
+        purchase_admin = PurchaseAdmin(Purchase, admin.site)
+        admin_results, _ = purchase_admin.get_search_results(request, purchase_admin.get_queryset(request), search)
+        return (
+            (
+                'GET /api/orders/creating/',
+                self.first_page(self.view_queryset(PendingCreatingOrdersView, request)),
+            ),
+            (
+                'POST /api/orders/creating/<pk>/decision/ (запрос на заказ)',
+                CreatingOrder.objects.filter(pk=order_id, user=user),
+            ),
+            (
+                'POST /api/orders/creating/<pk>/decision/ (условный UPDATE)',
+                CreatingOrder.objects.filter(pk=order_id, user=user, status=CreatingOrder.STATUS_PROCESSING),
+            ),
+            (
+                'GET /api/orders/purchases/',
+                self.first_page(self.view_queryset(PurchaseListView, request)),
+            ),
+            (
+                'GET /api/orders/purchases/<id>/',
+                self.view_queryset(PurchaseDetailView, request, purchase_id=purchase_id).filter(pk=purchase_id),
+            ),
+            (
+                'GET /api/orders/purchases/<id>/report/ (заказ)',
+                Purchase.objects.filter(id=purchase_id, tester=user),
+            ),
+            (
+                'GET /api/orders/purchases/<id>/report/',
+                TestReport.objects.filter(purchase_id=purchase_id),
+            ),
+            (
+                'Админка: поиск заказов',
+                admin_results,
+            ),
+        )
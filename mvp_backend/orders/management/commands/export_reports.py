@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_chunks, export_rows
+from orders.serializers import ReportFilterSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает отчёты о тестировании вместе с заказом и профилем тестера в CSV или XLSX. '
+        'Строки читаются из БД пачками и пишутся в файл сразу — память не растёт с размером выгрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки или «-» для stdout.')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, help='По умолчанию определяется по расширению.')
+        parser.add_argument('--article')
+        parser.add_argument('--category')
+        parser.add_argument('--date-from', help='ГГГГ-ММ-ДД, по дате отправки отчёта.')
+        parser.add_argument('--date-to', help='ГГГГ-ММ-ДД, включительно.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        filters = ReportFilterSerializer(data={
+            field: options[field]
+            for field in ('article', 'category', 'date_from', 'date_to')
+            if options[field] is not None
+        })
+        if not filters.is_valid():
+            raise CommandError(filters.errors)
+        path = options['path']
+        output = options['format'] or ('xlsx' if path.endswith('.xlsx') else 'csv')
+
+        chunks = export_chunks(output, export_rows(chunk_size=options['chunk_size'], **filters.validated_data))
+        if path == '-':
+            self._write(chunks, sys.stdout.buffer)
+        else:
+            with open(path, 'wb') as target:
+                self._write(chunks, target)
+            self.stderr.write(f'Выгрузка записана в {path}')
+
+    def _write(self, chunks, target):
+        for chunk in chunks:
+            target.write(chunk)
+        target.flush()
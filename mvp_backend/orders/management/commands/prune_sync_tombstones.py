@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.models import SyncTombstone
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет надгробия удалённых объектов старше SYNC_TOMBSTONE_RETENTION_DAYS дней. '
+        'Токены синхронизации старше этого срока уже отклоняются, так что надгробия им не нужны.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='По умолчанию SYNC_TOMBSTONE_RETENTION_DAYS.')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.SYNC_TOMBSTONE_RETENTION_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        removed, _ = SyncTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(f'Удалено надгробий: {removed}')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from orders.db_indexes import (
+    PURCHASES_INDEXES,
+    create_purchases_indexes,
+    missing_purchases_indexes,
+    purchases_table_exists,
+)
+
+
+class Command(BaseCommand):
+    help = 'Проверяет и создаёт индексы неуправляемой таблицы purchases.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить наличие индексов; код выхода 1, если чего-то не хватает.',
+        )
+
+    def handle(self, *args, **options):
+        if not purchases_table_exists(connection):
+            raise CommandError('Таблица purchases не найдена.')
+
+        missing = missing_purchases_indexes(connection)
+        for name in PURCHASES_INDEXES:
+            state = 'MISSING' if name in missing else 'ok'
+            self.stdout.write(f'{name}: {state}')
+
+        if not missing:
+            return
+        if options['check']:
+            raise CommandError(f'Отсутствуют индексы: {", ".join(missing)}')
+
+        with connection.schema_editor() as schema_editor:
+            create_purchases_indexes(schema_editor, missing)
+        self.stdout.write(self.style.SUCCESS(f'Созданы индексы: {", ".join(missing)}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from orders.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает сводку оценок отчётов (ReportScoreRollup) по всем отчётам. '
+        'Нужна после изменений в обход моделей: queryset.update(), сырой SQL, смена артикула заказа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups(batch_size=options['batch_size'])
+        self.stdout.write(f'Строк сводки: {rows}')
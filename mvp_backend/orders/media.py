@@ -0,0 +1,190 @@
+"""Производные файлов-подтверждений: миниатюры, превью и постеры видео.
+
+Рядом с оригиналом proofs/ab/cd/<sha256>.<ext> строятся
+<sha256>.thumb.webp (до THUMBNAIL_SIZE), <sha256>.preview.webp (до PREVIEW_SIZE)
+и для видео <sha256>.poster.jpg — кадр, извлечённый ffmpeg. Работа идёт в
+пуле потоков процесса после коммита загрузки, вне запроса. Состояние
+хранится в ProofMedia по хэшу: задача сначала захватывает строку условным
+UPDATE, так что повтор и параллельный запуск не делают работу дважды.
+Упавшие и не дошедшие до пула задачи доделывает build_media_derivatives.
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import ProofMedia
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+PREVIEW_SIZE = (1280, 1280)
+WEBP_QUALITY = 80
+POSTER_OFFSET_SECONDS = 1
+FFMPEG_TIMEOUT = 60
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class MediaError(Exception):
+    pass
+
+
+def media_path(name):
+    return os.path.join(settings.MEDIA_ROOT, name)
+
+
+def media_url(name):
+    return f'{settings.MEDIA_URL}{name}' if name else None
+
+
+def derivative_name(name, kind, extension):
+    """proofs/ab/cd/<sha256>.mp4 -> proofs/ab/cd/<sha256>.<kind>.<extension>."""
+    directory, filename = name.rsplit('/', 1)
+    return f'{directory}/{filename.split(".", 1)[0]}.{kind}.{extension}'
+
+
+def proof_sha256(name):
+    return name.rsplit('/', 1)[-1].split('.', 1)[0]
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.MEDIA_DERIVATIVE_WORKERS, thread_name_prefix='proof-media'
+            )
+    return _executor
+
+
+def schedule_derivatives(sha256, name, content_type):
+    """Ставит файл в очередь на производные; повтор для того же хэша ничего не делает."""
+    ProofMedia.objects.bulk_create(
+        [ProofMedia(sha256=sha256, path=name, content_type=content_type)],
+        ignore_conflicts=True,
+    )
+    enqueue_derivatives([sha256])
+
+
+def enqueue_derivatives(hashes):
+    """Отдаёт файлы пулу процесса после коммита текущей транзакции."""
+    if not settings.MEDIA_DERIVATIVE_WORKERS:
+        return
+
+    def submit():
+        for sha256 in hashes:
+            get_executor().submit(run_derivatives, sha256)
+
+    transaction.on_commit(submit)
+
+
+def run_derivatives(sha256):
+    """Точка входа задачи пула: свои соединения с БД, ошибки — только в лог."""
+    close_old_connections()
+    try:
+        build_derivatives(sha256)
+    except Exception:
+        logger.exception('Derivatives for %s failed', sha256)
+    finally:
+        close_old_connections()
+
+
+def build_derivatives(sha256):
+    """Строит производные файла; возвращает True, если работу выполнил этот вызов."""
+    claimed = ProofMedia.objects.filter(
+        sha256=sha256, status__in=(ProofMedia.STATUS_PENDING, ProofMedia.STATUS_FAILED)
+    ).update(status=ProofMedia.STATUS_PROCESSING, attempts=F('attempts') + 1, updated_at=timezone.now())
+    if not claimed:
+        return False
+
+    media = ProofMedia.objects.get(sha256=sha256)
+    try:
+        names = render_derivatives(media.path, media.content_type)
+    except Exception as exc:
+        ProofMedia.objects.filter(sha256=sha256).update(
+            status=ProofMedia.STATUS_FAILED, error=str(exc)[:1000], updated_at=timezone.now()
+        )
+        raise
+    ProofMedia.objects.filter(sha256=sha256).update(
+        status=ProofMedia.STATUS_READY, error='', updated_at=timezone.now(), **names
+    )
+    return True
+
+
+def render_derivatives(name, content_type):
+    """Пишет файлы производных рядом с оригиналом; возвращает их имена по полям ProofMedia."""
+    names = {}
+    source = media_path(name)
+    if content_type.startswith('video/'):
+        names['poster'] = derivative_name(name, 'poster', 'jpg')
+        extract_poster(source, media_path(names['poster']))
+        source = media_path(names['poster'])
+
+    names['thumbnail'] = derivative_name(name, 'thumb', 'webp')
+    names['preview'] = derivative_name(name, 'preview', 'webp')
+    with Image.open(source) as image:
+        # JPEG декодируется сразу в уменьшенном масштабе — в разы быстрее на фото с телефона
+        image.draft('RGB', PREVIEW_SIZE)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        for field, size in (('preview', PREVIEW_SIZE), ('thumbnail', THUMBNAIL_SIZE)):
+            image.thumbnail(size, Image.Resampling.LANCZOS)
+            _save_atomic(image, media_path(names[field]))
+    return names
+
+
+def extract_poster(source, target):
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise MediaError('ffmpeg не найден: постер видео не построить')
+    partial = f'{target}.tmp.jpg'
+    command = [
+        ffmpeg, '-v', 'error', '-y', '-ss', str(POSTER_OFFSET_SECONDS), '-i', source,
+        '-frames:v', '1', '-vf', f'scale=min({PREVIEW_SIZE[0]}\\,iw):-2', partial,
+    ]
+    result = subprocess.run(command, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    if result.returncode != 0 or not os.path.exists(partial):
+        # Ролик короче смещения — берём первый кадр
+        command[command.index('-ss') + 1] = '0'
+        result = subprocess.run(command, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    if result.returncode != 0 or not os.path.exists(partial):
+        raise MediaError(result.stderr.decode(errors='replace')[-500:] or 'ffmpeg не извлёк кадр')
+    os.replace(partial, target)
+
+
+def _save_atomic(image, target):
+    partial = f'{target}.tmp'
+    image.save(partial, format='WEBP', quality=WEBP_QUALITY, method=4)
+    os.replace(partial, target)
+
+
+def proof_media_items(files):
+    """Ссылки на оригиналы и производные для списка proof_files — один запрос."""
+    files = [name for name in files if isinstance(name, str)] if isinstance(files, list) else []
+    if not files:
+        return []
+    media = ProofMedia.objects.in_bulk([proof_sha256(name) for name in files])
+    items = []
+    for name in files:
+        entry = media.get(proof_sha256(name))
+        ready = entry is not None and entry.status == ProofMedia.STATUS_READY
+        items.append({
+            'file': media_url(name),
+            'status': entry.status if entry else None,
+            'thumbnail': media_url(entry.thumbnail) if ready else None,
+            'preview': media_url(entry.preview) if ready else None,
+            'poster': media_url(entry.poster) if ready else None,
+        })
+    return items
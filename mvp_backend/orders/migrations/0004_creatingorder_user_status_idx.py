@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+PURCHASES_TESTER_INDEX = 'purchases_tester_created_idx'
+
+
+def create_purchases_index(apps, schema_editor):
+    # Таблица purchases не управляется Django (managed=False), поэтому индекс
+    # создаём вручную и только если таблица уже существует.
+    connection = schema_editor.connection
+    if 'purchases' not in connection.introspection.table_names():
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {PURCHASES_TESTER_INDEX} '
+        'ON purchases (tester_id, created_at DESC, id DESC)'
+    )
+
+
+def drop_purchases_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if 'purchases' not in connection.introspection.table_names():
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {PURCHASES_TESTER_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_testreport'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creatingorder',
+            index=models.Index(fields=['user', 'status', '-created_at', '-id'], name='creatingorder_user_status_idx'),
+        ),
+        migrations.RunPython(create_purchases_index, drop_purchases_index),
+    ]
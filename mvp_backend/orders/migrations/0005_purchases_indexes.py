@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Снимок orders.db_indexes на момент миграции: код приложения может измениться,
+# а миграция должна создавать те же индексы
+PURCHASES_INDEXES = {
+    'purchases_creating_order_idx': '(creating_order_id)',
+    'purchases_external_id_idx': '(external_id)',
+}
+
+
+def create_indexes(apps, schema_editor):
+    # Таблица purchases не управляется Django (managed=False): индексы создаём
+    # вручную и только если таблица уже существует
+    if 'purchases' not in schema_editor.connection.introspection.table_names():
+        return
+    for name, columns in PURCHASES_INDEXES.items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON purchases {columns}')
+
+
+def drop_indexes(apps, schema_editor):
+    if 'purchases' not in schema_editor.connection.introspection.table_names():
+        return
+    for name in PURCHASES_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_creatingorder_user_status_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creatingorder',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='creatingorder_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creatingorder',
+            index=models.Index(fields=['status', '-created_at'], name='creatingorder_status_idx'),
+        ),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
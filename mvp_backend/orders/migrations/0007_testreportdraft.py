@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_synctombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestReportDraft',
+            fields=[
+                ('purchase', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='test_report_draft', serialize=False, to='orders.purchase', verbose_name='Заказ')),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Черновик отчёта',
+                'verbose_name_plural': 'Черновики отчётов',
+            },
+        ),
+    ]
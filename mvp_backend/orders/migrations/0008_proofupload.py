@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:24
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_testreportdraft'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProofUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('content_type', models.CharField(max_length=100, verbose_name='Тип')),
+                ('size', models.BigIntegerField(verbose_name='Размер, байт')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='Получено, байт')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256')),
+                ('path', models.CharField(blank=True, max_length=255, verbose_name='Путь в MEDIA_ROOT')),
+                ('status', models.CharField(choices=[('uploading', 'Загружается'), ('complete', 'Загружен')], default='uploading', max_length=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('purchase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proof_uploads', to='orders.purchase', verbose_name='Заказ')),
+            ],
+            options={
+                'verbose_name': 'Загрузка файла',
+                'verbose_name_plural': 'Загрузки файлов',
+                'ordering': ('created_at',),
+                'indexes': [models.Index(fields=['purchase', 'status'], name='proofupload_purchase_idx'), models.Index(fields=['status', 'updated_at'], name='proofupload_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_proofupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProofMedia',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('path', models.CharField(max_length=255, verbose_name='Оригинал')),
+                ('content_type', models.CharField(max_length=100, verbose_name='Тип')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Обрабатывается'), ('ready', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=12)),
+                ('thumbnail', models.CharField(blank=True, max_length=255, verbose_name='Миниатюра')),
+                ('preview', models.CharField(blank=True, max_length=255, verbose_name='Превью')),
+                ('poster', models.CharField(blank=True, max_length=255, verbose_name='Постер видео')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Производные файла',
+                'verbose_name_plural': 'Производные файлов',
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='proofmedia_status_idx')],
+            },
+        ),
+    ]
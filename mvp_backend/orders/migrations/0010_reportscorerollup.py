@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_proofmedia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportScoreRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('article', models.CharField(max_length=255)),
+                ('category', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+                ('reports', models.IntegerField(default=0)),
+                ('overall_sum', models.IntegerField(default=0)),
+                ('overall_count', models.IntegerField(default=0)),
+                ('quality_effect_sum', models.IntegerField(default=0)),
+                ('quality_effect_count', models.IntegerField(default=0)),
+                ('value_for_money_sum', models.IntegerField(default=0)),
+                ('value_for_money_count', models.IntegerField(default=0)),
+                ('nps_promoters', models.IntegerField(default=0)),
+                ('nps_passives', models.IntegerField(default=0)),
+                ('nps_detractors', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Сводка оценок',
+                'verbose_name_plural': 'Сводки оценок',
+                'indexes': [models.Index(fields=['category', 'day'], name='reportrollup_category_idx'), models.Index(fields=['day'], name='reportrollup_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('article', 'category', 'day'), name='reportrollup_bucket_uniq')],
+            },
+        ),
+    ]
@@ -1,5 +1,7 @@
+import uuid
+
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 
 
 class CreatingOrder(models.Model):
@@ -37,6 +39,11 @@ class CreatingOrder(models.Model):
 
     class Meta:
         ordering = ('-created_at',)
+        indexes = (
+            models.Index(fields=('user', 'status', '-created_at', '-id'), name='creatingorder_user_status_idx'),
+            models.Index(fields=('user', '-created_at', '-id'), name='creatingorder_user_created_idx'),
+            models.Index(fields=('status', '-created_at'), name='creatingorder_status_idx'),
+        )
         verbose_name = 'Запрос на заказ'
         verbose_name_plural = 'Запросы на заказы'
 
@@ -44,6 +51,14 @@ class CreatingOrder(models.Model):
         return f'{self.article} ({self.get_status_display()})'
 
 
+class PurchaseQuerySet(models.QuerySet):
+    def with_report_flag(self):
+        """Аннотирует has_report одним EXISTS-подзапросом вместо запроса на строку."""
+        return self.annotate(
+            has_report=models.Exists(TestReport.objects.filter(purchase_id=models.OuterRef('pk')))
+        )
+
+
 class Purchase(models.Model):
     STATUS_PENDING = 'PENDING'
     STATUS_IN_PROGRESS = 'IN_PROGRESS'
@@ -79,6 +94,8 @@ class Purchase(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PurchaseQuerySet.as_manager()
+
     class Meta:
         ordering = ('-created_at',)
         managed = False
@@ -90,6 +107,38 @@ class Purchase(models.Model):
         return f'Заказ #{self.id or "new"} - {self.article}'
 
 
+class SyncTombstone(models.Model):
+    """Запись об удалённом объекте для дельта-синхронизации (/api/orders/sync/)."""
+
+    KIND_ORDER = 'order'
+    KIND_PURCHASE = 'purchase'
+
+    KIND_CHOICES = (
+        (KIND_ORDER, 'Запрос на заказ'),
+        (KIND_PURCHASE, 'Заказ'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='sync_tombstones',
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = (
+            models.Index(fields=('user', 'id'), name='synctombstone_user_idx'),
+        )
+        verbose_name = 'Удалённый объект'
+        verbose_name_plural = 'Удалённые объекты'
+
+    def __str__(self):
+        return f'{self.get_kind_display()} #{self.object_id}'
+
+
 class TestReport(models.Model):
     """Универсальная форма отчёта о тестировании."""
     
@@ -179,3 +228,153 @@ class TestReport(models.Model):
     
     def __str__(self):
         return f'Отчёт по заказу #{self.purchase_id} - {self.item_name}'
+
+    def save(self, *args, **kwargs):
+        # Сводка оценок (orders.rollups) обновляется сигналом post_save в той же транзакции
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class TestReportDraft(models.Model):
+    """Черновик отчёта до отправки: только изменённые тестером поля, как пришли с формы."""
+
+    purchase = models.OneToOneField(
+        Purchase,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='test_report_draft',
+        verbose_name='Заказ',
+    )
+    data = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Черновик отчёта'
+        verbose_name_plural = 'Черновики отчётов'
+
+    def __str__(self):
+        return f'Черновик отчёта по заказу #{self.purchase_id}'
+
+
+class ProofUpload(models.Model):
+    """Загрузка файла-подтверждения к отчёту частями (см. orders.uploads)."""
+
+    STATUS_UPLOADING = 'uploading'
+    STATUS_COMPLETE = 'complete'
+
+    STATUS_CHOICES = (
+        (STATUS_UPLOADING, 'Загружается'),
+        (STATUS_COMPLETE, 'Загружен'),
+    )
+
+    # Допустимые типы файлов и расширение, под которым файл хранится и отдаётся
+    # из MEDIA_URL; имя файла от клиента на расширение не влияет
+    CONTENT_TYPE_EXTENSIONS = {
+        'image/jpeg': 'jpg',
+        'image/png': 'png',
+        'image/webp': 'webp',
+        'image/heic': 'heic',
+        'image/heif': 'heif',
+        'image/gif': 'gif',
+        'video/mp4': 'mp4',
+        'video/quicktime': 'mov',
+    }
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    purchase = models.ForeignKey(
+        Purchase,
+        on_delete=models.CASCADE,
+        related_name='proof_uploads',
+        verbose_name='Заказ',
+    )
+    filename = models.CharField(max_length=255, verbose_name='Имя файла')
+    content_type = models.CharField(max_length=100, verbose_name='Тип')
+    size = models.BigIntegerField(verbose_name='Размер, байт')
+    offset = models.BigIntegerField(default=0, verbose_name='Получено, байт')
+    sha256 = models.CharField(max_length=64, blank=True, verbose_name='SHA-256')
+    path = models.CharField(max_length=255, blank=True, verbose_name='Путь в MEDIA_ROOT')
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ('created_at',)
+        indexes = (
+            models.Index(fields=('purchase', 'status'), name='proofupload_purchase_idx'),
+            models.Index(fields=('status', 'updated_at'), name='proofupload_status_idx'),
+        )
+        verbose_name = 'Загрузка файла'
+        verbose_name_plural = 'Загрузки файлов'
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
+
+
+class ProofMedia(models.Model):
+    """Производные файла-подтверждения (миниатюра, превью, постер видео) по его SHA-256."""
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_PROCESSING, 'Обрабатывается'),
+        (STATUS_READY, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    )
+
+    sha256 = models.CharField(max_length=64, primary_key=True, verbose_name='SHA-256')
+    path = models.CharField(max_length=255, verbose_name='Оригинал')
+    content_type = models.CharField(max_length=100, verbose_name='Тип')
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    thumbnail = models.CharField(max_length=255, blank=True, verbose_name='Миниатюра')
+    preview = models.CharField(max_length=255, blank=True, verbose_name='Превью')
+    poster = models.CharField(max_length=255, blank=True, verbose_name='Постер видео')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('status', 'updated_at'), name='proofmedia_status_idx'),
+        )
+        verbose_name = 'Производные файла'
+        verbose_name_plural = 'Производные файлов'
+
+    def __str__(self):
+        return f'{self.path} ({self.get_status_display()})'
+
+
+class ReportScoreRollup(models.Model):
+    """Суммы оценок отчётов по (артикул, категория, день) для дашборда — см. orders.rollups."""
+
+    article = models.CharField(max_length=255)
+    category = models.CharField(max_length=50)
+    day = models.DateField()
+    reports = models.IntegerField(default=0)
+    overall_sum = models.IntegerField(default=0)
+    overall_count = models.IntegerField(default=0)
+    quality_effect_sum = models.IntegerField(default=0)
+    quality_effect_count = models.IntegerField(default=0)
+    value_for_money_sum = models.IntegerField(default=0)
+    value_for_money_count = models.IntegerField(default=0)
+    nps_promoters = models.IntegerField(default=0)
+    nps_passives = models.IntegerField(default=0)
+    nps_detractors = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('article', 'category', 'day'), name='reportrollup_bucket_uniq'),
+        )
+        indexes = (
+            models.Index(fields=('category', 'day'), name='reportrollup_category_idx'),
+            models.Index(fields=('day',), name='reportrollup_day_idx'),
+        )
+        verbose_name = 'Сводка оценок'
+        verbose_name_plural = 'Сводки оценок'
+
+    def __str__(self):
+        return f'{self.article} / {self.category} / {self.day}'
@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Keyset-пагинация по (created_at, id) для списков заказов.
+
+    Курсор кодирует позицию последней строки страницы, поэтому стоимость
+    запроса не зависит от глубины листания (в отличие от OFFSET).
+    """
+
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,172 @@
+"""Сводка оценок отчётов по (артикул, категория, день).
+
+ReportScoreRollup хранит суммы и количества score_overall,
+score_quality_effect, score_value_for_money и корзины NPS по
+score_recommend (9–10 промоутеры, 7–8 нейтралы, 0–6 критики). Отчёт при
+сохранении и удалении меняет свою строку на разницу между прежним и новым
+вкладом одним INSERT ... ON CONFLICT DO UPDATE — в той же транзакции, что и
+сам отчёт (сигналы orders.signals внутри атомарных TestReport.save() и
+delete()). Дашборд читает по строке на день вместо агрегата по всем отчётам.
+
+День — дата created_at отчёта в TIME_ZONE. Изменения в обход моделей
+(queryset.update(), сырой SQL, смена артикула заказа) сводка не видит —
+её пересчитывает rebuild_report_rollups.
+"""
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Purchase, ReportScoreRollup, TestReport
+
+SCORES = ('overall', 'quality_effect', 'value_for_money')
+NPS_BUCKETS = ('nps_promoters', 'nps_passives', 'nps_detractors')
+COUNTERS = ('reports', *(f'{score}_{part}' for score in SCORES for part in ('sum', 'count')), *NPS_BUCKETS)
+
+# Поля отчёта, от которых зависит его вклад в сводку
+ROLLUP_FIELDS = ('category', 'created_at', *(f'score_{score}' for score in SCORES), 'score_recommend')
+
+PERIODS = ('day', 'week', 'month', 'total')
+
+
+def nps_bucket(score):
+    if score is None:
+        return None
+    if score >= 9:
+        return 'nps_promoters'
+    if score >= 7:
+        return 'nps_passives'
+    return 'nps_detractors'
+
+
+def rollup_state(report, previous=None):
+    """Значения ROLLUP_FIELDS отчёта или None, если отчёт ещё не сохранён.
+
+    Отложенные поля (only()/defer()) не загружаются: берутся из previous,
+    а без него состояние считается неизвестным.
+    """
+    state = {}
+    for field in ROLLUP_FIELDS:
+        if field in report.__dict__:
+            state[field] = report.__dict__[field]
+        elif previous is not None:
+            state[field] = previous[field]
+        else:
+            return None
+    if state['created_at'] is None:
+        return None
+    return state
+
+
+def contribution(state):
+    """Вклад отчёта в строку сводки: {счётчик: значение}."""
+    counters = dict.fromkeys(COUNTERS, 0)
+    counters['reports'] = 1
+    for score in SCORES:
+        value = state[f'score_{score}']
+        if value is not None:
+            counters[f'{score}_sum'] = value
+            counters[f'{score}_count'] = 1
+    bucket = nps_bucket(state['score_recommend'])
+    if bucket:
+        counters[bucket] = 1
+    return counters
+
+
+def bucket_key(state):
+    return state['category'], timezone.localdate(state['created_at'])
+
+
+def report_article(report):
+    if 'purchase' in report._state.fields_cache:
+        return report.purchase.article
+    return Purchase.objects.filter(pk=report.purchase_id).values_list('article', flat=True).first() or ''
+
+
+def apply_change(report, old, new):
+    """Переносит вклад отчёта из состояния old в new (любое может быть None)."""
+    deltas = {}
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+        delta = deltas.setdefault(bucket_key(state), dict.fromkeys(COUNTERS, 0))
+        for counter, value in contribution(state).items():
+            delta[counter] += sign * value
+    deltas = {key: delta for key, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+
+    article = report_article(report)
+    for (category, day), delta in deltas.items():
+        upsert_delta(article, category, day, delta)
+
+
+def upsert_delta(article, category, day, delta):
+    table = connection.ops.quote_name(ReportScoreRollup._meta.db_table)
+    columns = [connection.ops.quote_name(counter) for counter in COUNTERS]
+    key = [connection.ops.quote_name(name) for name in ('article', 'category', 'day')]
+    updates = ', '.join(f'{column} = {table}.{column} + EXCLUDED.{column}' for column in columns)
+    params = [article, category, connection.ops.adapt_datefield_value(day), *(delta[c] for c in COUNTERS)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({", ".join(key + columns)}) '
+            f'VALUES ({", ".join(["%s"] * len(params))}) '
+            f'ON CONFLICT ({", ".join(key)}) DO UPDATE SET {updates}',
+            params,
+        )
+    if delta['reports'] < 0:
+        ReportScoreRollup.objects.filter(article=article, category=category, day=day, reports__lte=0).delete()
+
+
+def rollup_rows():
+    """Сводка, посчитанная заново по всем отчётам: словари полей ReportScoreRollup."""
+    aggregates = {'reports': Count('id')}
+    for score in SCORES:
+        aggregates[f'{score}_sum'] = Coalesce(Sum(f'score_{score}'), 0)
+        aggregates[f'{score}_count'] = Count(f'score_{score}')
+    aggregates['nps_promoters'] = Count('id', filter=Q(score_recommend__gte=9))
+    aggregates['nps_passives'] = Count('id', filter=Q(score_recommend__gte=7, score_recommend__lte=8))
+    aggregates['nps_detractors'] = Count('id', filter=Q(score_recommend__lte=6))
+    return (
+        TestReport.objects.annotate(article=F('purchase__article'), day=TruncDate('created_at'))
+        .values('article', 'category', 'day')
+        .annotate(**aggregates)
+        .order_by()
+    )
+
+
+def rebuild_rollups(batch_size=1000):
+    """Пересчитывает всю сводку в одной транзакции; возвращает число строк."""
+    # Агрегат читается в той же транзакции: отчёты, сохранённые между чтением и
+    # заменой сводки, иначе потеряли бы свой вклад
+    with transaction.atomic():
+        rows = [ReportScoreRollup(**row) for row in rollup_rows().iterator()]
+        ReportScoreRollup.objects.all().delete()
+        ReportScoreRollup.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def report_stats(rollups, period='day'):
+    """Средние оценки и NPS по строкам сводки, сгруппированным по артикулу, категории и периоду."""
+    group = ['article', 'category']
+    if period != 'total':
+        truncate = {'day': F('day'), 'week': TruncWeek('day'), 'month': TruncMonth('day')}[period]
+        rollups = rollups.annotate(period=truncate)
+        group.append('period')
+    rows = rollups.values(*group).annotate(**{counter: Sum(counter) for counter in COUNTERS}).order_by(*group)
+
+    results = []
+    for row in rows:
+        item = {field: row[field] for field in group}
+        item['reports'] = row['reports']
+        for score in SCORES:
+            count = row[f'{score}_count']
+            item[f'score_{score}'] = round(row[f'{score}_sum'] / count, 2) if count else None
+        responses = sum(row[bucket] for bucket in NPS_BUCKETS)
+        item['nps_responses'] = responses
+        item['nps'] = (
+            round((row['nps_promoters'] - row['nps_detractors']) * 100 / responses, 1) if responses else None
+        )
+        results.append(item)
+    return results
@@ -1,9 +1,17 @@
+import re
+
+from django.conf import settings
 from rest_framework import serializers
 
-from .models import CreatingOrder, Purchase, TestReport
+from accounts.matching import clean_criteria
+from mvp_backend.fieldsets import SparseFieldsetSerializerMixin
+from .media import proof_media_items
+from .models import CreatingOrder, ProofUpload, Purchase, TestReport
+from .export import EXPORT_FORMATS
+from .rollups import PERIODS
 
 
-class CreatingOrderSerializer(serializers.ModelSerializer):
+class CreatingOrderSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CreatingOrder
         fields = (
@@ -20,7 +28,7 @@ class CreatingOrderSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
-class PurchaseSerializer(serializers.ModelSerializer):
+class PurchaseSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     has_report = serializers.SerializerMethodField()
     
     class Meta:
@@ -39,6 +47,10 @@ class PurchaseSerializer(serializers.ModelSerializer):
         read_only_fields = fields
     
     def get_has_report(self, obj):
+        # В списках флаг приходит из Purchase.objects.with_report_flag()
+        annotated = getattr(obj, 'has_report', None)
+        if annotated is not None:
+            return annotated
         return hasattr(obj, 'test_report')
 
 
@@ -55,7 +67,64 @@ class OrderDecisionSerializer(serializers.Serializer):
         return attrs
 
 
-class TestReportSerializer(serializers.ModelSerializer):
+class BulkOrderDecisionItemSerializer(OrderDecisionSerializer):
+    id = serializers.IntegerField()
+
+
+class OfferDispatchSerializer(serializers.Serializer):
+    article = serializers.CharField(max_length=255)
+    title = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    pickup_point = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    payload = serializers.JSONField(required=False, default=dict)
+    skip_existing = serializers.BooleanField(required=False, default=True)
+    # Фильтр тестеров
+    participating = serializers.BooleanField(required=False, allow_null=True, default=True)
+    completed = serializers.BooleanField(required=False, allow_null=True, default=True)
+    city = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    tester_pickup_point = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    match = serializers.DictField(required=False, default=dict)
+
+    def validate_match(self, value):
+        try:
+            clean_criteria(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+
+class ReportFilterSerializer(serializers.Serializer):
+    """Фильтры отчётов для сводки и выгрузки; даты — по дню создания отчёта."""
+
+    article = serializers.CharField(max_length=255, required=False)
+    category = serializers.ChoiceField(choices=TestReport.CATEGORY_CHOICES, required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError({'date_to': 'Конец периода раньше начала.'})
+        return attrs
+
+
+class ReportStatsQuerySerializer(ReportFilterSerializer):
+    group = serializers.ChoiceField(choices=PERIODS, required=False, default='day')
+
+
+class ReportExportQuerySerializer(ReportFilterSerializer):
+    # Не format: этот параметр DRF забирает под выбор рендерера
+    output = serializers.ChoiceField(choices=EXPORT_FORMATS, required=False, default='csv')
+
+
+class ProofMediaField(serializers.ReadOnlyField):
+    """Оригиналы и производные (миниатюра, превью, постер) файлов из proof_files."""
+
+    def to_representation(self, value):
+        return proof_media_items(value)
+
+
+class TestReportSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    proof_media = ProofMediaField(source='proof_files')
     purchase_id = serializers.IntegerField(source='purchase.id', read_only=True)
     purchase_article = serializers.CharField(source='purchase.article', read_only=True)
     
@@ -74,6 +143,7 @@ class TestReportSerializer(serializers.ModelSerializer):
             'report_type',
             'proof_links',
             'proof_files',
+            'proof_media',
             'score_overall',
             'score_expectation_fit',
             'score_quality_effect',
@@ -135,3 +205,31 @@ class TestReportSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Можно загрузить не более 5 файлов')
         return value
 
+
+class ProofUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProofUpload
+        fields = ('id', 'filename', 'content_type', 'size', 'offset', 'sha256', 'path', 'status', 'created_at')
+        read_only_fields = ('id', 'offset', 'path', 'status', 'created_at')
+        extra_kwargs = {'sha256': {'required': False}}
+
+    def validate_content_type(self, value):
+        value = value.split(';', 1)[0].strip().lower()
+        if value not in ProofUpload.CONTENT_TYPE_EXTENSIONS:
+            raise serializers.ValidationError(
+                'Можно загружать только фото (JPEG, PNG, WebP, HEIC, GIF) и видео (MP4, MOV)'
+            )
+        return value
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Пустой файл')
+        if value > settings.PROOF_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'Файл больше {settings.PROOF_UPLOAD_MAX_SIZE // 2 ** 20} МБ')
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and not re.fullmatch(r'[0-9a-f]{64}', value):
+            raise serializers.ValidationError('Ожидается SHA-256 в hex')
+        return value
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CreatingOrder, Purchase, SyncTombstone, TestReport
+from .rollups import ROLLUP_FIELDS, apply_change, rollup_state
+from .stream import notifier
+
+
+def _deleted_with_user(origin):
+    # При удалении самого пользователя его надгробия тоже удаляются каскадом,
+    # а новые ссылались бы на удалённую строку.
+    model = getattr(origin, 'model', type(origin))
+    return model is get_user_model()
+
+
+@receiver(post_save, sender=CreatingOrder)
+def notify_offer_stream(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: notifier.notify(user_id))
+
+
+@receiver(post_delete, sender=CreatingOrder)
+def record_order_tombstone(sender, instance, origin=None, **kwargs):
+    if _deleted_with_user(origin):
+        return
+    SyncTombstone.objects.create(
+        user_id=instance.user_id,
+        kind=SyncTombstone.KIND_ORDER,
+        object_id=instance.pk,
+    )
+
+
+@receiver(post_delete, sender=Purchase)
+def record_purchase_tombstone(sender, instance, origin=None, **kwargs):
+    if instance.tester_id is None or _deleted_with_user(origin):
+        return
+    SyncTombstone.objects.create(
+        user_id=instance.tester_id,
+        kind=SyncTombstone.KIND_PURCHASE,
+        object_id=instance.pk,
+    )
+
+
+@receiver(post_init, sender=TestReport)
+def remember_rollup_state(sender, instance, **kwargs):
+    instance._rollup_state = rollup_state(instance)
+
+
+def _load_rollup_state(instance):
+    # Отчёт загружен с only()/defer() — прежние значения берём из БД
+    if instance._rollup_state is None and not instance._state.adding and instance.pk:
+        stored = TestReport.objects.filter(pk=instance.pk).only(*ROLLUP_FIELDS).first()
+        instance._rollup_state = stored and stored._rollup_state
+
+
+@receiver(pre_save, sender=TestReport)
+def load_rollup_state_before_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not set(update_fields) & set(ROLLUP_FIELDS)):
+        return
+    _load_rollup_state(instance)
+
+
+@receiver(post_save, sender=TestReport)
+def update_score_rollup(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not set(update_fields) & set(ROLLUP_FIELDS)):
+        return
+    state = rollup_state(instance, previous=instance._rollup_state)
+    apply_change(instance, instance._rollup_state, state)
+    instance._rollup_state = state
+
+
+@receiver(pre_delete, sender=TestReport)
+def load_rollup_state_before_delete(sender, instance, **kwargs):
+    _load_rollup_state(instance)
+
+
+@receiver(post_delete, sender=TestReport)
+def remove_from_score_rollup(sender, instance, **kwargs):
+    apply_change(instance, instance._rollup_state, None)
+    instance._rollup_state = None
+
+
+@receiver(post_delete, sender=TestReport)
+def touch_purchase_on_report_delete(sender, instance, **kwargs):
+    # has_report заказа стал False — без нового updated_at дельта-синхронизация этого не увидит
+    Purchase.objects.filter(pk=instance.purchase_id).update(updated_at=timezone.now())
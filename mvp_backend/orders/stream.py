@@ -0,0 +1,276 @@
+"""Поток новых и изменённых запросов на заказ для тестера (SSE + long-poll).
+
+Представления асинхронные и рассчитаны на запуск через mvp_backend/asgi.py
+(uvicorn): ожидающее соединение не держит воркер. Изменения приходят через
+OfferNotifier: сигнал post_save и массовая рассылка публикуют id тестера в
+канал Redis (REDIS_URL), каждый процесс держит одну подписку и будит своих
+ожидающих; без Redis (DEBUG) уведомления работают внутри процесса. Проверка
+БД раз в POLL_INTERVAL — только страховка от потерянного уведомления.
+
+Запросы к БД идут в общем пуле потоков, а не в потоке запроса
+(ThreadSensitiveContext), и соединение закрывается сразу после запроса:
+ожидающий поток не держит ни отдельный поток, ни соединение с БД.
+
+Под WSGI (runserver, gunicorn) бесконечный асинхронный поток Django дочитал
+бы до конца до отправки первого байта, поэтому там SSE-ответ конечный: одна
+пачка изменений, id и retry — EventSource сам переподключается через
+RECONNECT_INTERVAL с Last-Event-ID, получается опрос без висящих соединений.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+
+from accounts.authentication import CachedTokenAuthentication, get_cached_user
+from accounts.tokens import InvalidToken, verify_access_token
+from mvp_backend.query_budget import query_budget_exempt
+
+from .models import CreatingOrder
+from .serializers import CreatingOrderSerializer
+from .sync import after_mark
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 60
+RECONNECT_INTERVAL = 5
+LONG_POLL_TIMEOUT = 25
+BATCH_SIZE = 100
+OFFERS_CHANNEL = 'orders:offers'
+
+
+class OfferNotifier:
+    """Будит ожидающие потоки пользователя, с Redis — во всех процессах."""
+
+    def __init__(self, redis_url=''):
+        self.redis_url = redis_url
+        self._lock = threading.Lock()
+        self._waiters = defaultdict(set)
+        self._listeners = {}
+        self._publisher = None
+
+    def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._lock:
+            self._waiters[user_id].add(waiter)
+            if self.redis_url:
+                listener = self._listeners.get(loop)
+                if listener is None or listener.done():
+                    self._listeners[loop] = loop.create_task(self._listen())
+        return waiter
+
+    def unsubscribe(self, user_id, waiter):
+        with self._lock:
+            waiters = self._waiters.get(user_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[user_id]
+
+    def notify(self, user_id):
+        self.notify_many([user_id])
+
+    def notify_many(self, user_ids):
+        if not self.redis_url:
+            for user_id in user_ids:
+                self.wake(user_id)
+            return
+        try:
+            if self._publisher is None:
+                import redis
+
+                self._publisher = redis.Redis.from_url(self.redis_url)
+            with self._publisher.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.publish(OFFERS_CHANNEL, user_id)
+                pipe.execute()
+        except Exception:
+            # Уведомление не дошло — изменения подхватит проверка БД
+            logger.warning('Could not publish offer notifications', exc_info=True)
+
+    def wake(self, user_id):
+        with self._lock:
+            waiters = list(self._waiters.get(user_id, ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Цикл событий уже закрыт — подписчик отвалился
+                pass
+
+    async def _listen(self):
+        from redis import asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self.redis_url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(OFFERS_CHANNEL)
+            async for message in pubsub.listen():
+                self.wake(int(message['data']))
+        except Exception:
+            # Следующая подписка поднимет слушателя заново
+            logger.warning('Offer notification listener stopped', exc_info=True)
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+notifier = OfferNotifier(settings.REDIS_URL)
+
+
+def _db(func):
+    """Обёртка для запросов к БД из потока: общий пул и закрытие соединения после запроса."""
+
+    def run(*args):
+        try:
+            return func(*args)
+        finally:
+            if not connection.in_atomic_block:
+                connection.close()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def _token_user(key):
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+async def _authenticate(request):
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        try:
+            user_id = verify_access_token(header[len('Bearer '):].strip())
+        except InvalidToken:
+            return None
+        return await _db(get_cached_user)(user_id)
+
+    # EventSource не умеет передавать заголовки: в URL — только короткоживущий
+    # access-токен, постоянный ключ Token оседал бы в логах сервера и прокси
+    access = request.GET.get('access')
+    if access:
+        try:
+            user_id = verify_access_token(access)
+        except InvalidToken:
+            return None
+        return await _db(get_cached_user)(user_id)
+
+    if not header.startswith('Token '):
+        return None
+    # Тот же кэш токенов, что и у API (accounts.authentication)
+    return await _db(_token_user)(header[len('Token '):].strip())
+
+
+def _parse_mark(value):
+    """Отметка «<updated_at>,<id>» последнего отданного запроса; id можно опустить."""
+    if not value:
+        return timezone.now(), 0
+    moment, _, pk = value.rpartition(',') if ',' in value else (value, '', '0')
+    moment = datetime.fromisoformat(moment)
+    if timezone.is_naive(moment):
+        raise ValueError('Timezone is required.')
+    return moment, int(pk)
+
+
+def _format_mark(mark):
+    return f'{mark[0].isoformat()},{mark[1]}'
+
+
+def _changed_offers_sync(user, mark):
+    # (updated_at, id), а не только время: при общем updated_at строки за границей пачки не теряются
+    queryset = CreatingOrder.objects.filter(after_mark('updated_at', mark), user=user).order_by('updated_at', 'id')
+    orders = list(queryset[:BATCH_SIZE])
+    if orders:
+        mark = orders[-1].updated_at, orders[-1].pk
+    return CreatingOrderSerializer(orders, many=True).data, mark
+
+
+_changed_offers = _db(_changed_offers_sync)
+
+
+async def _wait(event, timeout):
+    try:
+        await asyncio.wait_for(event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+    event.clear()
+
+
+def _offers_event(orders, mark):
+    if orders:
+        return f'id: {_format_mark(mark)}\nevent: offers\ndata: {json.dumps(orders, default=str)}\n\n'
+    # Сообщение из одного id ничего не доставляет, но сдвигает Last-Event-ID для переподключения
+    return f'id: {_format_mark(mark)}\n\n'
+
+
+async def _event_stream(user, mark):
+    waiter = notifier.subscribe(user.pk)
+    try:
+        yield f'retry: {RECONNECT_INTERVAL * 1000}\n\n'
+        while True:
+            orders, mark = await _changed_offers(user, mark)
+            yield _offers_event(orders, mark) if orders else ': keep-alive\n\n'
+            await _wait(waiter[1], POLL_INTERVAL)
+    finally:
+        notifier.unsubscribe(user.pk, waiter)
+
+
+async def _long_poll(user, mark):
+    waiter = notifier.subscribe(user.pk)
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + LONG_POLL_TIMEOUT
+        while True:
+            orders, mark = await _changed_offers(user, mark)
+            remaining = deadline - loop.time()
+            if orders or remaining <= 0:
+                return {'orders': orders, 'since': _format_mark(mark)}
+            await _wait(waiter[1], min(POLL_INTERVAL, remaining))
+    finally:
+        notifier.unsubscribe(user.pk, waiter)
+
+
+@query_budget_exempt
+@require_GET
+async def offer_stream(request):
+    """SSE при Accept: text/event-stream, иначе long-poll с ответом в JSON.
+
+    Аутентификация — заголовок Authorization (Token или Bearer) либо
+    access-токен в ?access= для EventSource.
+    """
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    try:
+        mark = _parse_mark(request.headers.get('Last-Event-ID') or request.GET.get('since'))
+    except ValueError:
+        return JsonResponse({'detail': 'Invalid since value.'}, status=400)
+
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        if isinstance(request, ASGIRequest):
+            stream = _event_stream(user, mark)
+        else:
+            orders, mark = await _changed_offers(user, mark)
+            stream = [f'retry: {RECONNECT_INTERVAL * 1000}\n\n', _offers_event(orders, mark)]
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    return JsonResponse(await _long_poll(user, mark), json_dumps_params={'default': str})
@@ -0,0 +1,139 @@
+"""Дельта-синхронизация заказов: токен ``since`` и выборка изменений.
+
+Токен — подписанный (django.core.signing) набор «водяных знаков»: последние
+отданные (updated_at, id) для запросов на заказ и заказов и id последнего
+надгробия. Пара (время, id) нужна потому, что выборка упорядочена по ним и
+режется на порции: у bulk-операций время одно на много строк, и строки с
+тем же временем за границей порции иначе потерялись бы. Клиент не разбирает
+токен, а просто возвращает его обратно.
+
+Надгробия старше SYNC_TOMBSTONE_RETENTION_DAYS удаляет prune_sync_tombstones;
+токен старше этого срока отклоняется (410), и клиент делает полный снимок.
+"""
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import CreatingOrder, Purchase, SyncTombstone
+
+SYNC_TOKEN_SALT = 'orders.sync'
+SYNC_BATCH_SIZE = 500
+
+
+class InvalidSyncToken(Exception):
+    pass
+
+
+class SyncTokenExpired(InvalidSyncToken):
+    """Надгробия после токена могли быть уже удалены — нужен полный снимок."""
+
+
+def after_mark(field, mark):
+    """Строки строго после mark = (время, id) в порядке (field, id)."""
+    moment, pk = mark
+    return Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': pk})
+
+
+def _dump_mark(mark):
+    return [mark[0].isoformat(), mark[1]] if mark else None
+
+
+def _load_mark(value):
+    if not value:
+        return None
+    if isinstance(value, str):
+        # Токен, выданный до перехода на (время, id): строки с этим временем придут повторно
+        return datetime.fromisoformat(value), 0
+    moment, pk = value
+    return datetime.fromisoformat(moment), int(pk)
+
+
+def encode_sync_token(orders_mark, purchases_mark, tombstone_mark):
+    return signing.dumps(
+        {'o': _dump_mark(orders_mark), 'p': _dump_mark(purchases_mark), 't': tombstone_mark},
+        salt=SYNC_TOKEN_SALT,
+        compress=True,
+    )
+
+
+def decode_sync_token(token):
+    if not token:
+        return None, None, 0
+    try:
+        data = signing.loads(
+            token, salt=SYNC_TOKEN_SALT, max_age=timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        )
+    except signing.SignatureExpired as exc:
+        raise SyncTokenExpired(str(exc)) from exc
+    except signing.BadSignature as exc:
+        raise InvalidSyncToken(str(exc)) from exc
+    try:
+        return _load_mark(data.get('o')), _load_mark(data.get('p')), int(data.get('t') or 0)
+    except (AttributeError, TypeError, ValueError) as exc:
+        raise InvalidSyncToken(str(exc)) from exc
+
+
+def collect_changes(user, token, batch_size=SYNC_BATCH_SIZE):
+    """Возвращает изменения после токена и новый токен.
+
+    Без токена отдаётся полный снимок (порциями по batch_size, has_more
+    сигнализирует, что нужно запросить следующую порцию).
+    """
+    orders_mark, purchases_mark, tombstone_mark = decode_sync_token(token)
+
+    orders_qs = CreatingOrder.objects.filter(user=user).order_by('updated_at', 'id')
+    if orders_mark:
+        orders_qs = orders_qs.filter(after_mark('updated_at', orders_mark))
+    orders = list(orders_qs[:batch_size + 1])
+
+    # Отчёт не меняет updated_at заказа, но меняет has_report — учитываем оба времени
+    purchases_qs = (
+        Purchase.objects.filter(tester=user)
+        .with_report_flag()
+        .annotate(changed_at=Greatest(F('updated_at'), Coalesce(F('test_report__updated_at'), F('updated_at'))))
+        .order_by('changed_at', 'id')
+    )
+    if purchases_mark:
+        purchases_qs = purchases_qs.filter(after_mark('changed_at', purchases_mark))
+    purchases = list(purchases_qs[:batch_size + 1])
+
+    tombstones = []
+    if token:
+        tombstones = list(
+            SyncTombstone.objects.filter(user=user, id__gt=tombstone_mark)
+            .order_by('id')
+            .values('id', 'kind', 'object_id')[:batch_size + 1]
+        )
+
+    has_more = len(orders) > batch_size or len(purchases) > batch_size or len(tombstones) > batch_size
+    orders = orders[:batch_size]
+    purchases = purchases[:batch_size]
+    tombstones = tombstones[:batch_size]
+
+    if orders:
+        orders_mark = orders[-1].updated_at, orders[-1].pk
+    if purchases:
+        purchases_mark = purchases[-1].changed_at, purchases[-1].pk
+    if tombstones:
+        tombstone_mark = tombstones[-1]['id']
+    elif not token:
+        # Полный снимок уже отражает удаления — начинаем с текущего надгробия
+        last = SyncTombstone.objects.filter(user=user).order_by('-id').values_list('id', flat=True).first()
+        tombstone_mark = last or 0
+
+    deleted = {'orders': [], 'purchases': []}
+    for item in tombstones:
+        key = 'orders' if item['kind'] == SyncTombstone.KIND_ORDER else 'purchases'
+        deleted[key].append(item['object_id'])
+
+    return {
+        'orders': orders,
+        'purchases': purchases,
+        'deleted': deleted,
+        'has_more': has_more,
+        'since': encode_sync_token(orders_mark, purchases_mark, tombstone_mark),
+    }
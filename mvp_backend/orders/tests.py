@@ -1,3 +1,1100 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import os
+import tempfile
+import time
+import zipfile
+from datetime import timedelta
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.authentication import token_cache
+from accounts.models import User, UserProfile
+from accounts.tokens import issue_access_token
+from .db_indexes import (
+    PURCHASES_INDEXES,
+    drop_purchases_indexes,
+    existing_purchases_indexes,
+    missing_purchases_indexes,
+)
+from .drafts import stage_draft_patch
+from .media import MediaError, build_derivatives, run_derivatives
+from .models import (
+    CreatingOrder,
+    ProofMedia,
+    ProofUpload,
+    Purchase,
+    ReportScoreRollup,
+    SyncTombstone,
+    TestReport,
+    TestReportDraft,
+)
+from .rollups import rollup_rows
+from .sync import collect_changes
+from . import uploads
+from .uploads import attach_proof_file, current_proof_files
+
+
+class PurchasesTableMixin:
+    """Создаёт неуправляемую таблицу purchases в тестовой БД."""
+
+    @classmethod
+    def setUpClass(cls):
+        if Purchase._meta.db_table not in connection.introspection.table_names():
+            with connection.schema_editor() as editor:
+                editor.create_model(Purchase)
+        super().setUpClass()
+
+
+class PurchaseListQueryCountTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000001', password='secret-pass-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_purchases(self, count):
+        for index in range(count):
+            purchase = Purchase.objects.create(tester=self.user, article=f'ART-{index}')
+            if index % 2 == 0:
+                TestReport.objects.create(
+                    purchase=purchase,
+                    full_name='Тестер',
+                    contact='+79990000001',
+                    item_name=purchase.article,
+                    category='other',
+                    received_at='2025-01-01',
+                    completed_at='2025-01-02',
+                )
+
+    def test_query_count_does_not_depend_on_rows(self):
+        for count in (1, 10, 40):
+            Purchase.objects.all().delete()
+            self.create_purchases(count)
+            # Агрегат для ETag + сама страница
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/orders/purchases/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), count)
+
+    def test_has_report_flag(self):
+        self.create_purchases(2)
+        response = self.client.get('/api/orders/purchases/')
+        flags = {item['article']: item['has_report'] for item in response.data['results']}
+        self.assertEqual(flags, {'ART-0': True, 'ART-1': False})
+
+
+class PurchaseDetailTests(PurchasesTableMixin, TestCase):
+    def test_own_purchase_only(self):
+        user = User.objects.create_user(phone_number='+79990000003', password='secret-pass-1')
+        other = User.objects.create_user(phone_number='+79990000004', password='secret-pass-1')
+        purchase = Purchase.objects.create(tester=user, article='ART-1')
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.assertNumQueries(1):
+            response = client.get(f'/api/orders/purchases/{purchase.pk}/')
+        self.assertEqual((response.data['article'], response.data['has_report']), ('ART-1', False))
+
+        client.force_authenticate(other)
+        self.assertEqual(client.get(f'/api/orders/purchases/{purchase.pk}/').status_code, 404)
+
+
+class PurchaseListConditionalGetTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000002', password='secret-pass-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.purchase = Purchase.objects.create(tester=self.user, article='ART-1')
+
+    def test_matching_etag_returns_not_modified(self):
+        response = self.client.get('/api/orders/purchases/')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/orders/purchases/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_when_report_is_added(self):
+        etag = self.client.get('/api/orders/purchases/')['ETag']
+        TestReport.objects.create(
+            purchase=self.purchase,
+            full_name='Тестер',
+            contact='+79990000002',
+            item_name='ART-1',
+            category='other',
+            received_at='2025-01-01',
+            completed_at='2025-01-02',
+        )
+        response = self.client.get('/api/orders/purchases/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class PurchaseIndexCommandTests(PurchasesTableMixin, TransactionTestCase):
+    # schema_editor в SQLite не работает внутри транзакции TestCase
+    def test_check_creates_and_drops_indexes(self):
+        with connection.schema_editor() as editor:
+            drop_purchases_indexes(editor, PURCHASES_INDEXES)
+        self.assertFalse(existing_purchases_indexes(connection) & set(PURCHASES_INDEXES))
+
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('purchase_indexes', check=True, stdout=out)
+        self.assertIn('purchases_tester_created_idx: MISSING', out.getvalue())
+
+        out = io.StringIO()
+        call_command('purchase_indexes', stdout=out)
+        self.assertIn('Созданы индексы', out.getvalue())
+        self.assertLessEqual(set(PURCHASES_INDEXES), existing_purchases_indexes(connection))
+        call_command('purchase_indexes', check=True, stdout=io.StringIO())
+
+        with connection.schema_editor() as editor:
+            drop_purchases_indexes(editor, ['purchases_external_id_idx'])
+        self.assertEqual(missing_purchases_indexes(connection), ['purchases_external_id_idx'])
+        call_command('purchase_indexes', stdout=io.StringIO())
+        self.assertEqual(missing_purchases_indexes(connection), [])
+
+
+class ExplainQueriesCommandTests(PurchasesTableMixin, TestCase):
+    def test_prints_plans(self):
+        user = User.objects.create_user(phone_number='+79990000010', password='secret-pass-1')
+        out = io.StringIO()
+        call_command('explain_queries', user=user.pk, stdout=out)
+        output = out.getvalue()
+        for title in ('GET /api/orders/creating/', 'GET /api/orders/purchases/', 'GET /api/orders/purchases/<id>/report/'):
+            self.assertIn(title, output)
+        self.assertIn('SEARCH', output)
+
+    def test_uses_existing_or_given_rows(self):
+        user = User.objects.create_user(phone_number='+79990000011', password='secret-pass-1')
+        purchase = Purchase.objects.create(tester=user, article='ART-1')
+        out = io.StringIO()
+        call_command('explain_queries', user=user.pk, stdout=out)
+        self.assertIn(f'"purchase_id" = {purchase.pk}', out.getvalue())
+
+        out = io.StringIO()
+        call_command('explain_queries', user=user.pk, order=777, purchase=888, stdout=out)
+        self.assertIn('"id" = 777', out.getvalue())
+        self.assertIn('"purchase_id" = 888', out.getvalue())
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', user=10 ** 9, stdout=io.StringIO())
+
+
+class OrderListPaginationTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000009', password='secret-pass-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_purchases(self, count):
+        Purchase.objects.bulk_create(Purchase(tester=self.user, article=f'ART-{index}') for index in range(count))
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_first_page_has_next_cursor(self):
+        self.create_purchases(55)
+        response = self.client.get('/api/orders/purchases/')
+        self.assertEqual(len(response.data['results']), 50)
+        self.assertIn('cursor=', response.data['next'])
+        self.assertIsNone(response.data['previous'])
+
+    def test_following_next_returns_every_row_once(self):
+        self.create_purchases(7)
+        ids = self.collect('/api/orders/purchases/?page_size=3')
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(set(ids), set(Purchase.objects.values_list('id', flat=True)))
+
+    def test_page_size_is_capped(self):
+        self.create_purchases(205)
+        response = self.client.get('/api/orders/purchases/?page_size=500')
+        self.assertEqual(len(response.data['results']), 200)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_offers_are_paginated(self):
+        CreatingOrder.objects.bulk_create(
+            CreatingOrder(user=self.user, article=f'ART-{index}') for index in range(5)
+        )
+        ids = self.collect('/api/orders/creating/?page_size=2')
+        self.assertEqual(sorted(ids), sorted(CreatingOrder.objects.values_list('id', flat=True)))
+
+
+class OrderSyncTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000003', password='secret-pass-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_sync_returns_only_changes_after_token(self):
+        order = CreatingOrder.objects.create(user=self.user, article='ART-1')
+        purchase = Purchase.objects.create(tester=self.user, article='ART-2')
+
+        snapshot = self.client.get('/api/orders/sync/').data
+        self.assertEqual([item['id'] for item in snapshot['orders']], [order.id])
+        self.assertEqual([item['id'] for item in snapshot['purchases']], [purchase.id])
+
+        empty = self.client.get('/api/orders/sync/', {'since': snapshot['since']}).data
+        self.assertEqual((empty['orders'], empty['purchases']), ([], []))
+
+        order.status = CreatingOrder.STATUS_REJECTED
+        order.save()
+        purchase_id = purchase.id
+        purchase.delete()
+        delta = self.client.get('/api/orders/sync/', {'since': empty['since']}).data
+        self.assertEqual([item['status'] for item in delta['orders']], [CreatingOrder.STATUS_REJECTED])
+        self.assertEqual(delta['deleted'], {'orders': [], 'purchases': [purchase_id]})
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/orders/sync/', {'since': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rows_sharing_a_timestamp_span_batches(self):
+        # Как у apply_decisions: одно updated_at на всю пачку
+        CreatingOrder.objects.bulk_create([CreatingOrder(user=self.user, article=f'ART-{index}') for index in range(7)])
+        CreatingOrder.objects.filter(user=self.user).update(updated_at=timezone.now())
+
+        received, token, has_more = [], None, True
+        while has_more:
+            changes = collect_changes(self.user, token, batch_size=5)
+            received += [order.pk for order in changes['orders']]
+            token, has_more = changes['since'], changes['has_more']
+        self.assertEqual(sorted(received), sorted(CreatingOrder.objects.values_list('pk', flat=True)))
+        self.assertEqual(len(received), 7)
+
+    def test_report_deletion_is_synced(self):
+        purchase = Purchase.objects.create(tester=self.user, article='ART-1')
+        report = TestReport.objects.create(
+            purchase=purchase, full_name='Анна', contact='@anna', item_name='Крем', category='other',
+            received_at='2025-01-01', completed_at='2025-01-02',
+        )
+        token = self.client.get('/api/orders/sync/').data['since']
+        report.delete()
+        delta = self.client.get('/api/orders/sync/', {'since': token}).data
+        self.assertEqual([(item['id'], item['has_report']) for item in delta['purchases']], [(purchase.pk, False)])
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=30)
+    def test_expired_token_and_pruning(self):
+        order = CreatingOrder.objects.create(user=self.user, article='ART-1')
+        with mock.patch('django.core.signing.time.time', return_value=time.time() - 31 * 86400):
+            token = self.client.get('/api/orders/sync/').data['since']
+        self.assertEqual(self.client.get('/api/orders/sync/', {'since': token}).status_code, 410)
+
+        order.delete()
+        SyncTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        CreatingOrder.objects.create(user=self.user, article='ART-2').delete()
+        call_command('prune_sync_tombstones', stdout=io.StringIO())
+        self.assertEqual(SyncTombstone.objects.count(), 1)
+
+
+class BulkOrderDecisionTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000004', password='secret-pass-1')
+        UserProfile.objects.filter(user=self.user).update(is_completed=True, pickup_point='ПВЗ-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def decide(self, count):
+        orders = [CreatingOrder.objects.create(user=self.user, article=f'ART-{i}') for i in range(count)]
+        payload = [
+            {'id': order.id, 'action': 'approve' if i % 2 == 0 else 'reject', 'external_id': f'EXT-{i}'}
+            for i, order in enumerate(orders)
+        ]
+        return orders, payload
+
+    def test_query_count_is_bounded(self):
+        UserProfile.objects.filter(user=self.user).update(is_participating=True)
+        counts = []
+        for size in (2, 20):
+            orders, payload = self.decide(size)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post('/api/orders/creating/decisions/', payload, format='json')
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_per_item_results(self):
+        orders, payload = self.decide(2)
+        payload.append({'id': 999999, 'action': 'reject'})
+        results = self.client.post('/api/orders/creating/decisions/', payload, format='json').data['results']
+
+        self.assertEqual([item['result'] for item in results], ['approved', 'rejected', 'error'])
+        purchase = Purchase.objects.get(pk=results[0]['purchase_id'])
+        self.assertEqual((purchase.creating_order_id, purchase.external_id, purchase.pickup_point), (orders[0].id, 'EXT-0', 'ПВЗ-1'))
+        self.assertTrue(UserProfile.objects.get(user=self.user).is_participating)
+
+        again = self.client.post('/api/orders/creating/decisions/', payload[:1], format='json').data['results']
+        self.assertEqual(again[0]['result'], 'error')
+
+    # Запросы «параллельного» решения выполняются внутри этого же HTTP-запроса
+    @override_settings(QUERY_BUDGET_MODE='off')
+    def test_race_with_single_decision(self):
+        orders, payload = self.decide(3)
+        rival = orders[0]
+
+        def approve_elsewhere(order, requested, profile):
+            # Одиночное решение по тому же запросу успевает между чтением и захватом
+            if not Purchase.objects.filter(creating_order=rival).exists():
+                CreatingOrder.objects.filter(pk=rival.pk).update(
+                    status=CreatingOrder.STATUS_APPROVED, responded_at=timezone.now() - timedelta(seconds=1)
+                )
+                Purchase.objects.create(creating_order=rival, tester=self.user, article=rival.article)
+            return requested or 'ПВЗ-1'
+
+        with mock.patch('orders.decisions.resolve_pickup_point', side_effect=approve_elsewhere):
+            response = self.client.post('/api/orders/creating/decisions/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['result'], item.get('detail')) for item in response.data['results']],
+            [('error', 'Order has already been processed.'), ('rejected', None), ('approved', None)],
+        )
+        self.assertEqual(Purchase.objects.filter(creating_order=rival).count(), 1)
+        self.assertEqual(Purchase.objects.get(pk=response.data['results'][2]['purchase_id']).creating_order_id, orders[2].pk)
+
+    def test_existing_purchase_is_updated(self):
+        orders, payload = self.decide(1)
+        stale = Purchase.objects.create(creating_order=orders[0], tester=self.user, article='OLD')
+        results = self.client.post('/api/orders/creating/decisions/', payload, format='json').data['results']
+        self.assertEqual((results[0]['result'], results[0]['purchase_id']), ('approved', stale.pk))
+        stale.refresh_from_db()
+        self.assertEqual((stale.article, stale.external_id), ('ART-0', 'EXT-0'))
+
+
+class OrderDecisionTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000005', password='secret-pass-1')
+        UserProfile.objects.filter(user=self.user).update(is_completed=True, is_participating=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.order = CreatingOrder.objects.create(user=self.user, article='ART-1', payload={'price': 100})
+
+    def approve(self, **extra):
+        return self.client.post(
+            f'/api/orders/creating/{self.order.id}/decision/',
+            {'action': 'approve', **extra},
+            format='json',
+        )
+
+    def test_approve_upserts_existing_purchase(self):
+        existing = Purchase.objects.create(creating_order=self.order, tester=self.user, article='OLD')
+        response = self.approve(external_id='EXT-1', purchase_metadata={'color': 'red'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['purchase_id'], existing.id)
+        existing.refresh_from_db()
+        self.assertEqual((existing.article, existing.external_id), ('ART-1', 'EXT-1'))
+        self.assertEqual(existing.metadata, {'price': 100, 'color': 'red'})
+
+    def test_lost_race_returns_conflict(self):
+        # Другой запрос успел сменить статус между чтением и условным UPDATE
+        CreatingOrder.objects.filter(pk=self.order.pk).update(status=CreatingOrder.STATUS_APPROVED)
+        with mock.patch.object(CreatingOrder.objects, 'get', return_value=self.order):
+            response = self.approve()
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Purchase.objects.filter(creating_order=self.order).exists())
+
+
+class OfferStreamTests(PurchasesTableMixin, TransactionTestCase):
+    # Поток ходит в БД из общего пула потоков — данные теста должны быть закоммичены
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000006', password='secret-pass-1')
+        self.token = Token.objects.create(user=self.user)
+
+    async def test_long_poll_returns_changes_since_mark(self):
+        order = await CreatingOrder.objects.acreate(user=self.user, article='ART-1')
+        since = (order.updated_at - timedelta(seconds=1)).isoformat()
+
+        response = await self.async_client.get(
+            '/api/orders/creating/stream/',
+            {'since': since},
+            headers={'Authorization': f'Token {self.token.key}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['orders']], [order.id])
+        self.assertEqual(data['since'], f'{order.updated_at.isoformat()},{order.pk}')
+
+    async def test_token_auth_uses_token_cache(self):
+        token_cache.clear()
+        with mock.patch('orders.stream.LONG_POLL_TIMEOUT', 0):
+            response = await self.async_client.get(
+                '/api/orders/creating/stream/', headers={'Authorization': f'Token {self.token.key}'}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(token_cache.get(self.token.key)[0].pk, self.user.pk)
+
+    async def test_requires_token(self):
+        response = await self.async_client.get('/api/orders/creating/stream/')
+        self.assertEqual(response.status_code, 401)
+        # Постоянный ключ в URL не принимается — только короткоживущий access-токен
+        response = await self.async_client.get('/api/orders/creating/stream/', {'token': self.token.key})
+        self.assertEqual(response.status_code, 401)
+
+    def test_sse_under_wsgi_is_finite(self):
+        order = CreatingOrder.objects.create(user=self.user, article='ART-1')
+        access, _ = issue_access_token(self.user)
+        since = (order.updated_at - timedelta(seconds=1)).isoformat()
+
+        response = self.client.get(
+            '/api/orders/creating/stream/', {'access': access, 'since': since}, HTTP_ACCEPT='text/event-stream'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('retry: 5000', body)
+        self.assertIn('event: offers', body)
+        mark = f'{order.updated_at.isoformat()},{order.pk}'
+        self.assertIn(f'id: {mark}', body)
+
+        # Без изменений — только id, чтобы переподключение продолжило с той же отметки
+        response = self.client.get(
+            '/api/orders/creating/stream/', {'access': access}, HTTP_ACCEPT='text/event-stream',
+            HTTP_LAST_EVENT_ID=mark,
+        )
+        body = b''.join(response.streaming_content).decode()
+        self.assertNotIn('event: offers', body)
+        self.assertIn(f'id: {mark}', body)
+
+    async def test_orders_sharing_a_timestamp_span_batches(self):
+        orders = [await CreatingOrder.objects.acreate(user=self.user, article=f'ART-{index}') for index in range(3)]
+        moment = timezone.now()
+        await CreatingOrder.objects.filter(user=self.user).aupdate(updated_at=moment)
+        since = (moment - timedelta(seconds=1)).isoformat()
+
+        received = []
+        with mock.patch('orders.stream.BATCH_SIZE', 2):
+            for _ in range(2):
+                response = await self.async_client.get(
+                    '/api/orders/creating/stream/', {'since': since},
+                    headers={'Authorization': f'Token {self.token.key}'},
+                )
+                data = response.json()
+                received += [item['id'] for item in data['orders']]
+                since = data['since']
+        self.assertEqual(received, [order.pk for order in orders])
+
+
+class OfferDispatchTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(phone_number='+79990000007', password='secret-pass-1', is_staff=True)
+        self.testers = [
+            User.objects.create_user(phone_number=f'+7999000010{i}', password='secret-pass-1') for i in range(3)
+        ]
+        UserProfile.objects.filter(user__in=self.testers).update(is_completed=True, is_participating=True, city='Казань')
+        UserProfile.objects.filter(user=self.testers[2]).update(city='Москва')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_dispatch_to_matching_testers_once(self):
+        payload = {'article': 'ART-1', 'title': 'Крем', 'city': 'Казань'}
+        response = self.client.post('/api/orders/dispatch/', payload, format='json')
+        self.assertEqual(response.data, {'created': 2, 'skipped': 0})
+        self.assertEqual(
+            set(CreatingOrder.objects.values_list('user_id', flat=True)),
+            {self.testers[0].id, self.testers[1].id},
+        )
+
+        response = self.client.post('/api/orders/dispatch/', payload, format='json')
+        self.assertEqual(response.data, {'created': 0, 'skipped': 2})
+
+    def test_notifies_offer_streams_after_commit(self):
+        with mock.patch('orders.dispatch.notifier') as notifier:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/orders/dispatch/', {'article': 'ART-1', 'city': 'Казань'}, format='json')
+        notifier.notify_many.assert_called_once_with([self.testers[0].id, self.testers[1].id])
+
+    def test_query_budget_grows_per_batch(self):
+        with mock.patch('orders.views.DISPATCH_BATCH_SIZE', 1):
+            response = self.client.post('/api/orders/dispatch/', {'article': 'ART-1', 'city': 'Казань'}, format='json')
+            self.assertEqual(response.data, {'created': 2, 'skipped': 0})
+            one_batch = self.client.post('/api/orders/dispatch/', {'article': 'ART-2', 'city': 'Москва'}, format='json')
+        self.assertGreater(response.query_count, one_batch.query_count)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.testers[0])
+        response = self.client.post('/api/orders/dispatch/', {'article': 'ART-1'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000201', password='secret-pass-1')
+        CreatingOrder.objects.create(user=self.user, article='ART-1', title='Крем', payload={'big': 'x' * 1000})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_fields_narrow_response_and_sql(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/orders/creating/', {'fields': 'article,title,status'})
+        self.assertEqual(response.data['results'], [{'article': 'ART-1', 'title': 'Крем', 'status': 'PROCESSING'}])
+        page_sql = ctx.captured_queries[-1]['sql']
+        self.assertIn('"article"', page_sql)
+        self.assertNotIn('"payload"', page_sql)
+        self.assertNotIn('"notes"', page_sql)
+
+    def test_omit(self):
+        response = self.client.get('/api/orders/creating/', {'omit': 'payload,notes'})
+        item = response.data['results'][0]
+        self.assertNotIn('payload', item)
+        self.assertIn('created_at', item)
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/orders/creating/', {'fields': 'article,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_profile_header_fields(self):
+        response = self.client.get('/api/profile/me/', {'fields': 'is_completed,is_participating'})
+        self.assertEqual(response.data, {'is_completed': False, 'is_participating': False})
+
+
+class TestReportDraftTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+79990000301', password='secret-pass-1')
+        UserProfile.objects.filter(user=self.user).update(full_name='Анна', contact='@anna')
+        self.purchase = Purchase.objects.create(tester=self.user, article='ART-1')
+        self.url = f'/api/orders/purchases/{self.purchase.pk}/report/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def patch_draft(self, data, at, flush=False):
+        url = f'{self.url}draft/?flush=1' if flush else f'{self.url}draft/'
+        with mock.patch('orders.drafts.time') as clock:
+            clock.time.return_value = at
+            return self.client.patch(url, data, format='json')
+
+    def test_get_does_not_write(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['id'])
+        self.assertEqual(
+            (response.data['full_name'], response.data['contact'], response.data['item_name']),
+            ('Анна', '@anna', 'ART-1'),
+        )
+        self.assertFalse([query for query in ctx.captured_queries if not query['sql'].startswith('SELECT')])
+        self.assertFalse(TestReport.objects.exists())
+
+    def test_patches_are_coalesced(self):
+        self.assertTrue(self.patch_draft({'likes': 'Запах'}, at=1000).data['saved'])
+        self.assertFalse(self.patch_draft({'score_overall': '5'}, at=1001).data['saved'])
+        self.assertFalse(self.patch_draft({'improvements': 'Упаковка'}, at=1002).data['saved'])
+        self.assertEqual(TestReportDraft.objects.get().data, {'likes': 'Запах'})
+
+        # Ещё не записанные правки уже видны в GET
+        response = self.client.get(self.url)
+        self.assertEqual((response.data['score_overall'], response.data['improvements']), (5, 'Упаковка'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(self.patch_draft({'likes': ''}, at=1010).data['saved'])
+        writes = [query['sql'] for query in ctx.captured_queries if not query['sql'].startswith('SELECT')]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(
+            TestReportDraft.objects.get().data,
+            {'likes': '', 'score_overall': 5, 'improvements': 'Упаковка'},
+        )
+
+    def test_pending_patch_is_written_by_a_later_patch_not_a_read(self):
+        self.patch_draft({'likes': 'Запах'}, at=1000)
+        self.patch_draft({'likes': 'Цвет'}, at=1001)
+        self.assertEqual(TestReportDraft.objects.get().data, {'likes': 'Запах'})
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(self.url).data['likes'], 'Цвет')
+        self.assertFalse([query for query in ctx.captured_queries if not query['sql'].startswith('SELECT')])
+        self.assertEqual(TestReportDraft.objects.get().data, {'likes': 'Запах'})
+
+        self.assertTrue(self.patch_draft({'improvements': 'Упаковка'}, at=1011).data['saved'])
+        self.assertEqual(TestReportDraft.objects.get().data, {'likes': 'Цвет', 'improvements': 'Упаковка'})
+
+    def test_concurrent_patch_waits_for_lock(self):
+        lock = f'report-draft:{self.purchase.pk}:lock'
+        cache.add(lock, True)
+        with mock.patch('orders.drafts.time') as clock:
+            clock.time.return_value = 1000
+            clock.sleep.side_effect = lambda seconds: cache.delete(lock)
+            self.client.patch(f'{self.url}draft/', {'likes': 'Запах'}, format='json')
+        clock.sleep.assert_called_once()
+        self.assertIsNone(cache.get(lock))
+        self.assertEqual(TestReportDraft.objects.get().data, {'likes': 'Запах'})
+
+    def test_busy_lock_is_not_bypassed(self):
+        cache.add(f'report-draft:{self.purchase.pk}:lock', True)
+        with mock.patch('orders.drafts.time') as clock:
+            clock.time.return_value = 1000
+            response = self.client.patch(f'{self.url}draft/', {'likes': 'Запах'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(TestReportDraft.objects.exists())
+
+    def test_flush_param_writes_immediately(self):
+        self.patch_draft({'likes': 'Запах'}, at=1000)
+        self.assertTrue(self.patch_draft({'likes': 'Цвет'}, at=1001, flush=True).data['saved'])
+        self.assertEqual(TestReportDraft.objects.get().data, {'likes': 'Цвет'})
+
+    def test_invalid_patch(self):
+        self.assertEqual(self.patch_draft({'score_overall': 9}, at=1000).status_code, 400)
+        self.assertEqual(self.patch_draft({'created_at': '2025-01-01'}, at=1000).status_code, 400)
+        self.assertFalse(TestReportDraft.objects.exists())
+
+    def test_submission_validates_and_merges_draft(self):
+        self.patch_draft({'likes': 'Запах', 'category': 'other'}, at=1000)
+        response = self.client.patch(self.url, {'received_at': '2025-01-01'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('completed_at', response.data)
+        self.assertFalse(TestReport.objects.exists())
+
+        response = self.client.patch(
+            self.url,
+            {'full_name': 'Анна', 'contact': '@anna', 'item_name': 'Крем',
+             'received_at': '2025-01-01', 'completed_at': '2025-01-02'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        report = TestReport.objects.get()
+        self.assertEqual((report.likes, report.category), ('Запах', 'other'))
+        self.assertFalse(TestReportDraft.objects.exists())
+
+        self.assertEqual(self.patch_draft({'likes': 'Ещё'}, at=2000).status_code, 409)
+        self.assertEqual(self.client.patch(self.url, {'likes': 'Цвет'}, format='json').status_code, 200)
+
+
+class ProofUploadTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.media_root = media.name
+
+        self.user = User.objects.create_user(phone_number='+79990000401', password='secret-pass-1')
+        self.purchase = Purchase.objects.create(tester=self.user, article='ART-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, content, filename='video.MP4', **extra):
+        return self.client.post(
+            f'/api/orders/purchases/{self.purchase.pk}/uploads/',
+            {'filename': filename, 'size': len(content), 'content_type': 'video/mp4', **extra},
+            format='json',
+        )
+
+    def send(self, upload_id, chunk, offset):
+        return self.client.generic(
+            'PATCH',
+            f'/api/orders/uploads/{upload_id}/',
+            chunk,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def upload(self, content, chunk_size=4):
+        upload_id = self.start(content).data['id']
+        for offset in range(0, len(content), chunk_size):
+            response = self.send(upload_id, content[offset:offset + chunk_size], offset)
+        return response
+
+    def test_resumable_chunks(self):
+        content = b'0123456789'
+        upload_id = self.start(content).data['id']
+        self.assertEqual(self.send(upload_id, content[:4], 0).data['offset'], 4)
+
+        # Повтор уже принятой части — 409 с позицией, откуда продолжать
+        response = self.send(upload_id, content[:4], 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '4')
+        self.assertEqual(self.client.get(f'/api/orders/uploads/{upload_id}/').data['offset'], 4)
+
+        self.send(upload_id, content[4:8], 4)
+        response = self.send(upload_id, content[8:], 8)
+        self.assertEqual(response.data['status'], ProofUpload.STATUS_COMPLETE)
+
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = f'proofs/{sha256[:2]}/{sha256[2:4]}/{sha256}.mp4'
+        self.assertEqual(response.data['path'], path)
+        with open(os.path.join(self.media_root, path), 'rb') as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'uploads')), [])
+        report = self.client.get(f'/api/orders/purchases/{self.purchase.pk}/report/').data
+        self.assertEqual(report['proof_files'], [path])
+
+    def test_same_content_is_stored_once(self):
+        content = b'same bytes'
+        first = self.upload(content).data
+        sha256 = hashlib.sha256(content).hexdigest()
+
+        # Объявленный хэш уже известен — байты не передаются
+        response = self.start(content, filename='copy.mp4', sha256=sha256)
+        self.assertEqual(response.data['status'], ProofUpload.STATUS_COMPLETE)
+        self.assertEqual(response.data['path'], first['path'])
+
+        second = self.upload(content).data
+        self.assertEqual(second['path'], first['path'])
+        blobs = [name for _, _, names in os.walk(os.path.join(self.media_root, 'proofs')) for name in names]
+        self.assertEqual(len(blobs), 1)
+        self.assertEqual(current_proof_files(self.purchase.pk), [first['path']])
+
+    def test_attaches_to_submitted_report(self):
+        report = TestReport.objects.create(
+            purchase=self.purchase, full_name='Тестер', contact='+79990000401', item_name='Крем',
+            category='other', received_at='2025-01-01', completed_at='2025-01-02',
+        )
+        path = self.upload(b'photo').data['path']
+        report.refresh_from_db()
+        self.assertEqual(report.proof_files, [path])
+
+    def test_file_limit(self):
+        stage_draft_patch(self.purchase.pk, {'proof_files': ['a.jpg', 'b.jpg', 'c.jpg']})
+        self.assertEqual(self.start(b'1', filename='1.mp4').status_code, 201)
+        self.assertEqual(self.start(b'2', filename='2.mp4').status_code, 201)
+        response = self.start(b'3', filename='3.mp4')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('5', str(response.data))
+
+    def test_same_file_resumes_pending_upload(self):
+        content = b'0123456789'
+        upload_id = self.start(content).data['id']
+        self.send(upload_id, content[:4], 0)
+
+        response = self.start(content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['id'], response.data['offset']), (upload_id, 4))
+        self.assertEqual(self.start(content, filename='other.mp4').status_code, 201)
+        self.assertEqual(ProofUpload.objects.count(), 2)
+
+    def test_stale_pending_uploads_do_not_count(self):
+        stage_draft_patch(self.purchase.pk, {'proof_files': ['a.jpg', 'b.jpg', 'c.jpg']})
+        self.start(b'1', filename='1.mp4')
+        self.start(b'2', filename='2.mp4')
+        ProofUpload.objects.update(updated_at=timezone.now() - timedelta(hours=49))
+        self.assertEqual(self.start(b'3', filename='3.mp4').status_code, 201)
+
+    def test_dedup_ignores_extension(self):
+        content = b'same video'
+        first = self.upload(content).data['path']
+        upload_id = self.start(content, filename='clip.MOV').data['id']
+        response = self.send(upload_id, content, 0)
+        self.assertEqual(response.data['path'], first)
+        sha256 = hashlib.sha256(content).hexdigest()
+        response = self.start(content, filename='clip.mov', sha256=sha256)
+        self.assertEqual((response.data['status'], response.data['path']), (ProofUpload.STATUS_COMPLETE, first))
+        blobs = [name for _, _, names in os.walk(os.path.join(self.media_root, 'proofs')) for name in names]
+        self.assertEqual(len(blobs), 1)
+
+    def test_extension_follows_content_type(self):
+        upload_id = self.start(b'<script>', filename='page.html', content_type='image/png').data['id']
+        path = self.send(upload_id, b'<script>', 0).data['path']
+        self.assertTrue(path.endswith('.png'))
+
+        for content_type in ('image/svg+xml', 'text/html', 'application/octet-stream'):
+            response = self.start(b'x', filename='x.svg', content_type=content_type)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('content_type', response.data)
+
+    def test_concurrent_attach_keeps_both_files(self):
+        report = TestReport.objects.create(
+            purchase=self.purchase, full_name='Тестер', contact='+79990000401', item_name='Крем',
+            category='other', received_at='2025-01-01', completed_at='2025-01-02',
+        )
+        with_file = uploads._with_file
+
+        def racing(files, name):
+            # Между чтением и записью первой загрузки успевает завершиться вторая
+            if name == 'first.jpg' and not racing.done:
+                racing.done = True
+                attach_proof_file(self.purchase.pk, 'second.jpg')
+            return with_file(files, name)
+
+        racing.done = False
+        with mock.patch('orders.uploads._with_file', side_effect=racing):
+            attach_proof_file(self.purchase.pk, 'first.jpg')
+        report.refresh_from_db()
+        self.assertEqual(report.proof_files, ['second.jpg', 'first.jpg'])
+
+    def test_hash_mismatch(self):
+        upload_id = self.start(b'abc', sha256='0' * 64).data['id']
+        response = self.send(upload_id, b'abc', 0)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ProofUpload.objects.get().offset, 0)
+
+    def test_chunk_past_declared_size(self):
+        upload_id = self.start(b'abc').data['id']
+        self.assertEqual(self.send(upload_id, b'abcdef', 0).status_code, 400)
+
+    def test_other_testers_upload(self):
+        upload_id = self.start(b'abc').data['id']
+        other = User.objects.create_user(phone_number='+79990000402', password='secret-pass-1')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.send(upload_id, b'abc', 0).status_code, 404)
+
+
+class ProofMediaTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, MEDIA_DERIVATIVE_WORKERS=0))
+        self.media_root = media.name
+
+        self.user = User.objects.create_user(phone_number='+79990000501', password='secret-pass-1')
+        self.purchase = Purchase.objects.create(tester=self.user, article='ART-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, filename, content_type):
+        upload_id = self.client.post(
+            f'/api/orders/purchases/{self.purchase.pk}/uploads/',
+            {'filename': filename, 'size': len(content), 'content_type': content_type},
+            format='json',
+        ).data['id']
+        return self.client.generic(
+            'PATCH', f'/api/orders/uploads/{upload_id}/', content,
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET='0',
+        ).data
+
+    def photo(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (2400, 1200), (200, 120, 40)).save(buffer, format='JPEG')
+        return buffer.getvalue()
+
+    def test_image_derivatives(self):
+        upload = self.upload(self.photo(), 'photo.jpg', 'image/jpeg')
+        media = ProofMedia.objects.get()
+        self.assertEqual((media.sha256, media.status), (upload['sha256'], ProofMedia.STATUS_PENDING))
+
+        self.assertTrue(build_derivatives(media.sha256))
+        self.assertFalse(build_derivatives(media.sha256))
+        media.refresh_from_db()
+        self.assertEqual((media.status, media.attempts), (ProofMedia.STATUS_READY, 1))
+        self.assertEqual(os.path.dirname(media.thumbnail), os.path.dirname(upload['path']))
+        with Image.open(os.path.join(self.media_root, media.thumbnail)) as thumbnail:
+            self.assertEqual(thumbnail.size, (320, 160))
+        with Image.open(os.path.join(self.media_root, media.preview)) as preview:
+            self.assertEqual(preview.size, (1280, 640))
+
+        item, = self.client.get(f'/api/orders/purchases/{self.purchase.pk}/report/').data['proof_media']
+        self.assertEqual(item['thumbnail'], f'/media/{media.thumbnail}')
+        self.assertEqual(item['file'], f'/media/{upload["path"]}')
+
+    def test_same_content_is_processed_once(self):
+        photo = self.photo()
+        self.upload(photo, 'photo.jpg', 'image/jpeg')
+        self.purchase = Purchase.objects.create(tester=self.user, article='ART-2')
+        self.upload(photo, 'again.jpg', 'image/jpeg')
+        self.assertEqual(ProofMedia.objects.count(), 1)
+
+    def test_runs_in_pool_after_commit(self):
+        with override_settings(MEDIA_DERIVATIVE_WORKERS=1), mock.patch('orders.media.get_executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                upload = self.upload(self.photo(), 'photo.jpg', 'image/jpeg')
+                executor.return_value.submit.assert_not_called()
+        executor.return_value.submit.assert_called_once_with(run_derivatives, upload['sha256'])
+
+    def test_video_without_ffmpeg_fails_softly(self):
+        upload = self.upload(b'not really a video', 'clip.mp4', 'video/mp4')
+        with mock.patch('orders.media.shutil.which', return_value=None):
+            with self.assertRaises(MediaError):
+                build_derivatives(upload['sha256'])
+        media = ProofMedia.objects.get()
+        self.assertEqual(media.status, ProofMedia.STATUS_FAILED)
+        self.assertIn('ffmpeg', media.error)
+
+
+class ReportScoreRollupTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000601', password='secret-pass-1')
+        self.staff = User.objects.create_user(phone_number='+79990000602', password='secret-pass-1', is_staff=True)
+
+    def report(self, article='ART-1', **scores):
+        purchase = Purchase.objects.create(tester=self.user, article=article)
+        return TestReport.objects.create(
+            purchase=purchase, full_name='Анна', contact='@anna', item_name='Крем', category='cosmetics',
+            received_at='2025-01-01', completed_at='2025-01-02', **scores,
+        )
+
+    def rollups(self):
+        return list(
+            ReportScoreRollup.objects.order_by('article', 'category', 'day').values(
+                'article', 'category', 'day', 'reports', 'overall_sum', 'overall_count', 'quality_effect_sum',
+                'quality_effect_count', 'value_for_money_sum', 'value_for_money_count',
+                'nps_promoters', 'nps_passives', 'nps_detractors',
+            )
+        )
+
+    def assertMatchesRebuild(self):
+        expected = sorted(rollup_rows(), key=lambda row: (row['article'], row['category'], row['day']))
+        self.assertEqual(self.rollups(), expected)
+
+    def test_rollup_follows_saves_and_deletes(self):
+        first = self.report(score_overall=5, score_quality_effect=4, score_recommend=10)
+        self.report(score_overall=3, score_value_for_money=2, score_recommend=6)
+        self.report(article='ART-2', score_recommend=8)
+        row = ReportScoreRollup.objects.get(article='ART-1')
+        self.assertEqual(
+            (row.reports, row.overall_sum, row.overall_count, row.quality_effect_count, row.value_for_money_sum),
+            (2, 8, 2, 1, 2),
+        )
+        self.assertEqual((row.nps_promoters, row.nps_passives, row.nps_detractors), (1, 0, 1))
+
+        first.score_recommend = 7
+        first.category = 'home'
+        first.save()
+        self.assertMatchesRebuild()
+
+        # Отчёт, загруженный с only(): прежние оценки дочитываются из БД
+        partial = TestReport.objects.only('id', 'purchase_id', 'score_overall').get(pk=first.pk)
+        partial.score_overall = 1
+        partial.save(update_fields=('score_overall',))
+        self.assertMatchesRebuild()
+
+        TestReport.objects.get(pk=first.pk).delete()
+        self.assertMatchesRebuild()
+        self.assertFalse(ReportScoreRollup.objects.filter(category='home').exists())
+
+    def test_unrelated_update_does_not_touch_rollup(self):
+        report = self.report(score_overall=5)
+        report.likes = 'Запах'
+        for update_fields in (('likes', 'updated_at'), None):
+            with CaptureQueriesContext(connection) as ctx:
+                report.save(update_fields=update_fields)
+            self.assertNotIn('reportscorerollup', ' '.join(query['sql'] for query in ctx.captured_queries).lower())
+
+    def test_rebuild_command(self):
+        self.report(score_overall=4, score_recommend=9)
+        self.report(article='ART-2', score_overall=2)
+        expected = self.rollups()
+        TestReport.objects.update(score_overall=1)
+        ReportScoreRollup.objects.update(reports=100)
+        call_command('rebuild_report_rollups', stdout=io.StringIO())
+        self.assertMatchesRebuild()
+        self.assertEqual([row['overall_sum'] for row in self.rollups()], [1, 1])
+        self.assertEqual(len(expected), 2)
+
+    def test_stats_endpoint(self):
+        self.report(score_overall=5, score_recommend=10)
+        self.report(score_overall=4, score_recommend=9)
+        self.report(score_overall=3, score_recommend=2)
+        self.report(article='ART-2', score_overall=1)
+        client = APIClient()
+        client.force_authenticate(self.staff)
+
+        with self.assertNumQueries(1):
+            response = client.get('/api/orders/reports/stats/', {'article': 'ART-1', 'group': 'total'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{
+            'article': 'ART-1', 'category': 'cosmetics', 'reports': 3, 'score_overall': 4.0,
+            'score_quality_effect': None, 'score_value_for_money': None, 'nps_responses': 3, 'nps': 33.3,
+        }])
+
+        response = client.get('/api/orders/reports/stats/', {'group': 'month'})
+        self.assertEqual([row['article'] for row in response.data['results']], ['ART-1', 'ART-2'])
+        self.assertIsNotNone(response.data['results'][0]['period'])
+
+        self.assertEqual(client.get('/api/orders/reports/stats/', {'group': 'year'}).status_code, 400)
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/orders/reports/stats/').status_code, 403)
+
+
+class ReportExportTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000701', password='secret-pass-1')
+        self.staff = User.objects.create_user(phone_number='+79990000702', password='secret-pass-1', is_staff=True)
+        UserProfile.objects.filter(user=self.user).update(full_name='Анна', city='Казань')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def report(self, article='ART-1', category='cosmetics', **fields):
+        purchase = Purchase.objects.create(tester=self.user, article=article)
+        return TestReport.objects.create(
+            purchase=purchase, full_name='Анна', contact='+79990000701', item_name='Крем', category=category,
+            received_at='2025-01-01', completed_at='2025-01-02', **fields,
+        )
+
+    def export(self, **params):
+        response = self.client.get('/api/orders/reports/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_streams_joined_rows(self):
+        first = self.report(score_overall=5, likes='=HYPERLINK("x")', proof_files=['proofs/ab/cd/1.jpg'])
+        self.report(article='ART-2', category='home')
+
+        with self.assertNumQueries(1):
+            response, content = self.export(article='ART-1')
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="reports-', response['Content-Disposition'])
+        self.assertTrue(content.startswith('\ufeff'.encode()))
+        header, *rows = csv.reader(io.StringIO(content.decode('utf-8-sig')))
+        self.assertEqual(len(rows), 1)
+        row = dict(zip(header, rows[0]))
+        self.assertEqual(
+            (row['ID отчёта'], row['Артикул'], row['Город'], row['Телефон тестера'], row['Общее впечатление']),
+            (str(first.pk), 'ART-1', 'Казань', '+79990000701', '5'),
+        )
+        self.assertEqual(row['Что понравилось'], "'=HYPERLINK(\"x\")")
+        self.assertEqual(row['Файлы'], '/media/proofs/ab/cd/1.jpg')
+        self.assertEqual(row['Были проблемы'], 'нет')
+
+        _, content = self.export(category='home')
+        self.assertEqual(len(content.decode('utf-8-sig').splitlines()), 2)
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        _, content = self.export(date_from=tomorrow)
+        self.assertEqual(len(content.decode('utf-8-sig').splitlines()), 1)
+
+    def test_xlsx(self):
+        self.report(score_overall=4, review_text='Всё <хорошо> & \x01быстро')
+        response, content = self.export(output='xlsx')
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        namespace = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        rows = [
+            [''.join(cell.itertext()) for cell in row.findall('x:c', namespace)]
+            for row in sheet.iter(f'{{{namespace["x"]}}}row')
+        ]
+        self.assertEqual(len(rows), 2)
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual((row['Артикул'], row['Общее впечатление'], row['Отзыв']), ('ART-1', '4', 'Всё <хорошо> & быстро'))
+
+    def test_validation_and_permissions(self):
+        self.assertEqual(self.client.get('/api/orders/reports/export/', {'output': 'pdf'}).status_code, 400)
+        self.assertEqual(
+            self.client.get('/api/orders/reports/export/', {'date_from': '2025-02-01', 'date_to': '2025-01-01'}).status_code,
+            400,
+        )
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/orders/reports/export/').status_code, 403)
+
+    def test_command(self):
+        self.report()
+        self.report(article='ART-2')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'reports.csv')
+            call_command('export_reports', path, '--article', 'ART-2', '--chunk-size', '1', stderr=io.StringIO())
+            with open(path, encoding='utf-8-sig') as handle:
+                rows = list(csv.reader(handle))
+            self.assertEqual([row[2] for row in rows[1:]], ['ART-2'])
+
+            path = os.path.join(directory, 'reports.xlsx')
+            call_command('export_reports', path, stderr=io.StringIO())
+            with zipfile.ZipFile(path) as archive:
+                self.assertIn('xl/worksheets/sheet1.xml', archive.namelist())
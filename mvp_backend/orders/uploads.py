@@ -0,0 +1,222 @@
+"""Загрузка файлов-подтверждений к отчёту частями с докачкой.
+
+Клиент объявляет файл (имя, размер, тип, по желанию SHA-256), затем шлёт
+части PATCH-запросами с заголовком Upload-Offset. Части пишутся в
+MEDIA_ROOT/uploads/<id>.part прямо из потока запроса блоками по
+UPLOAD_READ_SIZE, без чтения тела целиком в память. После последней части
+файл хэшируется с диска и переносится в MEDIA_ROOT/proofs/ab/cd/<sha256>.<ext>;
+одинаковое содержимое хранится один раз: уже сохранённый файл ищется по
+хэшу в ProofMedia. Расширение задаёт проверенный тип файла
+(ProofUpload.CONTENT_TYPE_EXTENSIONS), а не имя от клиента. Путь
+добавляется в proof_files отчёта или черновика с тем же ограничением, что и
+в validate_proof_files.
+
+Повторное объявление того же файла (заказ, имя, размер, хэш) продолжает
+незавершённую загрузку, а не начинает новую. Брошенные загрузки старше
+PROOF_UPLOAD_STALE_HOURS не занимают место в лимите файлов и удаляются
+командой clear_stale_uploads.
+"""
+
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .drafts import draft_data, stage_draft_patch
+from .media import schedule_derivatives
+from .models import ProofMedia, ProofUpload, TestReport
+from .serializers import TestReportSerializer
+
+UPLOAD_READ_SIZE = 64 * 1024
+PROOFS_DIR = 'proofs'
+PARTS_DIR = 'uploads'
+
+
+
+class UploadOffsetMismatch(Exception):
+    def __init__(self, offset):
+        super().__init__(f'Expected offset {offset}')
+        self.offset = offset
+
+
+def part_path(upload):
+    return os.path.join(settings.MEDIA_ROOT, PARTS_DIR, f'{upload.pk}.part')
+
+
+def blob_name(sha256, content_type):
+    """Относительный путь файла по содержимому: proofs/ab/cd/<sha256>.<ext>.
+
+    Расширение берётся из проверенного content_type, а не из имени файла:
+    файл отдаётся с нашего домена, и .html или .svg в нём был бы XSS.
+    """
+    extension = ProofUpload.CONTENT_TYPE_EXTENSIONS[content_type]
+    return f'{PROOFS_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}'
+
+
+def _allowed_blob(name):
+    return name.rsplit('.', 1)[-1] in ProofUpload.CONTENT_TYPE_EXTENSIONS.values()
+
+
+def blob_exists(name):
+    return os.path.exists(os.path.join(settings.MEDIA_ROOT, name))
+
+
+def stored_blob(sha256, content_type):
+    """Путь уже сохранённого файла с этим содержимым или None."""
+    name = ProofMedia.objects.filter(sha256=sha256).values_list('path', flat=True).first()
+    for candidate in (name, blob_name(sha256, content_type)):
+        if candidate and _allowed_blob(candidate) and blob_exists(candidate):
+            return candidate
+    return None
+
+
+def find_resumable(purchase_id, filename, size, sha256=''):
+    """Незавершённая загрузка того же файла, которую можно продолжить."""
+    return (
+        ProofUpload.objects.filter(
+            purchase_id=purchase_id,
+            status=ProofUpload.STATUS_UPLOADING,
+            filename=filename,
+            size=size,
+            sha256=sha256,
+        )
+        .order_by('-updated_at')
+        .first()
+    )
+
+
+def current_proof_files(purchase_id):
+    """proof_files отправленного отчёта или черновика."""
+    files = TestReport.objects.filter(purchase_id=purchase_id).values_list('proof_files', flat=True).first()
+    if files is None:
+        files = draft_data(purchase_id).get('proof_files')
+    return list(files) if isinstance(files, list) else []
+
+
+def check_file_limit(purchase_id, filename):
+    """Поднимает ValidationError, если новый файл превысит лимит validate_proof_files."""
+    # Брошенные загрузки лимит не занимают: их всё равно удалит clear_stale_uploads
+    pending = ProofUpload.objects.filter(
+        purchase_id=purchase_id,
+        status=ProofUpload.STATUS_UPLOADING,
+        updated_at__gte=timezone.now() - timedelta(hours=settings.PROOF_UPLOAD_STALE_HOURS),
+    ).values_list('filename', flat=True)
+    TestReportSerializer().validate_proof_files([*current_proof_files(purchase_id), *pending, filename])
+
+
+def _with_file(files, name):
+    files = list(files) if isinstance(files, list) else []
+    return files if name in files else [*files, name]
+
+
+def attach_proof_file(purchase_id, name):
+    """Добавляет файл в proof_files отчёта или черновика.
+
+    Две загрузки могут завершиться одновременно, поэтому список не
+    перезаписывается вслепую: у отчёта — условный UPDATE по updated_at с
+    повтором, у черновика — изменение под блокировкой черновика.
+    """
+    while True:
+        report = TestReport.objects.filter(purchase_id=purchase_id).values('pk', 'proof_files', 'updated_at').first()
+        if report is None:
+            stage_draft_patch(
+                purchase_id, lambda data: {'proof_files': _with_file(data.get('proof_files'), name)}, flush=True
+            )
+            return
+        files = _with_file(report['proof_files'], name)
+        if files == report['proof_files']:
+            return
+        updated = TestReport.objects.filter(pk=report['pk'], updated_at=report['updated_at']).update(
+            proof_files=files, updated_at=timezone.now()
+        )
+        if updated:
+            return
+
+
+def complete_from_existing(upload):
+    """Файл с объявленным SHA-256 уже хранится — загрузка не нужна."""
+    name = stored_blob(upload.sha256, upload.content_type)
+    if name is None:
+        return False
+    upload.path = name
+    upload.offset = upload.size
+    upload.status = ProofUpload.STATUS_COMPLETE
+    upload.save(update_fields=('path', 'offset', 'status', 'updated_at'))
+    schedule_derivatives(upload.sha256, name, upload.content_type)
+    attach_proof_file(upload.purchase_id, name)
+    return True
+
+
+def append_chunk(upload, offset, stream, length):
+    """Дописывает length байт из stream с позиции offset; возвращает новое смещение."""
+    if offset != upload.offset:
+        raise UploadOffsetMismatch(upload.offset)
+    if length > upload.size - offset:
+        raise ValueError('Часть выходит за объявленный размер файла.')
+
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+        part.seek(offset)
+        while written < length:
+            block = stream.read(min(UPLOAD_READ_SIZE, length - written))
+            if not block:
+                break
+            part.write(block)
+            written += len(block)
+        part.truncate()
+
+    # Условный UPDATE: параллельная запись той же части не сдвинет смещение дважды
+    updated = ProofUpload.objects.filter(pk=upload.pk, offset=offset).update(
+        offset=F('offset') + written, updated_at=timezone.now()
+    )
+    if not updated:
+        upload.refresh_from_db(fields=('offset',))
+        raise UploadOffsetMismatch(upload.offset)
+    upload.offset = offset + written
+    return upload.offset
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(UPLOAD_READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def finalize_upload(upload):
+    """Проверяет хэш, переносит файл в хранилище по содержимому и прикрепляет к отчёту."""
+    path = part_path(upload)
+    sha256 = file_sha256(path)
+    if upload.sha256 and upload.sha256 != sha256:
+        os.remove(path)
+        ProofUpload.objects.filter(pk=upload.pk).update(offset=0)
+        raise ValueError('SHA-256 загруженного файла не совпадает с объявленным.')
+
+    name = stored_blob(sha256, upload.content_type)
+    if name is not None:
+        os.remove(path)
+    else:
+        name = blob_name(sha256, upload.content_type)
+        target = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+
+    upload.sha256 = sha256
+    upload.path = name
+    upload.status = ProofUpload.STATUS_COMPLETE
+    upload.save(update_fields=('sha256', 'path', 'status', 'updated_at'))
+    schedule_derivatives(sha256, name, upload.content_type)
+    attach_proof_file(upload.purchase_id, name)
+
+
+def remove_part(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
@@ -1,18 +1,38 @@
 from django.urls import path
 
+from .stream import offer_stream
 from .views import (
+    BulkOrderDecisionView,
+    OfferDispatchView,
     OrderDecisionView,
+    OrderSyncView,
     PendingCreatingOrdersView,
+    ProofUploadCreateView,
+    ProofUploadView,
+    PurchaseDetailView,
     PurchaseListView,
+    ReportExportView,
+    ReportStatsView,
     TestReportView,
     TestReportCreateView,
+    TestReportDraftView,
 )
 
 urlpatterns = [
     path('creating/', PendingCreatingOrdersView.as_view(), name='orders-creating'),
+    path('creating/stream/', offer_stream, name='orders-creating-stream'),
+    path('creating/decisions/', BulkOrderDecisionView.as_view(), name='orders-bulk-decision'),
     path('creating/<int:pk>/decision/', OrderDecisionView.as_view(), name='orders-decision'),
+    path('dispatch/', OfferDispatchView.as_view(), name='orders-dispatch'),
+    path('sync/', OrderSyncView.as_view(), name='orders-sync'),
     path('purchases/', PurchaseListView.as_view(), name='orders-purchases'),
+    path('purchases/<int:purchase_id>/', PurchaseDetailView.as_view(), name='orders-purchase-detail'),
     path('purchases/<int:purchase_id>/report/', TestReportView.as_view(), name='test-report-detail'),
+    path('purchases/<int:purchase_id>/report/draft/', TestReportDraftView.as_view(), name='test-report-draft'),
+    path('purchases/<int:purchase_id>/uploads/', ProofUploadCreateView.as_view(), name='proof-upload-create'),
+    path('uploads/<uuid:upload_id>/', ProofUploadView.as_view(), name='proof-upload-detail'),
     path('reports/', TestReportCreateView.as_view(), name='test-report-create'),
+    path('reports/stats/', ReportStatsView.as_view(), name='report-stats'),
+    path('reports/export/', ReportExportView.as_view(), name='report-export'),
 ]
 
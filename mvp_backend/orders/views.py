@@ -1,36 +1,73 @@
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from accounts.models import UserProfile
-from .models import CreatingOrder, Purchase, TestReport
+from mvp_backend.conditional import ConditionalGetMixin
+from mvp_backend.fieldsets import SparseFieldsetMixin, fieldset_requested, model_columns
+from mvp_backend.query_budget import add_query_batches, query_budget
+from .models import CreatingOrder, ProofUpload, Purchase, ReportScoreRollup, TestReport
+from .drafts import default_report, discard_draft, draft_data, stage_draft_patch, validate_draft_patch
+from .decisions import apply_decisions, resolve_pickup_point, upsert_purchase
+from .dispatch import DISPATCH_BATCH_SIZE, dispatch_offers, matching_tester_ids
+from .export import CONTENT_TYPES, export_chunks, export_filename, export_rows
+from .media import proof_media_items
+from .pagination import CreatedAtCursorPagination
+from .rollups import report_stats
+from .sync import InvalidSyncToken, SyncTokenExpired, collect_changes
+from .uploads import (
+    UploadOffsetMismatch,
+    append_chunk,
+    check_file_limit,
+    complete_from_existing,
+    finalize_upload,
+    find_resumable,
+    remove_part,
+)
 from .serializers import (
+    BulkOrderDecisionItemSerializer,
     CreatingOrderSerializer,
+    OfferDispatchSerializer,
     OrderDecisionSerializer,
+    ProofUploadSerializer,
     PurchaseSerializer,
+    ReportExportQuerySerializer,
+    ReportStatsQuerySerializer,
     TestReportSerializer,
 )
 
 
-class PendingCreatingOrdersView(generics.ListAPIView):
+@query_budget(3)
+class PendingCreatingOrdersView(ConditionalGetMixin, SparseFieldsetMixin, generics.ListAPIView):
     serializer_class = CreatingOrderSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         return CreatingOrder.objects.filter(
             user=self.request.user,
             status=CreatingOrder.STATUS_PROCESSING,
-        ).order_by('-created_at')
+        )
 
+    def get_conditional_state(self):
+        state = self.get_queryset().order_by().aggregate(last=Max('updated_at'), count=Count('id'))
+        return state['last'], state['count']
 
-class PurchaseListView(generics.ListAPIView):
+
+@query_budget(3)
+class PurchaseListView(ConditionalGetMixin, SparseFieldsetMixin, generics.ListAPIView):
     serializer_class = PurchaseSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         try:
-            return Purchase.objects.filter(tester=self.request.user).order_by('-created_at')
+            return Purchase.objects.filter(tester=self.request.user).with_report_flag()
         except Exception as e:
             # Логируем ошибку для отладки
             import logging
@@ -39,18 +76,66 @@ class PurchaseListView(generics.ListAPIView):
             # Если таблица не существует или есть проблемы с доступом, возвращаем пустой queryset
             return Purchase.objects.none()
 
+    def get_conditional_state(self):
+        # Появление/удаление отчёта не трогает updated_at заказа, поэтому учитываем и отчёты
+        state = Purchase.objects.filter(tester=self.request.user).order_by().aggregate(
+            last=Max('updated_at'),
+            count=Count('id'),
+            reports=Count('test_report'),
+            last_report=Max('test_report__updated_at'),
+        )
+        last_modified = max(filter(None, (state['last'], state['last_report'])), default=None)
+        return last_modified, (state['count'], state['reports'])
+
+
+@query_budget(2)
+class PurchaseDetailView(generics.RetrieveAPIView):
+    """Один заказ тестера — форме отчёта не нужно листать весь список."""
+    serializer_class = PurchaseSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    lookup_url_kwarg = 'purchase_id'
+
+    def get_queryset(self):
+        return Purchase.objects.filter(tester=self.request.user).with_report_flag()
+
+
+@query_budget(4, ms=200)
+class OrderSyncView(APIView):
+    """Изменения запросов на заказ и заказов после токена ?since=.
+
+    Токен старше SYNC_TOMBSTONE_RETENTION_DAYS — 410: нужен полный снимок без since.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        try:
+            changes = collect_changes(request.user, request.query_params.get('since'))
+        except SyncTokenExpired:
+            return Response({'detail': 'Sync token expired, start a full sync.'}, status=status.HTTP_410_GONE)
+        except InvalidSyncToken:
+            return Response({'detail': 'Invalid sync token.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'orders': CreatingOrderSerializer(changes['orders'], many=True).data,
+            'purchases': PurchaseSerializer(changes['purchases'], many=True).data,
+            'deleted': changes['deleted'],
+            'has_more': changes['has_more'],
+            'since': changes['since'],
+        })
+
 
+@query_budget(7)
 class OrderDecisionView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def post(self, request, pk):
         try:
-            order = CreatingOrder.objects.select_related('user').get(pk=pk, user=request.user)
+            order = CreatingOrder.objects.get(pk=pk, user=request.user)
         except CreatingOrder.DoesNotExist:
             return Response({'detail': 'Order not found.'}, status=status.HTTP_404_NOT_FOUND)
 
         if order.status != CreatingOrder.STATUS_PROCESSING:
-            return Response({'detail': 'Order has already been processed.'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'detail': 'Order has already been processed.'}, status=status.HTTP_409_CONFLICT)
 
         serializer = OrderDecisionSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -61,99 +146,248 @@ class OrderDecisionView(APIView):
 
         if not profile.is_completed:
             return Response({'detail': 'Complete your profile before responding to orders.'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Автоматически включаем участие при принятии заказа, если профиль заполнен
-        if data['action'] == 'approve' and not profile.is_participating:
-            profile.is_participating = True
-            profile.save(update_fields=('is_participating', 'updated_at'))
-
-        order.responded_at = timezone.now()
-
-        if data['action'] == 'approve':
-            try:
-                order.status = CreatingOrder.STATUS_APPROVED
-                order.pickup_point = data.get('pickup_point') or order.pickup_point or (profile.pickup_point if profile else '')
-                order.save(update_fields=('status', 'pickup_point', 'responded_at', 'updated_at'))
-
-                metadata = {}
-                if order.payload and isinstance(order.payload, dict):
-                    metadata = order.payload.copy()
-                if data.get('purchase_metadata'):
-                    metadata.update(data.get('purchase_metadata', {}))
-                
-                pickup_point = order.pickup_point or (profile.pickup_point if profile else '') or ''
-
-                # Для managed=False модели используем try/except вместо update_or_create
-                try:
-                    purchase = Purchase.objects.get(creating_order=order)
-                    # Обновляем существующий
-                    purchase.tester = request.user
-                    purchase.external_id = data.get('external_id', '') or ''
-                    purchase.article = order.article or ''
-                    purchase.pickup_point = pickup_point
-                    purchase.metadata = metadata
-                    purchase.status = Purchase.STATUS_PENDING
-                    purchase.save()
-                    created = False
-                except Purchase.DoesNotExist:
-                    # Создаем новый
-                    purchase = Purchase.objects.create(
-                        creating_order=order,
-                        tester=request.user,
-                        external_id=data.get('external_id', '') or '',
-                        article=order.article or '',
-                        pickup_point=pickup_point,
-                        metadata=metadata,
-                        status=Purchase.STATUS_PENDING,
-                    )
-                    created = True
-                return Response({
-                    'detail': 'Order approved and purchase created.',
-                    'purchase_id': purchase.id,
-                })
-            except Exception as e:
-                import logging
-                import traceback
-                logger = logging.getLogger(__name__)
-                error_trace = traceback.format_exc()
-                logger.error(f'Error creating purchase: {str(e)}\n{error_trace}')
-                return Response(
-                    {'detail': f'Ошибка при создании заказа: {str(e)}'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-        order.status = CreatingOrder.STATUS_REJECTED
-        order.save(update_fields=('status', 'responded_at', 'updated_at'))
-        return Response({'detail': 'Order rejected.'})
 
+        now = timezone.now()
+        new_status = CreatingOrder.STATUS_APPROVED if data['action'] == 'approve' else CreatingOrder.STATUS_REJECTED
+        pickup_point = resolve_pickup_point(order, data.get('pickup_point'), profile)
+
+        try:
+            with transaction.atomic():
+                # Условный UPDATE: из параллельных запросов статус сменит только один
+                claimed = CreatingOrder.objects.filter(
+                    pk=order.pk,
+                    user=request.user,
+                    status=CreatingOrder.STATUS_PROCESSING,
+                ).update(status=new_status, pickup_point=pickup_point, responded_at=now, updated_at=now)
+                if not claimed:
+                    return Response({'detail': 'Order has already been processed.'}, status=status.HTTP_409_CONFLICT)
+
+                if new_status == CreatingOrder.STATUS_REJECTED:
+                    return Response({'detail': 'Order rejected.'})
+
+                order.pickup_point = pickup_point
+                purchase = upsert_purchase(request.user, order, data, now)
+
+                # Автоматически включаем участие при принятии заказа, если профиль заполнен
+                if not profile.is_participating:
+                    profile.is_participating = True
+                    profile.save(update_fields=('is_participating', 'updated_at'))
+        except Exception as e:
+            import logging
+            import traceback
+            logger = logging.getLogger(__name__)
+            error_trace = traceback.format_exc()
+            logger.error(f'Error creating purchase: {str(e)}\n{error_trace}')
+            return Response(
+                {'detail': f'Ошибка при создании заказа: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        return Response({
+            'detail': 'Order approved and purchase created.',
+            'purchase_id': purchase.id,
+        })
+
+
+@query_budget(9)
+class BulkOrderDecisionView(APIView):
+    """Принять/отклонить несколько запросов на заказ за один запрос."""
+    permission_classes = (permissions.IsAuthenticated,)
+    max_items = 200
+
+    def post(self, request):
+        serializer = BulkOrderDecisionItemSerializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=self.max_items,
+        )
+        serializer.is_valid(raise_exception=True)
+        decisions = serializer.validated_data
+
+        profile, _ = UserProfile.objects.get_or_create(user=request.user)
+
+        if not profile.is_completed:
+            return Response({'detail': 'Complete your profile before responding to orders.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = apply_decisions(request.user, profile, decisions)
+        return Response({'results': results})
+
+
+# Пачка в DISPATCH_BATCH_SIZE тестеров: проверка существующих, savepoint,
+# до четырёх INSERT по 500 строк, release и запись в поиск
+@query_budget(4, per_batch=8)
+class OfferDispatchView(APIView):
+    """Разослать предложение по артикулу всем тестерам под фильтр (только staff).
+
+    Число запросов растёт с числом пачек, поэтому бюджет задан на пачку.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def post(self, request):
+        serializer = OfferDispatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        user_ids = matching_tester_ids(
+            participating=data['participating'],
+            completed=data['completed'],
+            city=data['city'],
+            pickup_point=data['tester_pickup_point'],
+            match=data['match'],
+        )
+        created, skipped = dispatch_offers(
+            user_ids,
+            article=data['article'],
+            title=data['title'],
+            notes=data['notes'],
+            pickup_point=data['pickup_point'],
+            payload=data['payload'],
+            assigned_by=request.user,
+            skip_existing=data['skip_existing'],
+            batch_size=DISPATCH_BATCH_SIZE,
+            progress=lambda created, skipped: add_query_batches(request),
+        )
+        return Response({'created': created, 'skipped': skipped}, status=status.HTTP_201_CREATED)
+
+
+@query_budget(2, ms=200)
+class ReportStatsView(APIView):
+    """Средние оценки и NPS отчётов по артикулу, категории и периоду (только staff).
+
+    Читает сводку ReportScoreRollup, а не сами отчёты. Фильтры: article,
+    category, date_from, date_to (по дате создания отчёта); group — day,
+    week, month или total.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        serializer = ReportStatsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
 
+        rollups = ReportScoreRollup.objects.all()
+        if 'article' in params:
+            rollups = rollups.filter(article=params['article'])
+        if 'category' in params:
+            rollups = rollups.filter(category=params['category'])
+        if 'date_from' in params:
+            rollups = rollups.filter(day__gte=params['date_from'])
+        if 'date_to' in params:
+            rollups = rollups.filter(day__lte=params['date_to'])
+        return Response({'group': params['group'], 'results': report_stats(rollups, params['group'])})
+
+
+@query_budget(2)
+class ReportExportView(APIView):
+    """Потоковая выгрузка отчётов с заказом и профилем тестера в CSV или XLSX (только staff).
+
+    Фильтры те же, что у сводки: article, category, date_from, date_to;
+    output — csv (по умолчанию) или xlsx. Отчёты читаются пачками уже при
+    отдаче тела ответа, поэтому эти запросы в бюджет не входят.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        serializer = ReportExportQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = dict(serializer.validated_data)
+        output = params.pop('output')
+
+        response = StreamingHttpResponse(
+            export_chunks(output, export_rows(**params)), content_type=CONTENT_TYPES[output]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(output)}"'
+        return response
+
+
+@query_budget(get=6, patch=10, put=10)
 class TestReportView(generics.RetrieveUpdateAPIView):
-    """Получить или обновить отчёт о тестировании для заказа."""
+    """Получить или отправить отчёт о тестировании для заказа.
+
+    Пока отчёт не отправлен, GET ничего не пишет в БД: отдаёт отчёт с полями
+    из профиля и заказа поверх черновика (id = null). PUT/PATCH неотправленного
+    отчёта — отправка: черновик дополняется присланными полями, проверяется
+    целиком и сохраняется, черновик удаляется.
+    """
     serializer_class = TestReportSerializer
     permission_classes = (permissions.IsAuthenticated,)
-    
-    def get_object(self):
-        purchase_id = self.kwargs.get('purchase_id')
+
+    def get_purchase(self):
         try:
-            purchase = Purchase.objects.get(id=purchase_id, tester=self.request.user)
+            return Purchase.objects.get(id=self.kwargs['purchase_id'], tester=self.request.user)
         except Purchase.DoesNotExist:
-            from rest_framework.exceptions import NotFound
             raise NotFound('Заказ не найден или у вас нет доступа к нему.')
-        
+
+    def get_object(self):
+        purchase = self.get_purchase()
+        reports = TestReport.objects.all()
+        if fieldset_requested(self.request):
+            reports = reports.only(*model_columns(self.get_serializer(), TestReport))
         try:
-            report = TestReport.objects.get(purchase=purchase)
+            report = reports.get(purchase=purchase)
         except TestReport.DoesNotExist:
-            # Создаем новый отчет с данными по умолчанию
-            profile = self.request.user.profile
-            report = TestReport.objects.create(
-                purchase=purchase,
-                full_name=profile.full_name or '',
-                contact=profile.contact or str(self.request.user.phone_number),
-                item_name=purchase.article,
-            )
+            return default_report(purchase, self.request.user)
+        report.purchase = purchase
         return report
 
+    def retrieve(self, request, *args, **kwargs):
+        report = self.get_object()
+        data = self.get_serializer(report).data
+        if report.pk is None:
+            draft = draft_data(report.purchase_id)
+            data.update({field: value for field, value in draft.items() if field in data})
+            if 'proof_media' in data and 'proof_files' in draft:
+                data['proof_media'] = proof_media_items(draft['proof_files'])
+        return Response(data)
+
+    def update(self, request, *args, **kwargs):
+        report = self.get_object()
+        submitted = report.pk is None
+        if submitted:
+            data = dict(draft_data(report.purchase_id))
+            data.update(request.data)
+            partial = False
+        else:
+            data = request.data
+            partial = kwargs.get('partial', False)
+        serializer = self.get_serializer(report, data=data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        if submitted:
+            discard_draft(report.purchase_id)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.data)
+
+
+@query_budget(patch=4)
+class TestReportDraftView(APIView):
+    """Автосохранение черновика отчёта: PATCH с изменёнными полями формы.
+
+    Правки копятся и пишутся в БД одним UPDATE не чаще раза в
+    REPORT_DRAFT_FLUSH_SECONDS (см. orders.drafts); ?flush=1 — записать сразу,
+    например при закрытии формы. После отправки отчёта черновик не принимается.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def patch(self, request, purchase_id):
+        purchase = (
+            Purchase.objects.filter(id=purchase_id, tester=request.user)
+            .annotate(has_report=Exists(TestReport.objects.filter(purchase=OuterRef('pk'))))
+            .only('id')
+            .first()
+        )
+        if purchase is None:
+            raise NotFound('Заказ не найден или у вас нет доступа к нему.')
+        if purchase.has_report:
+            return Response({'detail': 'Отчёт уже отправлен.'}, status=status.HTTP_409_CONFLICT)
+
+        patch = validate_draft_patch(request.data)
+        saved = stage_draft_patch(purchase.pk, patch, flush=request.query_params.get('flush') == '1')
+        return Response({'saved': saved})
+
 
+@query_budget(7)
 class TestReportCreateView(generics.CreateAPIView):
     """Создать отчёт о тестировании."""
     serializer_class = TestReportSerializer
@@ -164,7 +398,6 @@ class TestReportCreateView(generics.CreateAPIView):
         try:
             purchase = Purchase.objects.get(id=purchase_id, tester=self.request.user)
         except Purchase.DoesNotExist:
-            from rest_framework.exceptions import NotFound
             raise NotFound('Заказ не найден или у вас нет доступа к нему.')
         
         profile = self.request.user.profile
@@ -174,3 +407,93 @@ class TestReportCreateView(generics.CreateAPIView):
             contact=serializer.validated_data.get('contact') or profile.contact or str(self.request.user.phone_number),
             item_name=serializer.validated_data.get('item_name') or purchase.article,
         )
+        discard_draft(purchase.id)
+
+
+@query_budget(post=10)
+class ProofUploadCreateView(APIView):
+    """Начать загрузку файла-подтверждения к отчёту (см. orders.uploads).
+
+    POST /api/orders/purchases/<id>/uploads/ {filename, size, content_type, sha256?}
+    Если файл с объявленным SHA-256 уже хранится, загрузка сразу завершена.
+    Незавершённая загрузка того же файла возвращается (200) с её смещением —
+    клиент докачивает её, а не начинает заново.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, purchase_id):
+        purchase = Purchase.objects.filter(id=purchase_id, tester=request.user).only('id').first()
+        if purchase is None:
+            raise NotFound('Заказ не найден или у вас нет доступа к нему.')
+
+        serializer = ProofUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        upload = find_resumable(purchase.pk, data['filename'], data['size'], data.get('sha256', ''))
+        if upload is not None:
+            return Response(ProofUploadSerializer(upload).data, headers={'Upload-Offset': str(upload.offset)})
+
+        check_file_limit(purchase.pk, serializer.validated_data['filename'])
+        upload = serializer.save(purchase=purchase)
+        if upload.sha256:
+            complete_from_existing(upload)
+        return Response(ProofUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+@query_budget(get=2, head=2, patch=11, delete=3)
+class ProofUploadView(APIView):
+    """Состояние загрузки (GET/HEAD — откуда докачивать), приём части (PATCH), отмена (DELETE).
+
+    PATCH: тело — байты части (Content-Type: application/offset+octet-stream),
+    заголовок Upload-Offset — позиция части в файле. При несовпадении
+    позиции — 409 с текущим смещением; после последней части файл
+    прикрепляется к отчёту.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_upload(self, request, upload_id):
+        try:
+            return ProofUpload.objects.get(pk=upload_id, purchase__tester=request.user)
+        except ProofUpload.DoesNotExist:
+            raise NotFound('Загрузка не найдена.')
+
+    def respond(self, upload, status_code=status.HTTP_200_OK):
+        return Response(
+            ProofUploadSerializer(upload).data,
+            status=status_code,
+            headers={'Upload-Offset': str(upload.offset)},
+        )
+
+    def get(self, request, upload_id):
+        return self.respond(self.get_upload(request, upload_id))
+
+    def patch(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        if upload.status == ProofUpload.STATUS_COMPLETE:
+            return self.respond(upload)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return Response({'detail': 'Укажите заголовок Upload-Offset.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        try:
+            if length:
+                append_chunk(upload, offset, request.stream, length)
+            if upload.offset == upload.size:
+                finalize_upload(upload)
+        except UploadOffsetMismatch as exc:
+            upload.offset = exc.offset
+            return self.respond(upload, status.HTTP_409_CONFLICT)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return self.respond(upload)
+
+    def delete(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        if upload.status == ProofUpload.STATUS_COMPLETE:
+            return Response({'detail': 'Файл уже загружен.'}, status=status.HTTP_409_CONFLICT)
+        remove_part(upload)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
@@ -0,0 +1,207 @@
+"""Полнотекстовый индекс (SQLite FTS5) по профилям, запросам на заказ и отчётам.
+
+Каждый объект — одна строка виртуальной таблицы search_index с
+rowid = object_id * KIND_STRIDE + код типа, поэтому обновление и удаление
+документа — точечные операции по rowid, без сканирования таблицы.
+Колонки документа: title (имя/название), tags (город, страна, контакт,
+тематики, артикул) и body (длинные тексты); при ранжировании bm25 их
+веса — COLUMN_WEIGHTS.
+"""
+
+import re
+from itertools import islice
+
+from django.db import connection
+
+from accounts.models import UserProfile
+from orders.models import CreatingOrder, TestReport
+
+SEARCH_TABLE = 'search_index'
+KIND_STRIDE = 4
+KIND_CODES = {'profile': 1, 'order': 2, 'report': 3}
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _normalize(text):
+    # unicode61 не сводит «ё» к «е»
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def _join(*parts):
+    values = []
+    for part in parts:
+        if isinstance(part, (list, tuple)):
+            values.extend(str(item) for item in part if item)
+        elif part:
+            values.append(str(part))
+    return _normalize(' '.join(values))
+
+
+def profile_document(profile):
+    return (
+        _join(profile.full_name),
+        _join(
+            profile.city, profile.country, profile.contact, profile.coverage_regions,
+            profile.blog_topics, profile.platforms,
+        ),
+        _join(profile.blog_description, profile.additional_info),
+    )
+
+
+def order_document(order):
+    return _join(order.title), _join(order.article), ''
+
+
+def report_document(report):
+    return (
+        _join(report.item_name),
+        _join(report.emotions_3_words),
+        _join(report.likes, report.improvements, report.review_text, report.issues_note),
+    )
+
+
+# kind -> (модель, поля документа, функция построения документа)
+DOCUMENTS = {
+    'profile': (
+        UserProfile,
+        (
+            'full_name', 'city', 'country', 'contact', 'coverage_regions', 'blog_topics', 'platforms',
+            'blog_description', 'additional_info',
+        ),
+        profile_document,
+    ),
+    'order': (CreatingOrder, ('title', 'article'), order_document),
+    'report': (
+        TestReport,
+        ('item_name', 'emotions_3_words', 'likes', 'improvements', 'review_text', 'issues_note'),
+        report_document,
+    ),
+}
+
+
+def search_supported(conn=None):
+    return (conn or connection).vendor == 'sqlite'
+
+
+def document_rowid(kind, object_id):
+    return object_id * KIND_STRIDE + KIND_CODES[kind]
+
+
+def create_search_table(schema_editor):
+    if not search_supported(schema_editor.connection):
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+        'kind UNINDEXED, object_id UNINDEXED, title, tags, body, '
+        "tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def drop_search_table(schema_editor):
+    if search_supported(schema_editor.connection):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+def index_objects(kind, objects):
+    """Добавляет или заменяет документы объектов одного типа."""
+    if not search_supported():
+        return
+    build = DOCUMENTS[kind][2]
+    rows = [(document_rowid(kind, obj.pk), kind, obj.pk, *build(obj)) for obj in objects]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, kind, object_id, title, tags, body) '
+            'VALUES (%s, %s, %s, %s, %s, %s)',
+            rows,
+        )
+
+
+def remove_objects(kind, object_ids):
+    if not search_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+            [(document_rowid(kind, object_id),) for object_id in object_ids],
+        )
+
+
+def rebuild_index(kinds=None, batch_size=2000, progress=None):
+    """Перестраивает индекс целиком (или для перечисленных типов).
+
+    Объекты читаются через iterator() только с полями документа.
+    Возвращает {kind: число документов}.
+    """
+    kinds = list(kinds or DOCUMENTS)
+    counts = {}
+    with connection.cursor() as cursor:
+        if set(kinds) == set(DOCUMENTS):
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        else:
+            for kind in kinds:
+                cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE kind = %s', [kind])
+
+    for kind in kinds:
+        model, fields, _ = DOCUMENTS[kind]
+        objects = model.objects.only(*fields).order_by('pk').iterator(chunk_size=batch_size)
+        counts[kind] = 0
+        while batch := list(islice(objects, batch_size)):
+            index_objects(kind, batch)
+            counts[kind] += len(batch)
+            if progress:
+                progress(kind, counts[kind])
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return counts
+
+
+def build_match_query(text):
+    """Превращает пользовательский ввод в безопасный запрос FTS5.
+
+    Каждое слово ищется как префикс, слова объединяются через AND.
+    """
+    tokens = _TOKEN_RE.findall(_normalize(text or '').lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search(text, kinds=None, limit=20, offset=0):
+    """Ранжированный поиск: список (kind, object_id, rank, snippet), лучшие первыми."""
+    match = build_match_query(text)
+    if not match or not search_supported():
+        return []
+
+    weights = ', '.join(str(weight) for weight in (0, 0, *COLUMN_WEIGHTS))
+    sql = (
+        f"SELECT kind, object_id, bm25({SEARCH_TABLE}, {weights}) AS rank, "
+        f"snippet({SEARCH_TABLE}, -1, '[', ']', '…', 12) "
+        f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+    )
+    params = [match]
+    if kinds:
+        sql += f' AND kind IN ({", ".join(["%s"] * len(kinds))})'
+        params.extend(kinds)
+    sql += ' ORDER BY rank LIMIT %s OFFSET %s'
+    params.extend((limit, offset))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def matching_ids_sql(text, kind, limit=None):
+    """(sql, params) подзапроса с id объектов типа kind под запрос — для pk__in=RawSQL(...).
+
+    Без ранжирования: подходит для фильтров, где порядок задаёт сам список.
+    С limit берутся последние по id совпадения (rowid растёт вместе с id).
+    """
+    match = build_match_query(text)
+    if not match:
+        return None
+    sql = f'SELECT object_id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND kind = %s'
+    if limit is None:
+        return sql, (match, kind)
+    return f'{sql} ORDER BY rowid DESC LIMIT %s', (match, kind, limit)
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from search.index import DOCUMENTS, rebuild_index, search_supported
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс (FTS5) профилей, запросов на заказ и отчётов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=tuple(DOCUMENTS), help='Только указанные типы.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search_supported(connection):
+            raise CommandError('Полнотекстовый индекс поддерживается только для SQLite.')
+
+        started = time.perf_counter()
+
+        def progress(kind, indexed):
+            self.stdout.write(f'  {kind}: {indexed}')
+
+        with transaction.atomic():
+            counts = rebuild_index(options['kind'], batch_size=options['batch_size'], progress=progress)
+
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{kind}: {count}' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Индекс перестроен за {elapsed:.1f} с ({summary})'))
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# Снимок search.index на момент миграции: код приложения может измениться,
+# а миграция должна создавать ту же таблицу
+SEARCH_TABLE = 'search_index'
+
+
+def create_table(apps, schema_editor):
+    # FTS5 есть только в SQLite; на других СУБД поиск отключён
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+        'kind UNINDEXED, object_id UNINDEXED, title, tags, body, '
+        "tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def drop_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0008_refreshtoken'),
+        ('orders', '0006_synctombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_table, drop_table),
+    ]
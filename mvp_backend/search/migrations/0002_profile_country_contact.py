@@ -0,0 +1,62 @@
+from itertools import islice
+
+from django.db import migrations
+
+# Снимок search.index на момент миграции: код приложения может измениться,
+# а миграция должна строить тот же документ
+SEARCH_TABLE = 'search_index'
+KIND_STRIDE = 4
+PROFILE_KIND_CODE = 1
+BATCH_SIZE = 2000
+
+
+def _join(*parts):
+    values = []
+    for part in parts:
+        if isinstance(part, (list, tuple)):
+            values.extend(str(item) for item in part if item)
+        elif part:
+            values.append(str(part))
+    return ' '.join(values).replace('ё', 'е').replace('Ё', 'Е')
+
+
+def reindex_profiles(apps, schema_editor):
+    """В теги профиля добавлены страна и контакт — перестраиваем документы профилей."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    profiles = UserProfile.objects.order_by('pk').iterator(chunk_size=BATCH_SIZE)
+    while batch := list(islice(profiles, BATCH_SIZE)):
+        rows = [
+            (
+                profile.pk * KIND_STRIDE + PROFILE_KIND_CODE,
+                'profile',
+                profile.pk,
+                _join(profile.full_name),
+                _join(
+                    profile.city, profile.country, profile.contact, profile.coverage_regions,
+                    profile.blog_topics, profile.platforms,
+                ),
+                _join(profile.blog_description, profile.additional_info),
+            )
+            for profile in batch
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, kind, object_id, title, tags, body) '
+                'VALUES (%s, %s, %s, %s, %s, %s)',
+                rows,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_userprofile_admin_indexes'),
+        ('search', '0001_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_profiles, migrations.RunPython.noop),
+    ]
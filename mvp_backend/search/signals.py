@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import UserProfile
+from orders.models import CreatingOrder, TestReport
+
+from .index import DOCUMENTS, index_objects, remove_objects
+
+KIND_BY_MODEL = {model: kind for kind, (model, _, _) in DOCUMENTS.items()}
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=CreatingOrder)
+@receiver(post_save, sender=TestReport)
+def update_search_document(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    kind = KIND_BY_MODEL[sender]
+    # Узкие сохранения (статус, участие) не трогают текст документа
+    if update_fields is not None and not set(update_fields) & set(DOCUMENTS[kind][1]):
+        return
+    index_objects(kind, [instance])
+
+
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender=CreatingOrder)
+@receiver(post_delete, sender=TestReport)
+def remove_search_document(sender, instance, **kwargs):
+    remove_objects(KIND_BY_MODEL[sender], [instance.pk])
@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from orders.dispatch import dispatch_offers
+from orders.models import CreatingOrder
+from orders.tests import PurchasesTableMixin
+
+from .index import SEARCH_TABLE, search
+
+
+class SearchIndexTests(PurchasesTableMixin, TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(phone_number='+79990003001', password='secret-pass-1', is_staff=True)
+        self.tester = User.objects.create_user(phone_number='+79990003002', password='secret-pass-1')
+        profile = self.tester.profile
+        profile.full_name = 'Анна Крем'
+        profile.city = 'Казань'
+        profile.blog_topics = ['Косметика', 'Уход']
+        profile.blog_description = 'Пишу про ёлочные игрушки и кремы'
+        profile.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def hits(self, text, **kwargs):
+        return [(kind, object_id) for kind, object_id, _, _ in search(text, **kwargs)]
+
+    def test_sync_on_save_and_delete(self):
+        order = CreatingOrder.objects.create(user=self.tester, article='ART-77', title='Увлажняющий крем')
+        self.assertEqual(self.hits('увлажн'), [('order', order.pk)])
+        self.assertEqual(self.hits('елочн'), [('profile', self.tester.profile.pk)])
+
+        order.title = 'Шампунь'
+        order.save()
+        self.assertEqual(self.hits('увлажн'), [])
+
+        order.delete()
+        self.assertEqual(self.hits('шампунь'), [])
+
+    def test_title_ranks_above_body(self):
+        order = CreatingOrder.objects.create(user=self.tester, article='ART-1', title='Игрушки')
+        self.assertEqual(self.hits('игрушки'), [('order', order.pk), ('profile', self.tester.profile.pk)])
+
+    def test_api_filters_by_kind_and_is_staff_only(self):
+        CreatingOrder.objects.create(user=self.tester, article='ART-1', title='Крем')
+        response = self.client.get('/api/search/', {'q': 'крем', 'kind': 'profile'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['kind'] for item in response.data['results']], ['profile'])
+        self.assertEqual(response.data['results'][0]['user_id'], self.tester.pk)
+        self.assertIn('[', response.data['results'][0]['snippet'])
+
+        self.assertEqual(self.client.get('/api/search/', {'q': 'крем', 'kind': 'user'}).status_code, 400)
+        self.client.force_authenticate(self.tester)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'крем'}).status_code, 403)
+
+    def test_bulk_dispatch_and_rebuild(self):
+        dispatch_offers([self.tester.pk], 'ART-9', title='Сыворотка')
+        self.assertEqual(len(self.hits('сыворотка')), 1)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        self.assertEqual(self.hits('сыворотка'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.hits('сыворотка')), 1)
+        self.assertEqual(len(self.hits('казань')), 1)
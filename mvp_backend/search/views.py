@@ -0,0 +1,59 @@
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .index import DOCUMENTS, search
+
+# Поля, которыми результаты дополняются для показа в списке
+SUMMARY_FIELDS = {
+    'profile': ('user_id', 'full_name', 'city'),
+    'order': ('user_id', 'article', 'title', 'status'),
+    'report': ('purchase_id', 'item_name', 'category'),
+}
+
+
+class SearchView(APIView):
+    """Полнотекстовый поиск по профилям, запросам на заказ и отчётам (только staff).
+
+    GET /api/search/?q=крем увлажняющий&kind=report&limit=20&offset=0
+    Слова ищутся как префиксы и объединяются по И; результаты отсортированы
+    по релевантности (bm25), snippet подсвечивает совпадения [так].
+    """
+    permission_classes = (permissions.IsAdminUser,)
+    max_limit = 100
+
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        kinds = [kind for value in request.query_params.getlist('kind') for kind in value.split(',') if kind]
+        unknown = set(kinds) - set(DOCUMENTS)
+        if unknown:
+            return Response(
+                {'detail': f'Unknown kind: {", ".join(sorted(unknown))}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.max_limit)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response({'detail': 'Invalid limit or offset.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        hits = search(text, kinds=kinds, limit=limit, offset=offset)
+
+        # Одна выборка на тип вместо запроса на каждый результат
+        summaries = {}
+        for kind in {hit[0] for hit in hits}:
+            model = DOCUMENTS[kind][0]
+            ids = [object_id for hit_kind, object_id, _, _ in hits if hit_kind == kind]
+            fields = SUMMARY_FIELDS[kind]
+            summaries[kind] = {
+                row['id']: row for row in model.objects.filter(pk__in=ids).values('id', *fields)
+            }
+
+        results = []
+        for kind, object_id, rank, snippet in hits:
+            summary = summaries[kind].get(object_id)
+            if summary is None:
+                # Документ ещё не удалён из индекса, а объекта уже нет
+                continue
+            results.append({'kind': kind, 'rank': rank, 'snippet': snippet, **summary})
+        return Response({'results': results})
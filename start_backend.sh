@@ -4,6 +4,7 @@
 cd "$(dirname "$0")/mvp_backend"
 source ../venv/bin/activate
 
-echo "Запуск Django backend..."
-python manage.py runserver
+echo "Запуск Django backend (ASGI, uvicorn)..."
+# ASGI нужен потоку предложений (SSE): под runserver/WSGI он вырождается в опрос
+uvicorn mvp_backend.asgi:application --port 8000 --reload
 